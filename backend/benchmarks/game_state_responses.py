@@ -0,0 +1,81 @@
+"""
+Times building the game state response for a Quantum and a Wizard game part way through:
+
+- validate: building the response models from the game's state with validation, as they used to be built
+- construct: building the same models without validation, as `get_game_state_response` now does
+- response: the whole of `get_game_state_response`, reading the state from the game and building the models
+- cached view: `GameStateViews.get_view`, as the game manager gets responses, once the version has been built
+
+    python -m benchmarks.game_state_responses
+"""
+
+import timeit
+from collections.abc import Callable
+
+from games_backend.game_base import GameBase
+from games_backend.games.quantum.game import QuantumGame
+from games_backend.games.wizard.game import WizardGame
+from games_backend.manager.state_views import GameStateViews
+from games_backend.models import QuantumHintLevel
+
+NUMBER = 2_000
+REPEAT = 5
+
+
+def quantum_game() -> QuantumGame:
+    game = QuantumGame(number_of_players=4, max_hint_level=QuantumHintLevel.FULL)
+    for player, name in enumerate(["Hearts", "Spades", "Clubs", "Diamonds"]):
+        game.perform_function_call(player, "set_suit_name", {"suit_name": name})
+        game.perform_function_call(player, "set_hint_level", {"hint_level": QuantumHintLevel.FULL})
+    for turn in range(12):
+        player = turn % 4
+        target = (player + 1) % 4
+        game.perform_function_call(player, "target_player", {"targeted_player": target, "suit": player})
+        game.perform_function_call(target, "respond_to_target", {"response": True})
+        game.perform_function_call(player, "claim_no_win", {})
+    return game
+
+
+def wizard_game() -> WizardGame:
+    game = WizardGame(number_of_players=4, can_see_old_rounds=True)
+    for _ in range(120):
+        player = game.get_game_state_response(None).parameters.current_player
+        state = game.get_game_state_response(player).parameters
+        if state.valid_bids:
+            parameters = {"bid": state.valid_bids[0]}
+            if state.trump_to_be_set:
+                parameters["set_suit"] = 2
+            game.perform_function_call(player, "make_bid", parameters)
+        else:
+            game.perform_function_call(player, "play_card", {"card": state.playable_cards[0]})
+    return game
+
+
+def model_builders(game: GameBase, position: int) -> dict[str, Callable[[], object]]:
+    response = game.get_game_state_response(position)
+    response_type = type(response)
+    parameters_type = type(response.parameters)
+    values = {field: getattr(response.parameters, field) for field in parameters_type.model_fields}
+    return {
+        "validate": lambda: response_type(parameters=parameters_type(**values)),
+        "construct": lambda: response_type.model_construct(parameters=parameters_type.model_construct(**values)),
+    }
+
+
+def time_per_call(function: Callable[[], object]) -> float:
+    return min(timeit.repeat(function, number=NUMBER, repeat=REPEAT)) / NUMBER
+
+
+def main():
+    for name, game in [("quantum", quantum_game()), ("wizard", wizard_game())]:
+        views = GameStateViews(game)
+        timings = model_builders(game, 0) | {
+            "response": lambda game=game: game.get_game_state_response(0),
+            "cached view": lambda views=views: views.get_view(0),
+        }
+        for label, function in timings.items():
+            print(f"{name:8} {label:12} {time_per_call(function) * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
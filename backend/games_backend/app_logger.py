@@ -1,4 +1,133 @@
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+from typing import Any, final, override
 
 # Lazy but this shows up in the logs when hosting with uvicorn.
 logger = logging.getLogger("uvicorn")
+
+# Log every move the game tree searches try. Check it as `if __debug__ and TRACE_SEARCH:`, which Python compiles away
+# entirely when run with -O, so the searches pay nothing for it.
+TRACE_SEARCH = os.getenv("TRACE_SEARCH") == "1"
+
+
+def _parse_settings(setting: str) -> dict[str, str]:
+    """
+    Settings per log category, written as `category=value,category=value`.
+    """
+    return dict(item.split("=", 1) for item in setting.split(",") if "=" in item)
+
+
+# The fraction of records below WARNING kept for each category, e.g. `LOG_SAMPLE_RATES=messages=0.01,moves=0.1`.
+LOG_SAMPLE_RATES = {
+    category: float(rate) for category, rate in _parse_settings(os.getenv("LOG_SAMPLE_RATES", "")).items()
+}
+# The level of each category, e.g. `LOG_LEVELS=messages=debug`. Categories default to the level of `logger`.
+LOG_LEVELS = {category: level.upper() for category, level in _parse_settings(os.getenv("LOG_LEVELS", "")).items()}
+
+
+def _format_value(value: Any) -> str:
+    text = str(value)
+    if text and not any(character.isspace() or character in '"=' for character in text):
+        return text
+    return json.dumps(text)
+
+
+@final
+class Event:
+    """
+    A structured log message, an event name with fields, written as `name key=value key=value`. It is only formatted
+    if a handler writes it, so logging one on a disabled or sampled out category costs next to nothing.
+    """
+
+    __slots__ = ("name", "fields")
+
+    def __init__(self, name: str, **fields: Any):
+        self.name: str = name
+        self.fields: dict[str, Any] = fields
+
+    @override
+    def __str__(self) -> str:
+        return " ".join([self.name, *(f"{key}={_format_value(value)}" for key, value in self.fields.items())])
+
+
+@final
+class SampleFilter(logging.Filter):
+    """
+    Keeps a random fraction of the records below WARNING, warnings and errors are always kept.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self._rate: float = rate
+
+    @override
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self._rate
+
+
+def get_logger(category: str) -> logging.Logger:
+    """
+    The logger for a category of events, set up from `LOG_LEVELS` and `LOG_SAMPLE_RATES`.
+    """
+    category_logger = logger.getChild(category)
+    if category in LOG_LEVELS:
+        category_logger.setLevel(LOG_LEVELS[category])
+    if category in LOG_SAMPLE_RATES and not any(isinstance(f, SampleFilter) for f in category_logger.filters):
+        category_logger.addFilter(SampleFilter(LOG_SAMPLE_RATES[category]))
+    return category_logger
+
+
+@final
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue as they are, `QueueHandler` would otherwise format them in the thread logging them.
+    """
+
+    @override
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+@final
+class QueueLogging:
+    """
+    Moves the handlers of some loggers onto a background thread. The loggers only put records on a queue, so
+    formatting them and writing them out never blocks the event loop.
+    """
+
+    def __init__(self, logger_names: tuple[str, ...] = ("uvicorn", "uvicorn.access")):
+        self._moved: list[tuple[logging.Logger, list[logging.Handler]]] = []
+        self._listeners: list[logging.handlers.QueueListener] = []
+        for name in logger_names:
+            moved_logger = logging.getLogger(name)
+            # Loggers without handlers of their own pass records up to their parents, leave those as they are.
+            if not moved_logger.handlers:
+                continue
+            handlers = list(moved_logger.handlers)
+            records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+            self._listeners.append(logging.handlers.QueueListener(records, *handlers, respect_handler_level=True))
+            self._moved.append((moved_logger, handlers))
+            for handler in handlers:
+                moved_logger.removeHandler(handler)
+            moved_logger.addHandler(_DeferredQueueHandler(records))
+        for listener in self._listeners:
+            listener.start()
+
+    def stop(self):
+        """
+        Write out every queued record, then give the handlers back to their loggers.
+        """
+        for listener in self._listeners:
+            listener.stop()
+        for moved_logger, handlers in self._moved:
+            for handler in list(moved_logger.handlers):
+                if isinstance(handler, _DeferredQueueHandler):
+                    moved_logger.removeHandler(handler)
+            for handler in handlers:
+                moved_logger.addHandler(handler)
+        self._listeners = []
+        self._moved = []
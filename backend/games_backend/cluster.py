@@ -0,0 +1,187 @@
+"""
+Runs the backend as several worker processes sharing the games between them.
+
+Every worker accepts connections on the public port, and also listens on its own internal port. Games are owned by
+workers through a consistent hash ring of the internal URLs (see `games_backend.sharding`), requests landing on a
+worker that does not own the game are proxied to the owner's internal port.
+
+Send the supervisor SIGTTIN to add a worker and SIGTTOU to remove one, the workers then hand the games that move over
+to their new owners. Workers that die are restarted on the same port.
+
+    python -m games_backend.cluster --workers 4 --port 8000
+"""
+
+import argparse
+import asyncio
+import logging.config
+import multiprocessing
+import os
+import secrets
+import signal
+import socket
+from multiprocessing.process import BaseProcess
+from typing import final
+
+import httpx
+import uvicorn
+
+from games_backend.app_logger import logger
+from games_backend.sharding import SHARD_TOKEN_HEADER
+
+APP = "games_backend.main:app"
+WORKER_START_TIMEOUT = 30.0
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(worker_url: str, workers: list[str], token: str, sockets: list[socket.socket]):
+    # The app reads its shard from the environment when it is imported.
+    os.environ["WORKER_URL"] = worker_url
+    os.environ["WORKER_URLS"] = ",".join(workers)
+    os.environ["SHARD_TOKEN"] = token
+    uvicorn.Server(uvicorn.Config(APP, lifespan="on")).run(sockets=sockets)
+
+
+@final
+class Worker:
+    def __init__(self, url: str, sock: socket.socket):
+        self.url: str = url
+        self.socket: socket.socket = sock
+        self.process: BaseProcess | None = None
+
+
+@final
+class Cluster:
+    """
+    Supervises the worker processes, keeping them running and telling them whenever the set of workers changes.
+    """
+
+    def __init__(self, public_socket: socket.socket, internal_host: str, internal_port: int):
+        self._public_socket: socket.socket = public_socket
+        self._internal_host: str = internal_host
+        self._next_port: int = internal_port
+        self._token: str = secrets.token_urlsafe(32)
+        self._workers: list[Worker] = []
+        self._context = multiprocessing.get_context("spawn")
+        self._changes: asyncio.Queue[int] = asyncio.Queue()
+        self._stopping = asyncio.Event()
+
+    @property
+    def worker_urls(self) -> list[str]:
+        return [worker.url for worker in self._workers]
+
+    async def run(self, number_of_workers: int):
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTTIN, self._changes.put_nowait, 1)
+        loop.add_signal_handler(signal.SIGTTOU, self._changes.put_nowait, -1)
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(stop_signal, self._stopping.set)
+        async with httpx.AsyncClient(headers={SHARD_TOKEN_HEADER: self._token}, trust_env=False) as client:
+            for _ in range(number_of_workers):
+                self._workers.append(self._new_worker())
+            for worker in self._workers:
+                self._start(worker)
+            logger.info(f"Started {number_of_workers} workers: {self.worker_urls}")
+            while not self._stopping.is_set():
+                try:
+                    change = await asyncio.wait_for(self._changes.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    if not self._stopping.is_set():
+                        self._restart_dead_workers()
+                    continue
+                if change > 0:
+                    await self._add_worker(client)
+                elif len(self._workers) > 1:
+                    await self._remove_worker(client)
+        for worker in self._workers:
+            self._stop(worker)
+
+    def _new_worker(self) -> Worker:
+        sock = _bind(self._internal_host, self._next_port)
+        self._next_port += 1
+        return Worker(f"http://{self._internal_host}:{sock.getsockname()[1]}", sock)
+
+    def _start(self, worker: Worker):
+        worker.process = self._context.Process(
+            target=_run_worker,
+            args=(worker.url, self.worker_urls, self._token, [self._public_socket, worker.socket]),
+        )
+        worker.process.start()
+
+    def _stop(self, worker: Worker):
+        if worker.process is not None and worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join()
+        worker.socket.close()
+
+    def _restart_dead_workers(self):
+        for worker in self._workers:
+            if worker.process is not None and not worker.process.is_alive():
+                logger.warning(f"Worker {worker.url} exited with {worker.process.exitcode}, restarting it.")
+                self._start(worker)
+
+    async def _add_worker(self, client: httpx.AsyncClient):
+        worker = self._new_worker()
+        self._workers.append(worker)
+        self._start(worker)
+        await self._wait_until_ready(client, worker)
+        await self._announce(client, self._workers[:-1])
+        logger.info(f"Added worker {worker.url}.")
+
+    async def _remove_worker(self, client: httpx.AsyncClient):
+        worker = self._workers.pop()
+        # The removed worker is told as well, so it hands over every game it has.
+        await self._announce(client, [*self._workers, worker])
+        self._stop(worker)
+        logger.info(f"Removed worker {worker.url}.")
+
+    async def _announce(self, client: httpx.AsyncClient, recipients: list[Worker]):
+        """
+        Tell the workers about the current set of workers, they hand over the games they no longer own.
+        """
+        membership = {"workers": self.worker_urls}
+        responses = await asyncio.gather(
+            *(client.post(f"{worker.url}/internal/workers", json=membership, timeout=None) for worker in recipients),
+            return_exceptions=True,
+        )
+        for worker, response in zip(recipients, responses):
+            if isinstance(response, BaseException) or response.is_error:
+                logger.error(f"Failed to rebalance worker {worker.url}: {response!r}")
+
+    async def _wait_until_ready(self, client: httpx.AsyncClient, worker: Worker):
+        deadline = asyncio.get_running_loop().time() + WORKER_START_TIMEOUT
+        while asyncio.get_running_loop().time() < deadline:
+            try:
+                if (await client.get(f"{worker.url}/")).is_success:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+        logger.error(f"Worker {worker.url} did not start within {WORKER_START_TIMEOUT} seconds.")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Run the games backend as several worker processes.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "1")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--internal-host", default="127.0.0.1")
+    parser.add_argument("--internal-port", type=int, default=8100)
+    args = parser.parse_args(argv)
+    if args.workers < 2:
+        uvicorn.run(APP, host=args.host, port=args.port)
+        return
+    logging.config.dictConfig(uvicorn.config.LOGGING_CONFIG)
+    cluster = Cluster(_bind(args.host, args.port), args.internal_host, args.internal_port)
+    asyncio.run(cluster.run(args.workers))
+
+
+if __name__ == "__main__":
+    main()
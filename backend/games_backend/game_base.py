@@ -1,8 +1,13 @@
 import abc
-from typing import Any
+from collections.abc import Hashable
+from typing import Any, ClassVar, Self
 
-from games_backend import models
+import pydantic
+
+from games_backend import metrics, models
 from games_backend.ai_base import GameAI
+from games_backend.json_patch import make_json_patch
+from games_backend.snapshot import SnapshotError, SnapshotReader, SnapshotWriter
 
 
 class GameBase(abc.ABC):
@@ -10,9 +15,162 @@ class GameBase(abc.ABC):
     Abstract base class for game implementations.
     """
 
+    # Incremented every time a function call changes the game state.
+    _state_version: int = 0
+
+    # Identifies the game type in snapshots, every game that can be snapshotted sets a unique code.
+    snapshot_code: ClassVar[int | None] = None
+    # Bumped whenever a game changes its snapshot payload, so older snapshots can still be read.
+    snapshot_format: ClassVar[int] = 1
+    _snapshot_types: ClassVar[dict[int, type["GameBase"]]] = {}
+
+    # The parameters model of every function the game handles. The game manager compiles these into a single parser,
+    # so requests from clients reach the game already validated.
+    function_schemas: ClassVar[dict[str, type[pydantic.BaseModel]]] = {}
+
+    # The game's metrics are labelled with its game type, or its class name for games without one.
+    game_type: ClassVar[models.GameType | None] = None
+    metrics_label: ClassVar[str]
+    _function_call_seconds: ClassVar[metrics.HistogramChild]
+    _game_state_seconds: ClassVar[metrics.HistogramChild]
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.metrics_label = cls.__name__ if cls.game_type is None else cls.game_type.value
+        cls._function_call_seconds = metrics.FUNCTION_CALL_SECONDS.labels(cls.metrics_label)
+        cls._game_state_seconds = metrics.GAME_STATE_SECONDS.labels(cls.metrics_label)
+        if cls.snapshot_code is None:
+            return
+        if (existing := GameBase._snapshot_types.get(cls.snapshot_code)) is not None and existing is not cls:
+            raise ValueError(f"Snapshot code {cls.snapshot_code} is used by both {existing} and {cls}.")
+        GameBase._snapshot_types[cls.snapshot_code] = cls
+
+    @property
+    def state_version(self) -> int:
+        """
+        Monotonically increasing version of the game state.
+        """
+        return self._state_version
+
+    def perform_function_call(
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
+    ) -> models.ErrorResponse | None:
+        """
+        Handle a function call, moving the state version on if it was successful.
+        """
+        response = self._timed_function_call(player_position, function_name, function_parameters)
+        if response is None:
+            self._state_version += 1
+        return response
+
+    def _timed_function_call(
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
+    ) -> models.ErrorResponse | None:
+        with self._function_call_seconds.time():
+            return self.handle_function_call(player_position, function_name, function_parameters)
+
+    async def perform_function_call_async(
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
+    ) -> models.ErrorResponse | None:
+        """
+        Handle a function call without blocking the event loop on expensive game logic. Calls the game marks as
+        expensive (see `is_expensive_function_call`) are handled by `handle_function_call_async`, the rest as usual.
+        """
+        if not self.is_expensive_function_call(function_name):
+            return self.perform_function_call(player_position, function_name, function_parameters)
+        with self._function_call_seconds.time():
+            response = await self.handle_function_call_async(player_position, function_name, function_parameters)
+        if response is None:
+            self._state_version += 1
+        return response
+
+    async def handle_function_call_async(
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
+    ) -> models.ErrorResponse | None:
+        """
+        Handle an expensive function call. Games that mark calls as expensive override this to do the expensive work in
+        an executor, and must then keep to this contract:
+
+        - The work only touches a private copy of the state it changes, never the game's own objects, so until it is
+          done the game serves its last committed state.
+        - The result is committed on the event loop, by assigning the changed state back to the game, and only if the
+          call succeeds. The game's other objects are left as they are.
+
+        By default the call is handled inline.
+        """
+        return self.handle_function_call(player_position, function_name, function_parameters)
+
+    def to_snapshot(self) -> bytes:
+        """
+        Versioned binary form of the game, a header of the game's snapshot code, format and state version followed by
+        the game's own payload.
+        """
+        if self.snapshot_code is None:
+            raise SnapshotError(f"{type(self).__name__} does not support snapshots.")
+        writer = SnapshotWriter()
+        writer.write_uint(self.snapshot_code)
+        writer.write_uint(self.snapshot_format)
+        writer.write_uint(self._state_version)
+        self.write_snapshot(writer)
+        return writer.to_bytes()
+
+    @staticmethod
+    def from_snapshot(data: bytes) -> "GameBase":
+        """
+        Rebuild a game from `to_snapshot`, the game's module must have been imported so its type is registered.
+        """
+        reader = SnapshotReader(data)
+        snapshot_code = reader.read_uint()
+        if (game_type := GameBase._snapshot_types.get(snapshot_code)) is None:
+            raise SnapshotError(f"Unknown snapshot code {snapshot_code}.")
+        snapshot_format = reader.read_uint()
+        if snapshot_format > game_type.snapshot_format:
+            raise SnapshotError(f"Snapshot format {snapshot_format} of {game_type.__name__} is newer than supported.")
+        state_version = reader.read_uint()
+        game = game_type.read_snapshot(reader, snapshot_format)
+        if not reader.is_exhausted:
+            raise SnapshotError(f"Trailing data after {game_type.__name__} snapshot.")
+        game._state_version = state_version
+        return game
+
+    @abc.abstractmethod
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        """
+        Write the game's snapshot payload.
+        """
+
+    @classmethod
+    @abc.abstractmethod
+    def read_snapshot(cls, reader: SnapshotReader, snapshot_format: int) -> Self:
+        """
+        Build a game from the payload written by `write_snapshot` in the given format.
+        """
+
+    def check_function_call(self, player_position: int, function_name: str) -> str | None:
+        """
+        Cheap checks on a function call made before its parameters are parsed, returning why the call is rejected or
+        None if it may go ahead. The game still checks every call it handles, by default nothing is rejected early.
+        """
+        return None
+
+    def is_expensive_function_call(self, function_name: str) -> bool:
+        """
+        Whether a function call is expensive enough to be run off the event loop. Games with CPU heavy logic override
+        this to opt in, by default every call is cheap.
+        """
+        return False
+
+    def last_function_call_is_replayable(self) -> bool:
+        """
+        Whether repeating the last successful function call on the state before it is sure to give the current state.
+        Games that sometimes draw at random return False after a call that did, so a snapshot is stored instead of
+        the call being logged.
+        """
+        return True
+
     @abc.abstractmethod
     def handle_function_call(
-        self, player_position: int, function_name: str, function_parameters: dict[str, Any]
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
     ) -> models.ErrorResponse | None:
         """
         Get the model to pass the game parameters.
@@ -24,6 +182,41 @@ class GameBase(abc.ABC):
         Get the game state as seen by the provided position.
         """
 
+    def get_game_state_snapshot(self, position: int | None) -> models.GameStateResponse:
+        """
+        Get the game state as seen by the provided position, stamped with the current state version.
+        """
+        with self._game_state_seconds.time():
+            response = self.get_game_state_response(position)
+        response.state_version = self._state_version
+        return response
+
+    def get_game_state_delta(
+        self, previous: models.GameStateResponse, current: models.GameStateResponse
+    ) -> models.GameStateDeltaResponse:
+        """
+        Get the changes between two snapshots of the same view. By default this is a JSON patch between the two sets of
+        parameters, games can override this if they can describe their changes more cheaply.
+        """
+        return models.GameStateDeltaResponse(
+            parameters=models.GameStateDeltaResponseParameters(
+                from_version=previous.state_version,
+                to_version=current.state_version,
+                patch=make_json_patch(
+                    getattr(previous, "parameters").model_dump(mode="json"),
+                    getattr(current, "parameters").model_dump(mode="json"),
+                ),
+            )
+        )
+
+    def get_view_key(self, position: int | None) -> Hashable:
+        """
+        Key for the view of the game state the provided position sees. Positions sharing a key must get identical
+        game state responses, so the response only needs to be built once for all of them. By default every position
+        has its own view.
+        """
+        return position
+
     @abc.abstractmethod
     def get_max_players(self) -> int:
         """
@@ -48,3 +241,9 @@ class GameBase(abc.ABC):
         """
         Get the metadata for this game to help users connect.
         """
+
+    def get_index_entry(self) -> models.GameIndexEntry:
+        """
+        The fields of this game that never change, stored so they can be looked up without loading the game.
+        """
+        return models.GameIndexEntry(metadata=self.get_metadata(), ai_models=self.get_game_ai_named())
@@ -1,12 +1,16 @@
+import asyncio
+import copy
+import json
 import random
 from abc import ABC, abstractmethod
-from typing import Any, override
+from collections.abc import Hashable
+from typing import Self, override
 
 import pydantic
 
 from games_backend import game_base, models
 from games_backend.ai_base import GameAI
-from games_backend.app_logger import logger
+from games_backend.app_logger import Event, get_logger
 from games_backend.games.quantum.logic import ContradictionError, QuantumLogic
 from games_backend.games.quantum.models import (
     QuantumActionOutcome,
@@ -15,6 +19,9 @@ from games_backend.games.quantum.models import (
     QuantumGameStateResponse,
     QuantumLogEntry,
 )
+from games_backend.snapshot import SnapshotReader, SnapshotWriter
+
+move_logger = get_logger("moves")
 
 
 class TargetPlayerParameters(pydantic.BaseModel):
@@ -50,6 +57,18 @@ class SetSuitNameParameters(pydantic.BaseModel):
 
 
 class QuantumGame(game_base.GameBase):
+    game_type = models.GameType.QUANTUM
+    snapshot_code = 5
+    function_schemas = {
+        "set_suit_name": SetSuitNameParameters,
+        "set_hint_level": SetHintLevelParameters,
+        "target_player": TargetPlayerParameters,
+        "respond_to_target": RespondToTargetParameters,
+        "claim_no_win": models.NoParameters,
+        "claim_own_suit": ClaimOwnSuitParameters,
+        "claim_all_suits_determined": ClaimAllSuitsDeterminedParameters,
+    }
+
     def __init__(self, number_of_players: int, max_hint_level: models.QuantumHintLevel) -> None:
         self._number_of_players: int = number_of_players
         self._max_hint_level: models.QuantumHintLevel = max_hint_level
@@ -61,13 +80,63 @@ class QuantumGame(game_base.GameBase):
         self._contradiction_count: dict[int, int] = {i: 0 for i in range(number_of_players)}
         self._game_log: list[QuantumLogEntry] = []
 
+    @override
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        writer.write_uint(self._number_of_players)
+        writer.write_uint(self._max_hint_level.value)
+        for player in range(self._number_of_players):
+            writer.write_uint(self._player_hint_levels[player].value)
+            suit_name = self._player_suit_names[player]
+            writer.write_bool(suit_name is not None)
+            if suit_name is not None:
+                writer.write_string(suit_name)
+            writer.write_uint(self._contradiction_count[player])
+        writer.write_uint(len(self._game_log))
+        for entry in self._game_log:
+            writer.write_uint(entry.player)
+            writer.write_string(entry.function_call)
+            # Parameters are the request as the client sent it, so they are already JSON compatible.
+            writer.write_string(json.dumps(entry.parameters, separators=(",", ":")))
+            writer.write_string(entry.outcome.value)
+            writer.write_uint(entry.move_number)
+        self._logic.write_snapshot(writer)
+
+    @override
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader, snapshot_format: int) -> Self:
+        game = cls(number_of_players=reader.read_uint(), max_hint_level=models.QuantumHintLevel(reader.read_uint()))
+        for player in range(game._number_of_players):
+            game._player_hint_levels[player] = models.QuantumHintLevel(reader.read_uint())
+            game._player_suit_names[player] = reader.read_string() if reader.read_bool() else None
+            game._contradiction_count[player] = reader.read_uint()
+        game._game_log = [
+            QuantumLogEntry(
+                player=reader.read_uint(),
+                function_call=reader.read_string(),
+                parameters=json.loads(reader.read_string()),
+                outcome=QuantumActionOutcome(reader.read_string()),
+                move_number=reader.read_uint(),
+            )
+            for _ in range(reader.read_uint())
+        ]
+        game._logic = QuantumLogic.read_snapshot(reader, game._number_of_players)
+        return game
+
+    @override
+    def check_function_call(self, player_position: int, function_name: str) -> str | None:
+        if self._player_suit_names[player_position] is None and function_name != "set_suit_name":
+            return "Suit name must be set before making moves."
+        return None
+
     @override
     def handle_function_call(
-        self, player_position: int, function_name: str, function_parameters: dict[str, Any]
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
     ) -> models.ErrorResponse | None:
         """Handle player actions in the quantum go fish game."""
         if self._player_suit_names[player_position] is None and function_name != "set_suit_name":
-            logger.info(f"Player {player_position} tried to call {function_name} without setting suit name.")
+            move_logger.info(
+                Event("invalid_move", player=player_position, function=function_name, reason="no_suit_name")
+            )
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message="Suit name must be set before making moves.")
             )
@@ -75,20 +144,25 @@ class QuantumGame(game_base.GameBase):
         match function_name:
             case "set_suit_name":
                 try:
-                    parsed_parameters = SetSuitNameParameters(**function_parameters)
+                    parsed_parameters = models.parse_function_parameters(SetSuitNameParameters, function_parameters)
                 except pydantic.ValidationError as e:
-                    logger.info(f"Player {player_position} provided invalid parameters: {e}")
+                    move_logger.info(Event("invalid_parameters", player=player_position, error=e))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {e}")
                     )
                 if self._player_suit_names[player_position] is not None:
-                    logger.info(f"Player {player_position} tried to set suit name again: {parsed_parameters.suit_name}")
+                    move_logger.info(Event("invalid_move", player=player_position, reason="suit_name_already_set"))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message="Suit name already set.")
                     )
                 if parsed_parameters.suit_name in self._player_suit_names.values():
-                    logger.info(
-                        f"Player {player_position} tried to set a duplicate suit name: {parsed_parameters.suit_name}"
+                    move_logger.info(
+                        Event(
+                            "invalid_move",
+                            player=player_position,
+                            suit_name=parsed_parameters.suit_name,
+                            reason="taken",
+                        )
                     )
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message="Suit name already taken.")
@@ -98,130 +172,73 @@ class QuantumGame(game_base.GameBase):
                     QuantumLogEntry(
                         player=player_position,
                         function_call=function_name,
-                        parameters=function_parameters,
+                        parameters=models.function_parameters_as_dict(function_parameters),
                         outcome=QuantumActionOutcome.SUCCESS,
                         move_number=0,
                     )
                 )
             case "set_hint_level":
                 try:
-                    parsed_parameters = SetHintLevelParameters(**function_parameters)
+                    parsed_parameters = models.parse_function_parameters(SetHintLevelParameters, function_parameters)
                 except pydantic.ValidationError as e:
-                    logger.info(f"Player {player_position} provided invalid parameters: {e}")
+                    move_logger.info(Event("invalid_parameters", player=player_position, error=e))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {e}")
                     )
                 if parsed_parameters.hint_level.value > self._max_hint_level.value:
-                    logger.info(
-                        f"Player {player_position} tried to set an invalid hint level: {parsed_parameters.hint_level}"
+                    move_logger.info(
+                        Event(
+                            "invalid_move",
+                            player=player_position,
+                            hint_level=parsed_parameters.hint_level.name,
+                            reason="above_max_hint_level",
+                        )
                     )
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message="Invalid hint level.")
                     )
                 if parsed_parameters.hint_level.value < self._player_hint_levels[player_position].value:
-                    logger.info(
-                        f"Player {player_position} tried to set a lower hint level than current: "
-                        + f"{parsed_parameters.hint_level}"
-                    )
-                    return models.ErrorResponse(
-                        parameters=models.ErrorResponseParameters(error_message="Cannot lower hint level.")
-                    )
-                self._player_hint_levels[player_position] = parsed_parameters.hint_level
-            case "target_player":
-                try:
-                    parsed_parameters = TargetPlayerParameters(**function_parameters)
-                except pydantic.ValidationError as e:
-                    logger.info(f"Player {player_position} provided invalid parameters: {e}")
-                    return models.ErrorResponse(
-                        parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {e}")
-                    )
-                try:
-                    self._logic.target_player(
-                        player_position, parsed_parameters.targeted_player, parsed_parameters.suit
-                    )
-                    self._game_log.append(
-                        QuantumLogEntry(
+                    move_logger.info(
+                        Event(
+                            "invalid_move",
                             player=player_position,
-                            function_call=function_name,
-                            parameters=function_parameters,
-                            outcome=QuantumActionOutcome.SUCCESS,
-                            move_number=self._logic.move_number,
+                            hint_level=parsed_parameters.hint_level.name,
+                            reason="lower_hint_level",
                         )
                     )
-                    return None
-                except ValueError as e:
-                    logger.info(f"Player {player_position} made an invalid move: {e}")
                     return models.ErrorResponse(
-                        parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {e}")
-                    )
-                except ContradictionError as e:
-                    logger.info(f"Player {player_position} made a contradictory move: {e}")
-                    self._contradiction_count[player_position] += 1
-                    self._game_log.append(
-                        QuantumLogEntry(
-                            player=player_position,
-                            function_call=function_name,
-                            parameters=function_parameters,
-                            outcome=QuantumActionOutcome.CONTRADICTION_REVERTED,
-                            move_number=self._logic.move_number,
-                        )
-                    )
-                    return None
-
-            case "respond_to_target":
-                try:
-                    parsed_parameters = RespondToTargetParameters(**function_parameters)
-                except pydantic.ValidationError as e:
-                    logger.info(f"Player {player_position} provided invalid parameters: {e}")
-                    return models.ErrorResponse(
-                        parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {e}")
+                        parameters=models.ErrorResponseParameters(error_message="Cannot lower hint level.")
                     )
+                self._player_hint_levels[player_position] = parsed_parameters.hint_level
+            case "target_player" | "respond_to_target":
+                move = self._parse_logic_move(player_position, function_name, function_parameters)
+                if isinstance(move, models.ErrorResponse):
+                    return move
                 try:
-                    self._logic.respond_to_target(player_position, parsed_parameters.response)
-                    self._game_log.append(
-                        QuantumLogEntry(
-                            player=player_position,
-                            function_call=function_name,
-                            parameters=function_parameters,
-                            outcome=QuantumActionOutcome.SUCCESS,
-                            move_number=self._logic.move_number,
-                        )
-                    )
-                    return None
+                    outcome = self._apply_logic_move(self._logic, player_position, move)
                 except ValueError as e:
-                    logger.info(f"Player {player_position} made an invalid move: {e}")
+                    move_logger.info(Event("invalid_move", player=player_position, error=e))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {e}")
                     )
-                except ContradictionError as e:
-                    logger.info(f"Player {player_position} made a contradictory move: {e}")
-                    self._contradiction_count[player_position] += 1
-                    self._game_log.append(
-                        QuantumLogEntry(
-                            player=player_position,
-                            function_call=function_name,
-                            parameters=function_parameters,
-                            outcome=QuantumActionOutcome.CONTRADICTION_REVERTED,
-                            move_number=self._logic.move_number,
-                        )
-                    )
-                    return None
+                self._record_logic_move(player_position, function_name, function_parameters, outcome)
+                return None
 
             case "claim_no_win":
                 try:
                     self._logic.claim_no_win(player_position)
                     return None
                 except ValueError as e:
-                    logger.info(f"Player {player_position} made an invalid move: {e}")
+                    move_logger.info(Event("invalid_move", player=player_position, error=e))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {e}")
                     )
 
             case "claim_own_suit":
                 try:
-                    parsed_parameters = ClaimOwnSuitParameters(**function_parameters)
+                    parsed_parameters = models.parse_function_parameters(ClaimOwnSuitParameters, function_parameters)
                 except pydantic.ValidationError as e:
-                    logger.info(f"Player {player_position} provided invalid parameters: {e}")
+                    move_logger.info(Event("invalid_parameters", player=player_position, error=e))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {e}")
                     )
@@ -231,25 +248,25 @@ class QuantumGame(game_base.GameBase):
                         QuantumLogEntry(
                             player=player_position,
                             function_call=function_name,
-                            parameters=function_parameters,
+                            parameters=models.function_parameters_as_dict(function_parameters),
                             outcome=QuantumActionOutcome.WON,
                             move_number=self._logic.move_number,
                         )
                     )
                     return None
                 except ValueError as e:
-                    logger.info(f"Player {player_position} made an invalid move: {e}")
+                    move_logger.info(Event("invalid_move", player=player_position, error=e))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {e}")
                     )
                 except ContradictionError as e:
-                    logger.info(f"Player {player_position} made a contradictory move: {e}")
+                    move_logger.info(Event("contradictory_move", player=player_position, error=e))
                     self._contradiction_count[player_position] += 1
                     self._game_log.append(
                         QuantumLogEntry(
                             player=player_position,
                             function_call=function_name,
-                            parameters=function_parameters,
+                            parameters=models.function_parameters_as_dict(function_parameters),
                             outcome=QuantumActionOutcome.CONTRADICTION_CONTINUE,
                             move_number=self._logic.move_number,
                         )
@@ -258,9 +275,11 @@ class QuantumGame(game_base.GameBase):
 
             case "claim_all_suits_determined":
                 try:
-                    parsed_parameters = ClaimAllSuitsDeterminedParameters(**function_parameters)
+                    parsed_parameters = models.parse_function_parameters(
+                        ClaimAllSuitsDeterminedParameters, function_parameters
+                    )
                 except pydantic.ValidationError as e:
-                    logger.info(f"Player {player_position} provided invalid parameters: {e}")
+                    move_logger.info(Event("invalid_parameters", player=player_position, error=e))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {e}")
                     )
@@ -270,25 +289,25 @@ class QuantumGame(game_base.GameBase):
                         QuantumLogEntry(
                             player=player_position,
                             function_call=function_name,
-                            parameters=function_parameters,
+                            parameters=models.function_parameters_as_dict(function_parameters),
                             outcome=QuantumActionOutcome.WON,
                             move_number=self._logic.move_number,
                         )
                     )
                     return None
                 except ValueError as e:
-                    logger.info(f"Player {player_position} made an invalid move: {e}")
+                    move_logger.info(Event("invalid_move", player=player_position, error=e))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {e}")
                     )
                 except ContradictionError as e:
-                    logger.info(f"Player {player_position} made a contradictory move: {e}")
+                    move_logger.info(Event("contradictory_move", player=player_position, error=e))
                     self._contradiction_count[player_position] += 1
                     self._game_log.append(
                         QuantumLogEntry(
                             player=player_position,
                             function_call=function_name,
-                            parameters=function_parameters,
+                            parameters=models.function_parameters_as_dict(function_parameters),
                             outcome=QuantumActionOutcome.CONTRADICTION_CONTINUE,
                             move_number=self._logic.move_number,
                         )
@@ -296,26 +315,117 @@ class QuantumGame(game_base.GameBase):
                     return None
 
             case _:
-                logger.info(f"Player {player_position} requested unknown function {function_name}.")
+                move_logger.info(Event("unknown_function", player=player_position, function=function_name))
                 return models.ErrorResponse(
                     parameters=models.ErrorResponseParameters(error_message=f"Function {function_name} not supported.")
                 )
 
+    @override
+    def is_expensive_function_call(self, function_name: str) -> bool:
+        """
+        Targeting and responding re-solve every hand, which takes a MILP solve per pair of players.
+        """
+        return function_name in ("target_player", "respond_to_target")
+
+    @override
+    async def handle_function_call_async(
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
+    ) -> models.ErrorResponse | None:
+        """
+        Solve in an executor against a copy of the logic, which replaces the game's logic once the move succeeds. The
+        log is only written afterwards, on the event loop.
+        """
+        if (error := self.check_function_call(player_position, function_name)) is not None:
+            return models.ErrorResponse(parameters=models.ErrorResponseParameters(error_message=error))
+        move = self._parse_logic_move(player_position, function_name, function_parameters)
+        if isinstance(move, models.ErrorResponse):
+            return move
+        committed = self._logic
+
+        def solve() -> tuple[QuantumLogic, QuantumActionOutcome]:
+            # Function calls on a game run one at a time, so the committed logic does not change while it is copied.
+            logic = copy.deepcopy(committed)
+            return logic, self._apply_logic_move(logic, player_position, move)
+
+        try:
+            logic, outcome = await asyncio.get_running_loop().run_in_executor(None, solve)
+        except ValueError as e:
+            move_logger.info(Event("invalid_move", player=player_position, error=e))
+            return models.ErrorResponse(parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {e}"))
+        self._logic = logic
+        self._record_logic_move(player_position, function_name, function_parameters, outcome)
+        return None
+
+    def _parse_logic_move(
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
+    ) -> TargetPlayerParameters | RespondToTargetParameters | models.ErrorResponse:
+        schema = TargetPlayerParameters if function_name == "target_player" else RespondToTargetParameters
+        try:
+            return models.parse_function_parameters(schema, function_parameters)
+        except pydantic.ValidationError as e:
+            move_logger.info(Event("invalid_parameters", player=player_position, error=e))
+            return models.ErrorResponse(
+                parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {e}")
+            )
+
+    @staticmethod
+    def _apply_logic_move(
+        logic: QuantumLogic, player_position: int, move: TargetPlayerParameters | RespondToTargetParameters
+    ) -> QuantumActionOutcome:
+        """
+        Make a targeting or responding move on the logic. A contradiction leaves the logic as it was, invalid moves
+        raise ValueError.
+        """
+        try:
+            if isinstance(move, TargetPlayerParameters):
+                logic.target_player(player_position, move.targeted_player, move.suit)
+            else:
+                logic.respond_to_target(player_position, move.response)
+        except ContradictionError as e:
+            move_logger.info(Event("contradictory_move", player=player_position, error=e))
+            return QuantumActionOutcome.CONTRADICTION_REVERTED
+        return QuantumActionOutcome.SUCCESS
+
+    def _record_logic_move(
+        self,
+        player_position: int,
+        function_name: str,
+        function_parameters: models.FunctionParameters,
+        outcome: QuantumActionOutcome,
+    ):
+        if outcome == QuantumActionOutcome.CONTRADICTION_REVERTED:
+            self._contradiction_count[player_position] += 1
+        self._game_log.append(
+            QuantumLogEntry(
+                player=player_position,
+                function_call=function_name,
+                parameters=models.function_parameters_as_dict(function_parameters),
+                outcome=outcome,
+                move_number=self._logic.move_number,
+            )
+        )
+
     @override
     def get_game_state_response(self, position: int | None) -> QuantumGameStateResponse:
-        """Get the current game state for the specified player position."""
-        parameters = QuantumGameStateParameters(
-            game_log=self._game_log,
-            suit_names=self._player_suit_names,
-            hint_levels=self._player_hint_levels,
-            contradiction_count=self._contradiction_count,
-            **self._logic.get_partial_state(
-                self._player_hint_levels.get(position, models.QuantumHintLevel.NONE)
-                if position is not None
-                else models.QuantumHintLevel.NONE
-            ),
+        """Get the current game state for the specified player position, built without validation."""
+        parameters = QuantumGameStateParameters.model_construct(
+            game_log=list(self._game_log),
+            suit_names=dict(self._player_suit_names),
+            hint_levels=dict(self._player_hint_levels),
+            contradiction_count=dict(self._contradiction_count),
+            **self._logic.get_partial_state(self._get_hint_level(position)),
         )
-        return QuantumGameStateResponse(parameters=parameters)
+        return QuantumGameStateResponse.model_construct(parameters=parameters)
+
+    def _get_hint_level(self, position: int | None) -> models.QuantumHintLevel:
+        if position is None:
+            return models.QuantumHintLevel.NONE
+        return self._player_hint_levels.get(position, models.QuantumHintLevel.NONE)
+
+    @override
+    def get_view_key(self, position: int | None) -> Hashable:
+        """The game state only depends on the hint level of the position."""
+        return self._get_hint_level(position)
 
     @override
     def get_max_players(self) -> int:
@@ -5,6 +5,7 @@ from games_backend.games.quantum.constants import CARDS_PER_SUIT, DEFAULT_HAND_S
 from games_backend.games.quantum.exceptions import ContradictionError
 from games_backend.games.quantum.models import QuantumHandState
 from games_backend.models import QuantumHintLevel
+from games_backend.snapshot import SnapshotReader, SnapshotWriter
 
 
 class QuantumHand:
@@ -36,6 +37,24 @@ class QuantumHand:
         # When a player says they do not have a suit, we record this here.
         self._does_not_have_suit: set[int] = set()
 
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        write_hand_counts(
+            writer, self._number_of_players, self._declared_cards, self._inferred_cards, self._does_not_have_suit
+        )
+
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader, number_of_players: int, player: int | None = None) -> Self:
+        """
+        Read a hand written by `write_snapshot` or `write_hand_counts`.
+        """
+        hand = cls(number_of_players, player)
+        suits = [*range(number_of_players), UNKNOWN_SUIT]
+        hand._declared_cards = {suit: reader.read_uint() for suit in suits}
+        hand._inferred_cards = {suit: reader.read_uint() for suit in suits}
+        does_not_have_suit = reader.read_uint()
+        hand._does_not_have_suit = {suit for suit in range(number_of_players) if does_not_have_suit & (1 << suit)}
+        return hand
+
     def _validate_suit(self, suit: int) -> None:
         """Validate that a suit number is valid for this game."""
         if suit < 0 or suit >= self._number_of_players:
@@ -195,20 +214,21 @@ class QuantumHand:
         return all(claimed_hand.get(suit, 0) == count for suit, count in self._inferred_cards.items())
 
     def export_hand(self, hint_level: QuantumHintLevel) -> QuantumHandState:
+        """The hand as seen with the given hints, built without validation from copies of the hand's state."""
         if hint_level == QuantumHintLevel.NONE:
-            return QuantumHandState(
+            return QuantumHandState.model_construct(
                 total_cards=self.total_cards,
                 suits={UNKNOWN_SUIT: self.total_cards},
                 does_not_have_suit=set(),
             )
         if hint_level == QuantumHintLevel.TRACK:
-            return QuantumHandState(
+            return QuantumHandState.model_construct(
                 total_cards=self.total_cards,
                 suits=self.declared_cards,
                 does_not_have_suit=self.suits_not_available,
             )
         if hint_level == QuantumHintLevel.FULL:
-            return QuantumHandState(
+            return QuantumHandState.model_construct(
                 total_cards=self.total_cards,
                 suits=self.inferred_cards,
                 does_not_have_suit=self.suits_not_available,
@@ -222,12 +242,12 @@ class QuantumHand:
     @property
     def inferred_cards(self) -> dict[int, int]:
         """Current inferred card counts for all suits including unknown."""
-        return copy.deepcopy(self._inferred_cards)
+        return self._inferred_cards.copy()
 
     @property
     def declared_cards(self) -> dict[int, int]:
         """Current declared card counts for all suits including unknown."""
-        return copy.deepcopy(self._declared_cards)
+        return self._declared_cards.copy()
 
     @property
     def total_cards(self) -> int:
@@ -260,3 +280,22 @@ class QuantumHand:
             f"inferred_cards={self._inferred_cards}, "
             f"does_not_have_suit={self._does_not_have_suit})"
         )
+
+
+def write_hand_counts(
+    writer: SnapshotWriter,
+    number_of_players: int,
+    declared_cards: dict[int, int],
+    inferred_cards: dict[int, int],
+    does_not_have_suit: set[int],
+) -> None:
+    """
+    Write a hand as its declared and inferred counts per suit, unknown last, then a bit mask of the suits it does not
+    have.
+    """
+    suits = [*range(number_of_players), UNKNOWN_SUIT]
+    for suit in suits:
+        writer.write_uint(declared_cards.get(suit, 0))
+    for suit in suits:
+        writer.write_uint(inferred_cards.get(suit, 0))
+    writer.write_uint(sum(1 << suit for suit in does_not_have_suit))
@@ -1,12 +1,13 @@
 import copy
-from typing import Any
+from typing import Any, Self
 
 from games_backend.games.quantum.constants import UNKNOWN_SUIT
 from games_backend.games.quantum.exceptions import ContradictionError
-from games_backend.games.quantum.hand import QuantumHand
+from games_backend.games.quantum.hand import QuantumHand, write_hand_counts
 from games_backend.games.quantum.models import QuantumGameState, QuantumHandState
 from games_backend.games.quantum.solver import SolutionResult, get_hand_solution
 from games_backend.models import QuantumHintLevel
+from games_backend.snapshot import SnapshotReader, SnapshotWriter
 
 
 class QuantumLogic:
@@ -30,6 +31,56 @@ class QuantumLogic:
         # These players cannot take turns or be targeted by other players
         self._players_are_out: set[int] = set()
 
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        """
+        The hands, turn state and history. Storing the deduced hands means loading never needs the solver.
+        """
+        for player in range(self._number_of_players):
+            self._current_hands[player].write_snapshot(writer)
+        writer.write_optional_uint(self._winner)
+        writer.write_optional_uint(self._current_target_player)
+        writer.write_optional_uint(self._current_target_suit)
+        writer.write_string(self._game_state.value)
+        writer.write_uint(self._move_number)
+        writer.write_uint(self._current_player)
+        writer.write_uint(sum(1 << player for player in self._players_are_out))
+        # Every hint level is an export of the same hands, the declared and inferred counts are enough to rebuild all.
+        declared_history = self._game_history[QuantumHintLevel.TRACK]
+        inferred_history = self._game_history[QuantumHintLevel.FULL]
+        writer.write_uint(len(declared_history))
+        for declared_hands, inferred_hands in zip(declared_history, inferred_history):
+            for player in range(self._number_of_players):
+                write_hand_counts(
+                    writer,
+                    self._number_of_players,
+                    declared_hands[player].suits,
+                    inferred_hands[player].suits,
+                    inferred_hands[player].does_not_have_suit,
+                )
+
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader, number_of_players: int) -> Self:
+        instance = cls(number_of_players)
+        instance._current_hands = {
+            player: QuantumHand.read_snapshot(reader, number_of_players, player) for player in range(number_of_players)
+        }
+        instance._winner = reader.read_optional_uint()
+        instance._current_target_player = reader.read_optional_uint()
+        instance._current_target_suit = reader.read_optional_uint()
+        instance._game_state = QuantumGameState(reader.read_string())
+        instance._move_number = reader.read_uint()
+        instance._current_player = reader.read_uint()
+        players_are_out = reader.read_uint()
+        instance._players_are_out = {player for player in range(number_of_players) if players_are_out & (1 << player)}
+        instance._game_history = {level: [] for level in QuantumHintLevel}
+        for _ in range(reader.read_uint()):
+            hands = {
+                player: QuantumHand.read_snapshot(reader, number_of_players) for player in range(number_of_players)
+            }
+            for level, history in instance._game_history.items():
+                history.append({player: hand.export_hand(level) for player, hand in hands.items()})
+        return instance
+
     def _validate_player(self, player: int) -> None:
         """Validate that a player number is valid for this game."""
         if player < 0 or player >= self._number_of_players:
@@ -252,7 +303,7 @@ class QuantumLogic:
 
     def get_partial_state(self, hint_level: QuantumHintLevel) -> dict[str, Any]:
         return {
-            "history": self._game_history[hint_level],
+            "history": list(self._game_history[hint_level]),
             "winner": self._winner,
             "game_state": self._game_state,
             "current_player": self._current_player,
@@ -2,9 +2,13 @@ import numpy as np
 import pydantic
 from scipy.optimize import Bounds, LinearConstraint, milp
 
+from games_backend import metrics
 from games_backend.games.quantum.constants import CARDS_PER_SUIT, UNKNOWN_SUIT
 from games_backend.games.quantum.hand import QuantumHand
 
+_SOLVER_SECONDS = metrics.QUANTUM_SOLVER_SECONDS.labels()
+_MILP_SOLVES = metrics.QUANTUM_MILP_SOLVES.labels()
+
 
 class SolutionResult(pydantic.BaseModel):
     """
@@ -30,6 +34,11 @@ def get_hand_solution(hands: dict[int, QuantumHand]) -> SolutionResult:
     Returns:
         SolutionResult: Saying if the solution is solvable and the minimum card requirements
     """
+    with _SOLVER_SECONDS.time():
+        return _solve(hands)
+
+
+def _solve(hands: dict[int, QuantumHand]) -> SolutionResult:
     if not hands:
         return SolutionResult(has_solution=False, minimum_requirements={})
 
@@ -50,6 +59,7 @@ def get_hand_solution(hands: dict[int, QuantumHand]) -> SolutionResult:
             minimiser = np.array([0] * (number_of_players * number_of_players))
             minimiser[player_suit_index] = 1
             result = milp(c=minimiser, constraints=constraints, bounds=bound, integrality=integrality)
+            _MILP_SOLVES.inc()
             if not result.success:
                 return SolutionResult(has_solution=False, minimum_requirements={})
             min_requirements[player][suit] = int(result.x[player_suit_index])
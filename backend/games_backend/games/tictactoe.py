@@ -1,14 +1,18 @@
 import random
 from abc import ABC, abstractmethod
+from collections.abc import Hashable
 from functools import lru_cache
-from typing import Any, override
+from typing import Self, override
 
 import pydantic
 
 from games_backend import game_base, models
 from games_backend.ai_base import GameAI
-from games_backend.app_logger import logger
+from games_backend.app_logger import Event, get_logger
 from games_backend.games.utils import check_tic_tac_toe_winner
+from games_backend.snapshot import SnapshotError, SnapshotReader, SnapshotWriter
+
+move_logger = get_logger("moves")
 
 
 class TicTacToeGameStateParameters(models.GameStateResponseParameters):
@@ -27,28 +31,38 @@ class MakeMoveParameters(pydantic.BaseModel):
 
 
 class TicTacToeGame(game_base.GameBase):
+    game_type = models.GameType.TICTACTOE
+    snapshot_code = 1
+    function_schemas = {"make_move": MakeMoveParameters}
+
     def __init__(self) -> None:
         self._history: list[list[int | None]] = [[None] * 9]
         self._move_number = 0
         self._winner = None
         self._winning_line: list[int] = []
 
+    @override
+    def check_function_call(self, player_position: int, function_name: str) -> str | None:
+        if self._move_number % 2 != player_position:
+            return f"Player {player_position} is not the current player."
+        return None
+
     @override
     def handle_function_call(
-        self, player_position: int, function_name: str, function_parameters: dict[str, Any]
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
     ) -> models.ErrorResponse | None:
         """
         Get the model to pass the game parameters.
         """
         if function_name != "make_move":
-            logger.info(f"Player {player_position} requested unknown function {function_name}.")
+            move_logger.info(Event("unknown_function", player=player_position, function=function_name))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message=f"Function {function_name} not supported.")
             )
         try:
-            parsed_move_parameters = MakeMoveParameters(**function_parameters)
+            parsed_move_parameters = models.parse_function_parameters(MakeMoveParameters, function_parameters)
         except pydantic.ValidationError as e:
-            logger.info(f"Player {player_position} provided invalid parameters: {e}")
+            move_logger.info(Event("invalid_parameters", player=player_position, error=e))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {e}")
             )
@@ -59,25 +73,24 @@ class TicTacToeGame(game_base.GameBase):
         """
         Make a move for the player.
         """
-        logger.info(f"Player {player_position} wants to move to {move}")
         if self._move_number % 2 != player_position:
-            logger.info(f"Player {player_position} is not the current player.")
+            move_logger.info(Event("invalid_move", player=player_position, move=move, reason="not_current_player"))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(
                     error_message=f"Player {player_position} is not the current player."
                 )
             )
         if self._history[-1][move] is not None:
-            logger.info(f"Move {move} is already taken.")
+            move_logger.info(Event("invalid_move", player=player_position, move=move, reason="taken"))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message=f"Move {move} is already taken.")
             )
         if self._winner is not None:
-            logger.info(f"Game already has a winner: {self._winner}.")
+            move_logger.info(Event("invalid_move", player=player_position, move=move, reason="game_over"))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message=f"Game already has a winner: {self._winner}.")
             )
-        logger.info(f"Player {player_position} moves to {move}")
+        move_logger.info(Event("move", player=player_position, move=move))
         new_board = self._history[-1].copy()
         new_board[move] = player_position
         self._history.append(new_board)
@@ -92,20 +105,52 @@ class TicTacToeGame(game_base.GameBase):
         self._winning_line = check_tic_tac_toe_winner(self._history[-1])
         if self._winning_line:
             self._winner = self._history[-1][self._winning_line[0]]
-            logger.info(f"Player {self._winner} won.")
+            move_logger.info(Event("won", player=self._winner))
             return
 
+    @override
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        """
+        The squares played in order, the board history and winner follow from them.
+        """
+        writer.write_uint(self._move_number)
+        for previous, board in zip(self._history, self._history[1:]):
+            writer.write_uint(next(square for square in range(9) if previous[square] != board[square]))
+
+    @override
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader, snapshot_format: int) -> Self:
+        game = cls()
+        for move_number in range(reader.read_uint()):
+            move = reader.read_uint()
+            if move >= 9 or game._history[-1][move] is not None:
+                raise SnapshotError(f"Invalid move {move} in snapshot.")
+            board = game._history[-1].copy()
+            board[move] = move_number % 2
+            game._history.append(board)
+            game._move_number += 1
+        game._check_winner()
+        return game
+
     @override
     def get_game_state_response(self, position: int | None) -> TicTacToeGameStateResponse:
         """
-        Get the model to pass the game parameters.
+        Get the model to pass the game parameters, built without validation as the game's own state is already valid.
+        Boards are never changed once they are in the history, so only the history itself is copied.
         """
-        return TicTacToeGameStateResponse(
-            parameters=TicTacToeGameStateParameters(
-                history=self._history, winner=self._winner, winning_line=self._winning_line
+        return TicTacToeGameStateResponse.model_construct(
+            parameters=TicTacToeGameStateParameters.model_construct(
+                history=list(self._history), winner=self._winner, winning_line=self._winning_line
             )
         )
 
+    @override
+    def get_view_key(self, position: int | None) -> Hashable:
+        """
+        The board is public, so every position sees the same game state.
+        """
+        return None
+
     @override
     def get_max_players(self) -> int:
         """
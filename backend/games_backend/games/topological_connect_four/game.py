@@ -1,16 +1,20 @@
 import random
 from abc import ABC, abstractmethod
-from typing import Any, override
+from collections.abc import Hashable
+from typing import Self, override
 
 import pydantic
 
 from games_backend import game_base, models
 from games_backend.ai_base import GameAI
-from games_backend.app_logger import logger
+from games_backend.app_logger import Event, get_logger
 from games_backend.games.exceptions import GameException
 from games_backend.games.topological_connect_four.geometry import GEOMETRY_MAP
 from games_backend.games.topological_connect_four.gravity import GRAVITY_MAP
 from games_backend.games.topological_connect_four.logic import TopologicalLogic
+from games_backend.snapshot import SnapshotReader, SnapshotWriter
+
+move_logger = get_logger("moves")
 
 
 class TopologicalGameStateParameters(models.GameStateResponseParameters):
@@ -32,6 +36,10 @@ class MakeMoveParameters(pydantic.BaseModel):
 
 
 class TopologicalGame(game_base.GameBase):
+    game_type = models.GameType.TOPOLOGICAL
+    snapshot_code = 3
+    function_schemas = {"make_move": MakeMoveParameters}
+
     def __init__(
         self, max_players: int, gravity: models.GravitySetting, geometry: models.Geometry, board_size: int = 8
     ) -> None:
@@ -47,29 +55,62 @@ class TopologicalGame(game_base.GameBase):
             gravity=GRAVITY_MAP[gravity],
         )
 
+    @override
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        """
+        The game settings then the move number of every cell, row by row.
+        """
+        writer.write_uint(self._max_players)
+        writer.write_string(self._gravity.value)
+        writer.write_string(self._geometry.value)
+        writer.write_uint(self._board_size)
+        for row in self._logic.moves:
+            for cell in row:
+                writer.write_optional_uint(cell)
+
+    @override
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader, snapshot_format: int) -> Self:
+        game = cls(
+            max_players=reader.read_uint(),
+            gravity=models.GravitySetting(reader.read_string()),
+            geometry=models.Geometry(reader.read_string()),
+            board_size=reader.read_uint(),
+        )
+        game._logic.reset_game_state(
+            [[reader.read_optional_uint() for _ in range(game._board_size)] for _ in range(game._board_size)]
+        )
+        return game
+
+    @override
+    def check_function_call(self, player_position: int, function_name: str) -> str | None:
+        if self._logic.current_player != player_position:
+            return f"It is not player {player_position} go, it is currently player {self._logic.current_player}'s go."
+        return None
+
     @override
     def handle_function_call(
-        self, player_position: int, function_name: str, function_parameters: dict[str, Any]
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
     ) -> models.ErrorResponse | None:
         """
         Get the model to pass the game parameters.
         """
         if function_name != "make_move":
-            logger.info(f"Player {player_position} requested unknown function {function_name}.")
+            move_logger.info(Event("unknown_function", player=player_position, function=function_name))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message=f"Function {function_name} not supported.")
             )
         try:
-            parsed_move_parameters = MakeMoveParameters(**function_parameters)
+            parsed_move_parameters = models.parse_function_parameters(MakeMoveParameters, function_parameters)
         except pydantic.ValidationError as game_exception:
-            logger.info(f"Player {player_position} provided invalid parameters: {game_exception}")
+            move_logger.info(Event("invalid_parameters", player=player_position, error=game_exception))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {game_exception}")
             )
         try:
             return self._logic.make_move(player_position, parsed_move_parameters.row, parsed_move_parameters.column)
         except GameException as game_exception:
-            logger.info(f"Player {player_position} made an invalid move: {game_exception}")
+            move_logger.info(Event("invalid_move", player=player_position, error=game_exception))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {game_exception}")
             )
@@ -77,11 +118,11 @@ class TopologicalGame(game_base.GameBase):
     @override
     def get_game_state_response(self, position: int | None) -> TopologicalGameStateResponse:
         """
-        Get the model to pass the game parameters.
+        Get the model to pass the game parameters, built without validation from a copy of the logic's board.
         """
-        return TopologicalGameStateResponse(
-            parameters=TopologicalGameStateParameters(
-                moves=self._logic.moves,
+        return TopologicalGameStateResponse.model_construct(
+            parameters=TopologicalGameStateParameters.model_construct(
+                moves=[list(row) for row in self._logic.moves],
                 winner=self._logic.winner,
                 winning_line=self._logic.winning_line,
                 available_moves=self._logic.get_available_moves(),
@@ -89,6 +130,13 @@ class TopologicalGame(game_base.GameBase):
             )
         )
 
+    @override
+    def get_view_key(self, position: int | None) -> Hashable:
+        """
+        The board is public, so every position sees the same game state.
+        """
+        return None
+
     @override
     def get_max_players(self) -> int:
         return self._max_players
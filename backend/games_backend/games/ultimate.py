@@ -1,13 +1,18 @@
 import random
 from abc import ABC, abstractmethod
-from typing import Any, Self, override
+from collections.abc import Hashable
+from typing import Self, override
 
 import pydantic
 
 from games_backend import game_base, models
 from games_backend.ai_base import GameAI
-from games_backend.app_logger import logger
+from games_backend.app_logger import TRACE_SEARCH, Event, get_logger
 from games_backend.games.utils import check_tic_tac_toe_winner
+from games_backend.snapshot import SnapshotError, SnapshotReader, SnapshotWriter
+
+move_logger = get_logger("moves")
+search_logger = get_logger("search")
 
 
 class UltimateGameStateParameters(models.GameStateResponseParameters):
@@ -56,6 +61,10 @@ class UltimateGameLogic:
     def winning_line(self) -> list[int]:
         return self._winning_line
 
+    @property
+    def current_player(self) -> int:
+        return self._move_number % 2
+
     @property
     def is_over(self) -> bool:
         return self._winner is not None or len(self.get_available_moves()) == 0
@@ -69,23 +78,44 @@ class UltimateGameLogic:
             instance.make_move(i % 2, moves.index(i))
         return instance
 
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        """
+        The move number of every square, the history of sectors to play and the move that won each sector.
+        """
+        for square in self._moves:
+            writer.write_optional_uint(square)
+        writer.write_uint(len(self._sector_to_play))
+        for sector in self._sector_to_play:
+            writer.write_optional_uint(sector)
+        for square in self._winning_sector_move:
+            writer.write_optional_uint(square)
+        writer.write_optional_uint(self._winner)
+
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader) -> Self:
+        instance = cls()
+        instance._moves = [reader.read_optional_uint() for _ in range(81)]
+        instance._sector_to_play = [reader.read_optional_uint() for _ in range(reader.read_uint())]
+        instance._winning_sector_move = [reader.read_optional_uint() for _ in range(9)]
+        instance._winner = reader.read_optional_uint()
+        instance._move_number = sum(square is not None for square in instance._moves)
+        if len(instance._sector_to_play) != instance._move_number + 1:
+            raise SnapshotError("Sector history does not match the number of moves.")
+        if instance._winner is not None:
+            instance._winning_line = check_tic_tac_toe_winner(instance._get_high_level_board())
+        return instance
+
     def make_move(self, player_position: int, move: int) -> None:
-        logger.info(f"Player {player_position} wants to move to position {move}")
-        if self._move_number % 2 != player_position:
-            logger.info(f"Player {player_position} is not the current player.")
+        if self.current_player != player_position:
             raise ValueError(f"Player {player_position} is not the current player.")
         if self._moves[move] is not None:
-            logger.info(f"Position {move} is already taken.")
             raise ValueError(f"Position {move} is already taken.")
         if self._sector_to_play[-1] is not None and self._sector_to_play[-1] != move // 9:
-            logger.info(f"Position {move} is not in sector {self._sector_to_play[-1]} - the current sector to play in.")
             raise ValueError(
                 f"Position {move} is not in sector {self._sector_to_play[-1]} - the current sector to play in."
             )
         if self._winning_sector_move[move // 9] is not None:
-            logger.info(f"Position {move} is in a sector that was already won.")
             raise ValueError(f"Position {move} is in a sector that was already won.")
-        logger.info(f"Player {player_position} moves to position {move}")
         self._moves[move] = self._move_number
         self._check_sector_winner(move)
         self._update_winner()
@@ -173,25 +203,46 @@ class UltimateGameLogic:
 
 
 class UltimateGame(game_base.GameBase):
+    game_type = models.GameType.ULTIMATE
+    snapshot_code = 2
+    function_schemas = {"make_move": MakeMoveParameters}
+
     def __init__(self) -> None:
         self._logic: UltimateGameLogic = UltimateGameLogic()
 
+    @override
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        self._logic.write_snapshot(writer)
+
+    @override
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader, snapshot_format: int) -> Self:
+        game = cls()
+        game._logic = UltimateGameLogic.read_snapshot(reader)
+        return game
+
+    @override
+    def check_function_call(self, player_position: int, function_name: str) -> str | None:
+        if self._logic.current_player != player_position:
+            return f"Player {player_position} is not the current player."
+        return None
+
     @override
     def handle_function_call(
-        self, player_position: int, function_name: str, function_parameters: dict[str, Any]
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
     ) -> models.ErrorResponse | None:
         """
         Get the model to pass the game parameters.
         """
         if function_name != "make_move":
-            logger.info(f"Player {player_position} requested unknown function {function_name}.")
+            move_logger.info(Event("unknown_function", player=player_position, function=function_name))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message=f"Function {function_name} not supported.")
             )
         try:
-            parsed_move_parameters = MakeMoveParameters(**function_parameters)
+            parsed_move_parameters = models.parse_function_parameters(MakeMoveParameters, function_parameters)
         except pydantic.ValidationError as e:
-            logger.info(f"Player {player_position} provided invalid parameters: {e}")
+            move_logger.info(Event("invalid_parameters", player=player_position, error=e))
             return models.ErrorResponse(
                 parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {e}")
             )
@@ -199,24 +250,32 @@ class UltimateGame(game_base.GameBase):
         try:
             self._logic.make_move(player_position, move)
         except ValueError as e:
-            logger.info(f"Player {player_position} made an invalid move: {e}")
+            move_logger.info(Event("invalid_move", player=player_position, move=move, error=e))
             return models.ErrorResponse(parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {e}"))
+        move_logger.info(Event("move", player=player_position, move=move))
 
     @override
     def get_game_state_response(self, position: int | None) -> UltimateGameStateResponse:
         """
-        Get the model to pass the game parameters.
+        Get the model to pass the game parameters, built without validation from copies of the logic's boards.
         """
-        return UltimateGameStateResponse(
-            parameters=UltimateGameStateParameters(
-                moves=self._logic.moves,
-                sector_to_play=self._logic.sector_to_play,
-                sectors_owned=self._logic.winning_sector_move,
+        return UltimateGameStateResponse.model_construct(
+            parameters=UltimateGameStateParameters.model_construct(
+                moves=list(self._logic.moves),
+                sector_to_play=list(self._logic.sector_to_play),
+                sectors_owned=list(self._logic.winning_sector_move),
                 winner=self._logic.winner,
                 winning_line=self._logic.winning_line,
             )
         )
 
+    @override
+    def get_view_key(self, position: int | None) -> Hashable:
+        """
+        The board is public, so every position sees the same game state.
+        """
+        return None
+
     @override
     def get_max_players(self) -> int:
         """
@@ -460,6 +519,8 @@ def get_minimax_score(game_logic: UltimateGameLogic, player_to_play: int) -> int
     for move in game_logic.get_available_moves():
         game_logic.make_move(player_to_play, move)
         score = get_minimax_score(game_logic, (player_to_play + 1) % 2)
+        if __debug__ and TRACE_SEARCH:
+            search_logger.debug(Event("minimax", player=player_to_play, move=move, score=score))
         game_logic.undo_last_move()
         best_score = comparison(best_score, score)
 
@@ -1,19 +1,22 @@
 import copy
 import random
 from abc import ABC, abstractmethod
-from typing import Any, override
+from typing import Self, override
 
 import pydantic
 
 from games_backend import game_base, models
 from games_backend.ai_base import GameAI
-from games_backend.app_logger import logger
+from games_backend.app_logger import Event, get_logger
 from games_backend.games.exceptions import GameException
 from games_backend.games.wizard.logic import WizardLogic
 from games_backend.games.wizard.models import (
     WizardGameStateParameters,
     WizardGameStateResponse,
 )
+from games_backend.snapshot import SnapshotReader, SnapshotWriter
+
+move_logger = get_logger("moves")
 
 
 class PlayCardParameters(pydantic.BaseModel):
@@ -26,6 +29,10 @@ class MakeBidParameters(pydantic.BaseModel):
 
 
 class WizardGame(game_base.GameBase):
+    game_type = models.GameType.WIZARD
+    snapshot_code = 4
+    function_schemas = {"make_bid": MakeBidParameters, "play_card": PlayCardParameters}
+
     def __init__(self, number_of_players: int, can_see_old_rounds: bool = False) -> None:
         self._number_of_players: int = number_of_players
         self._can_see_old_rounds: bool = can_see_old_rounds
@@ -33,20 +40,47 @@ class WizardGame(game_base.GameBase):
         self._logic: WizardLogic = WizardLogic(
             number_of_players=number_of_players,
         )
+        # Whether the last function call finished a round, dealing the next one at random.
+        self._dealt_new_round: bool = False
+
+    @override
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        writer.write_uint(self._number_of_players)
+        writer.write_bool(self._can_see_old_rounds)
+        self._logic.write_snapshot(writer)
+
+    @override
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader, snapshot_format: int) -> Self:
+        game = cls(number_of_players=reader.read_uint(), can_see_old_rounds=reader.read_bool())
+        game._logic = WizardLogic.read_snapshot(reader, game._number_of_players)
+        return game
+
+    @override
+    def last_function_call_is_replayable(self) -> bool:
+        return not self._dealt_new_round
 
     @override
     def handle_function_call(
-        self, player_position: int, function_name: str, function_parameters: dict[str, Any]
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
     ) -> models.ErrorResponse | None:
         """
         Get the model to pass the game parameters.
         """
+        round_number = self._logic.round_number
+        response = self._handle_function_call(player_position, function_name, function_parameters)
+        self._dealt_new_round = self._logic.round_number != round_number
+        return response
+
+    def _handle_function_call(
+        self, player_position: int, function_name: str, function_parameters: models.FunctionParameters
+    ) -> models.ErrorResponse | None:
         match function_name:
             case "make_bid":
                 try:
-                    parsed_bid_parameters = MakeBidParameters(**function_parameters)
+                    parsed_bid_parameters = models.parse_function_parameters(MakeBidParameters, function_parameters)
                 except pydantic.ValidationError as game_exception:
-                    logger.info(f"Player {player_position} provided invalid parameters: {game_exception}")
+                    move_logger.info(Event("invalid_parameters", player=player_position, error=game_exception))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {game_exception}")
                     )
@@ -55,27 +89,27 @@ class WizardGame(game_base.GameBase):
                         player_position, bid=parsed_bid_parameters.bid, set_suit=parsed_bid_parameters.set_suit
                     )
                 except GameException as game_exception:
-                    logger.info(f"Player {player_position} made an invalid move: {game_exception}")
+                    move_logger.info(Event("invalid_move", player=player_position, error=game_exception))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {game_exception}")
                     )
             case "play_card":
                 try:
-                    parsed_play_parameters = PlayCardParameters(**function_parameters)
+                    parsed_play_parameters = models.parse_function_parameters(PlayCardParameters, function_parameters)
                 except pydantic.ValidationError as game_exception:
-                    logger.info(f"Player {player_position} provided invalid parameters: {game_exception}")
+                    move_logger.info(Event("invalid_parameters", player=player_position, error=game_exception))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid parameters: {game_exception}")
                     )
                 try:
                     return self._logic.play_card(player_position, card=parsed_play_parameters.card)
                 except GameException as game_exception:
-                    logger.info(f"Player {player_position} made an invalid move: {game_exception}")
+                    move_logger.info(Event("invalid_move", player=player_position, error=game_exception))
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(error_message=f"Invalid move: {game_exception}")
                     )
             case _:
-                logger.info(f"Player {player_position} requested unknown function {function_name}.")
+                move_logger.info(Event("unknown_function", player=player_position, function=function_name))
                 return models.ErrorResponse(
                     parameters=models.ErrorResponseParameters(error_message=f"Function {function_name} not supported.")
                 )
@@ -83,7 +117,7 @@ class WizardGame(game_base.GameBase):
     @override
     def get_game_state_response(self, position: int | None) -> WizardGameStateResponse:
         parameters = self._logic.get_game_state(position, self._can_see_old_rounds)
-        return WizardGameStateResponse(
+        return WizardGameStateResponse.model_construct(
             parameters=parameters,
         )
 
@@ -1,5 +1,6 @@
 import copy
 import random
+from typing import Self
 
 from games_backend.games.exceptions import GameException
 from games_backend.games.wizard.models import (
@@ -8,6 +9,7 @@ from games_backend.games.wizard.models import (
     TrickRecord,
     WizardGameStateParameters,
 )
+from games_backend.snapshot import SnapshotReader, SnapshotWriter
 
 
 class WizardLogic:
@@ -25,6 +27,37 @@ class WizardLogic:
             first_bidding_player=self._starting_player,
         )
 
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        """
+        The bids and tricks of every finished round, then the round being played. Deals are random so the round is
+        stored as it was dealt.
+        """
+        writer.write_uint(self._current_round_number)
+        writer.write_uint(self._starting_player)
+        for round_number in range(1, self._current_round_number):
+            for player in range(self._number_of_players):
+                result = self._score_sheet.get_player_round_result(player, round_number)
+                writer.write_uint(result.bid)
+                writer.write_uint(result.tricks_won)
+        self._current_round.write_snapshot(writer)
+
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader, number_of_players: int) -> Self:
+        instance = cls(number_of_players=number_of_players)
+        instance._current_round_number = reader.read_uint()
+        instance._starting_player = reader.read_uint()
+        for round_number in range(1, instance._current_round_number):
+            for player in range(instance._number_of_players):
+                instance._score_sheet.add_round_result(
+                    player, round_number, bid=reader.read_uint(), tricks_won=reader.read_uint()
+                )
+        instance._current_round = GameRound.read_snapshot(
+            reader,
+            number_of_players=instance._number_of_players,
+            round_number=min(instance._current_round_number, instance.number_of_rounds),
+        )
+        return instance
+
     def set_player_bid(self, player_number: int, bid: int, set_suit: int = 5):
         self._validate_player_number(player_number)
         self._current_round.set_player_bid(player_number, bid, set_suit)
@@ -48,6 +81,10 @@ class WizardLogic:
             self.play_card(player, cards[0])
 
     def get_game_state(self, player_number: int | None, show_old_rounds: bool) -> WizardGameStateParameters:
+        """
+        The state as seen by a player, built without validation. Everything in it is either new or a copy, apart from
+        the round results and trick records which are never changed once recorded.
+        """
         playable_cards: list[int] = []
         visible_cards: dict[int, list[int]] = {}
         valid_bids: list[int] = []
@@ -81,8 +118,8 @@ class WizardLogic:
                 if current_trick[i] is None and i != player_number:
                     current_trick[i] = self._current_round.get_player_cards(i)[0]
 
-        return WizardGameStateParameters(
-            score_sheet=self._score_sheet.score_sheet,
+        return WizardGameStateParameters.model_construct(
+            score_sheet={player: dict(results) for player, results in self._score_sheet.score_sheet.items()},
             visible_cards=visible_cards,
             playable_cards=playable_cards,
             round_bids=self._current_round.get_bids(),
@@ -125,6 +162,10 @@ class WizardLogic:
     def game_over(self) -> bool:
         return self._current_round_number > self.number_of_rounds
 
+    @property
+    def round_number(self) -> int:
+        return self._current_round_number
+
     @property
     def winners(self) -> list[int]:
         if not self.game_over:
@@ -175,8 +216,16 @@ class ScoreSheet:
 
 class GameRound:
     def __init__(
-        self, number_of_players: int, round_number: int, player_starting_tricks: int, first_bidding_player: int
+        self,
+        number_of_players: int,
+        round_number: int,
+        player_starting_tricks: int,
+        first_bidding_player: int,
+        dealt_cards: tuple[dict[int, list[int]], int] | None = None,
     ):
+        """
+        Cards are dealt at random unless `dealt_cards`, each player's hand and the trump card, is given.
+        """
         self._number_of_players: int = number_of_players
         self._round_number: int = round_number
         self._player_starting_tricks: int = player_starting_tricks
@@ -185,7 +234,12 @@ class GameRound:
         self._player_cards: dict[int, list[int]] = {i: [] for i in range(self._number_of_players)}
         self._trump_card: int = -1
         self._trump_suit: int = -1
-        self._deal_cards()
+        if dealt_cards is None:
+            self._deal_cards()
+        else:
+            self._player_cards, self._trump_card = dealt_cards
+            if self._trump_card != -1:
+                self._trump_suit = _get_card_suit(self._trump_card)
 
         self._bidding_round: BiddingRound = BiddingRound(
             number_of_players=number_of_players,
@@ -198,6 +252,57 @@ class GameRound:
         self._trick_records: dict[int, TrickRecord] = {}
         self._current_trick: Trick | None = None
 
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        """
+        The deal followed by the bids and cards played so far, in order. Replaying these onto the deal rebuilds the
+        bidding, the finished tricks and the current trick.
+        """
+        plays = [
+            (player, card) for trick in self._trick_records.values() for player, card in trick.cards_played.items()
+        ]
+        if self._phase == RoundPhase.TRICK and self._current_trick is not None:
+            plays.extend(self._current_trick.played_in_order)
+        writer.write_uint(self._player_starting_tricks)
+        writer.write_uint(self._bidding_round.leading_player)
+        writer.write_optional_uint(None if self._trump_card == -1 else self._trump_card)
+        for player in range(self._number_of_players):
+            # Played cards go last so the cards still held keep their order once the plays are replayed.
+            for card in self._player_cards[player] + [card for played_by, card in plays if played_by == player]:
+                writer.write_uint(card)
+        bids = self._bidding_round.get_bids()
+        writer.write_uint(len(bids))
+        for bid in bids.values():
+            writer.write_uint(bid)
+        if _is_wizard(self._trump_card) and bids:
+            # The first bidder picked the trump suit, -1 being no trump.
+            writer.write_uint(self._bidding_round.get_trump_suit() + 1)
+        writer.write_uint(len(plays))
+        for _, card in plays:
+            writer.write_uint(card)
+
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader, number_of_players: int, round_number: int) -> Self:
+        player_starting_tricks = reader.read_uint()
+        first_bidding_player = reader.read_uint()
+        trump_card = reader.read_optional_uint()
+        player_cards = {
+            player: [reader.read_uint() for _ in range(round_number)] for player in range(number_of_players)
+        }
+        instance = cls(
+            number_of_players=number_of_players,
+            round_number=round_number,
+            player_starting_tricks=player_starting_tricks,
+            first_bidding_player=first_bidding_player,
+            dealt_cards=(player_cards, -1 if trump_card is None else trump_card),
+        )
+        bids = [reader.read_uint() for _ in range(reader.read_uint())]
+        trump_suit = reader.read_uint() - 1 if _is_wizard(instance._trump_card) and bids else 5
+        for index, bid in enumerate(bids):
+            instance.set_player_bid(instance.current_player, bid, trump_suit if index == 0 else 5)
+        for _ in range(reader.read_uint()):
+            instance.play_card(instance.current_player, reader.read_uint())
+        return instance
+
     @property
     def phase(self) -> RoundPhase:
         return self._phase
@@ -427,6 +532,10 @@ class Trick:
     def cards_played(self) -> dict[int, int | None]:
         return {player: self._cards_played.get(player, None) for player in range(self._number_of_players)}
 
+    @property
+    def played_in_order(self) -> list[tuple[int, int]]:
+        return list(self._cards_played.items())
+
     def get_playable_cards(self, cards: list[int], player_number: int) -> list[int]:
         if self._has_player_played_card(player_number):
             return []
@@ -0,0 +1,89 @@
+import copy
+from typing import Any
+
+import pydantic_core
+
+from games_backend import models
+
+
+def make_json_patch(old: Any, new: Any) -> list[models.JsonPatchOperation]:
+    """
+    Build a JSON patch (RFC 6902) that turns the JSON document `old` into `new`.
+
+    Lists that only grew at the end become appends, so game logs and histories cost O(change) rather than O(length).
+    """
+    operations: list[models.JsonPatchOperation] = []
+    _diff(old, new, "", operations)
+    return operations
+
+
+def apply_json_patch(document: Any, operations: list[models.JsonPatchOperation]) -> Any:
+    """
+    Apply a JSON patch built by `make_json_patch`, returning the patched copy of the document.
+    """
+    document = copy.deepcopy(document)
+    for operation in operations:
+        if operation.path == "":
+            document = copy.deepcopy(operation.value)
+            continue
+        *parent_path, last = _split_pointer(operation.path)
+        parent = document
+        for token in parent_path:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        match operation.op:
+            case "add" if isinstance(parent, list):
+                if last == "-":
+                    parent.append(copy.deepcopy(operation.value))
+                else:
+                    parent.insert(int(last), copy.deepcopy(operation.value))
+            case "add" | "replace":
+                if isinstance(parent, list):
+                    parent[int(last)] = copy.deepcopy(operation.value)
+                else:
+                    parent[last] = copy.deepcopy(operation.value)
+            case "remove":
+                del parent[int(last) if isinstance(parent, list) else last]
+    return document
+
+
+def _equal(old: Any, new: Any) -> bool:
+    # `==` stops at the first difference, but in Python True == 1 and 1 == 1.0 while in JSON they are different values,
+    # so values that compare equal are checked once more as encoded JSON.
+    return old is new or (old == new and pydantic_core.to_json(old) == pydantic_core.to_json(new))
+
+
+def _diff(old: Any, new: Any, path: str, operations: list[models.JsonPatchOperation]) -> None:
+    """
+    Add the operations turning `old` into `new` to `operations`. Changed subtrees are found with `==` on the dumped
+    structures and the diff stops at equal ones, so values are not encoded again at every depth.
+    """
+    if _equal(old, new):
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() - new.keys():
+            operations.append(models.JsonPatchOperation(op="remove", path=f"{path}/{_escape(key)}"))
+        for key, value in new.items():
+            child_path = f"{path}/{_escape(key)}"
+            if key in old:
+                _diff(old[key], value, child_path, operations)
+            else:
+                operations.append(models.JsonPatchOperation(op="add", path=child_path, value=value))
+        return
+    if isinstance(old, list) and isinstance(new, list):
+        if len(new) > len(old) and _equal(old, new[: len(old)]):
+            for value in new[len(old) :]:
+                operations.append(models.JsonPatchOperation(op="add", path=f"{path}/-", value=value))
+            return
+        if len(new) == len(old):
+            for index, (old_value, new_value) in enumerate(zip(old, new)):
+                _diff(old_value, new_value, f"{path}/{index}", operations)
+            return
+    operations.append(models.JsonPatchOperation(op="replace", path=path, value=new))
+
+
+def _escape(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _split_pointer(path: str) -> list[str]:
+    return [token.replace("~1", "/").replace("~0", "~") for token in path.split("/")[1:]]
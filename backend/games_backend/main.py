@@ -4,46 +4,94 @@ import os
 from collections.abc import AsyncIterator
 from typing import Annotated
 
-from fastapi import Depends, FastAPI, HTTPException, WebSocket
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from games_backend import models
-from games_backend.app_logger import logger
+from games_backend import metrics, models
+from games_backend.app_logger import QueueLogging, logger
 from games_backend.game_base import GameBase
 from games_backend.games.quantum.game import QuantumGame
 from games_backend.games.tictactoe import TicTacToeGame
 from games_backend.games.topological_connect_four.game import TopologicalGame
 from games_backend.games.ultimate import UltimateGame
 from games_backend.games.wizard.game import WizardGame
+from games_backend.manager.ai_scheduler import get_shared_ai_scheduler
 from games_backend.manager.book_manager import BookManager
-from games_backend.manager.db_manager import InMemoryDBManager
+from games_backend.manager.db_manager import DBManager, InMemoryDBManager, RedisDBManager, SQLiteDBManager
 from games_backend.manager.game_manager import GameManager
+from games_backend.sharding import Shard, ShardProxyMiddleware
+from games_backend.snapshot import SnapshotError
 from games_backend.utils import validated_game_name
 
 
 @contextlib.asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    db_manager = InMemoryDBManager()
-    app.state.book_manager = BookManager(db_manager=db_manager)
+    queue_logging = QueueLogging()
+    db_manager = get_db_manager()
+    app.state.book_manager = BookManager(db_manager=db_manager, eviction=EVICTION_SETTINGS, shard=SHARD)
     logger.info("Book manager created.")
-    # TODO: Enable auditing of games in the future
-    # _ = asyncio.create_task(audit_book_manager(app.state.book_manager))
+    auditor = asyncio.create_task(audit_book_manager(app.state.book_manager))
     yield
+    auditor.cancel()
     await app.state.book_manager.graceful_close()
+    if SHARD is not None:
+        await SHARD.aclose()
+    get_shared_ai_scheduler().shutdown()
+    queue_logging.stop()
+
+
+def get_db_manager() -> DBManager:
+    """
+    Pick the DB manager from the environment, keeping games in memory if no database is configured.
+    """
+    if redis_url := os.getenv("REDIS_URL"):
+        return RedisDBManager.from_url(redis_url)
+    if sqlite_path := os.getenv("SQLITE_PATH"):
+        return SQLiteDBManager(sqlite_path)
+    return InMemoryDBManager()
+
+
+def get_shard() -> Shard | None:
+    """
+    This worker's shard when it is one of several workers, set up by `games_backend.cluster`.
+    """
+    worker_url = os.getenv("WORKER_URL")
+    if worker_url is None:
+        return None
+    return Shard(worker_url, os.environ["WORKER_URLS"].split(","), os.environ["SHARD_TOKEN"])
 
 
 async def audit_book_manager(book_manager: BookManager):
     while not book_manager.is_closed:
-        await asyncio.sleep(60)
-        await book_manager.audit_games()
+        await asyncio.sleep(AUDIT_INTERVAL)
+        try:
+            await book_manager.audit_games()
+        except Exception as error:
+            logger.error(f"Auditing games failed: {error!r}")
 
 
+SHARD = get_shard()
+
 app = FastAPI(lifespan=lifespan)
 
 origins = [
     os.getenv("FRONTEND_URL", "http://localhost:3000"),
 ]
 
+AUDIT_INTERVAL = float(os.getenv("AUDIT_INTERVAL", "60"))
+
+EVICTION_SETTINGS = models.EvictionSettings(
+    idle_ttl=float(os.getenv("GAME_IDLE_TTL", "600")),
+    max_resident_games=int(max_games) if (max_games := os.getenv("MAX_RESIDENT_GAMES")) else None,
+    memory_budget_bytes=int(budget) * 2**20 if (budget := os.getenv("MEMORY_BUDGET_MB")) else None,
+)
+
+OUTBOUND_QUEUE_SETTINGS = models.OutboundQueueSettings(
+    max_size=int(os.getenv("OUTBOUND_QUEUE_SIZE", "64")),
+    overflow_policy=models.OverflowPolicy(os.getenv("OUTBOUND_OVERFLOW_POLICY", "keep_latest")),
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -51,6 +99,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it sees requests first, requests for games owned by another worker are proxied before anything else.
+app.add_middleware(ShardProxyMiddleware, get_shard=lambda: SHARD)
 
 
 def get_book_manager() -> BookManager:
@@ -155,7 +205,7 @@ async def get_game_models(
 ) -> models.ModelResponse:
     try:
         game_models = await book_manager.get_game_models(game_name)
-    except ValueError:
+    except (KeyError, ValueError):
         logger.info(f"Game {game_name} not found.")
         raise HTTPException(status_code=404, detail=f"Game {game_name} not found")
     logger.info(f"Game models for {game_name} obtained.")
@@ -172,13 +222,64 @@ async def get_game_metadata(
     """
     try:
         metadata = await book_manager.get_game_metadata(game_name)
-    except ValueError:
+    except (KeyError, ValueError):
         logger.info(f"Game {game_name} not found.")
         raise HTTPException(status_code=404, detail=f"Game {game_name} not found")
     logger.info(f"Game metadata for {game_name} obtained.")
     return metadata
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(book_manager: Annotated[BookManager, Depends(get_book_manager)]) -> PlainTextResponse:
+    """
+    This worker's metrics in the Prometheus text format.
+    """
+    book_manager.update_metrics()
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# -------------------------------------
+# Internal API, used between workers
+# -------------------------------------
+
+
+def get_trusted_shard(x_shard_token: Annotated[str | None, Header()] = None) -> Shard:
+    """
+    Dependency to get this worker's shard, only for requests from the other workers.
+    """
+    if SHARD is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not SHARD.is_trusted(x_shard_token):
+        raise HTTPException(status_code=403, detail="Not a worker of this cluster")
+    return SHARD
+
+
+@app.put("/internal/game/{game_name}")
+async def receive_game(
+    game_name: Annotated[str, Depends(validated_game_name)],
+    request: Request,
+    book_manager: Annotated[BookManager, Depends(get_book_manager)],
+    _: Annotated[Shard, Depends(get_trusted_shard)],
+) -> models.SimpleResponse:
+    try:
+        await book_manager.receive_game(game_name, await request.body())
+    except SnapshotError as error:
+        raise HTTPException(status_code=400, detail=f"Invalid snapshot for game {game_name}: {error}")
+    logger.info(f"Game {game_name} handed over to this worker.")
+    return models.SimpleResponse(parameters=models.SimpleResponseParameters(message=game_name))
+
+
+@app.post("/internal/workers")
+async def set_workers(
+    membership: models.ShardMembership,
+    book_manager: Annotated[BookManager, Depends(get_book_manager)],
+    _: Annotated[Shard, Depends(get_trusted_shard)],
+) -> models.SimpleResponse:
+    moved = await book_manager.rebalance(membership.workers)
+    logger.info(f"Workers changed to {membership.workers}, handed over {len(moved)} games.")
+    return models.SimpleResponse(parameters=models.SimpleResponseParameters(message=f"Handed over {len(moved)} games"))
+
+
 # -------------------------------------
 # Websocket API
 # -------------------------------------
@@ -189,6 +290,17 @@ async def websocket_endpoint(
     game_name: Annotated[str, Depends(validated_game_name)],
     client_websocket: WebSocket,
     book_manager: Annotated[BookManager, Depends(get_book_manager)],
+    encoding: models.FrameEncoding = models.FrameEncoding.JSON,
+    features: Annotated[list[models.ClientFeature], Query()] = [],
+    resume_token: str | None = None,
+    last_seen: int = 0,
 ):
     game = await book_manager.get_game(game_name)
-    await game.handle_connection(client_websocket)
+    await game.handle_connection(
+        client_websocket,
+        encoding=encoding,
+        features=frozenset(features),
+        settings=OUTBOUND_QUEUE_SETTINGS,
+        resume_token=resume_token,
+        last_seen=last_seen,
+    )
@@ -1,6 +1,6 @@
 import random
 from collections.abc import Awaitable
-from typing import Any, Callable, Self
+from typing import Callable, ClassVar, Self
 
 import pydantic
 
@@ -20,6 +20,11 @@ class RemoveAIParameters(pydantic.BaseModel):
 
 
 class AIManager:
+    function_schemas: ClassVar[dict[str, type[pydantic.BaseModel]]] = {
+        "add_ai": AddAIParameters,
+        "remove_ai": RemoveAIParameters,
+    }
+
     def __init__(
         self,
         game_models: dict[str, type[GameAI]],
@@ -65,12 +70,12 @@ class AIManager:
         }
 
     async def handle_function_call(
-        self, requester_client_id: str, function_name: str, function_parameters: dict[str, Any]
+        self, requester_client_id: str, function_name: str, function_parameters: models.FunctionParameters
     ) -> models.ErrorResponse | None:
         match function_name:
             case "add_ai":
                 try:
-                    parsed_parameters = AddAIParameters.model_validate(function_parameters)
+                    parsed_parameters = models.parse_function_parameters(AddAIParameters, function_parameters)
                 except pydantic.ValidationError as error:
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(
@@ -90,7 +95,7 @@ class AIManager:
                 return await self._add_ai(parsed_parameters.ai_model, parsed_parameters.position)
             case "remove_ai":
                 try:
-                    parsed_parameters = RemoveAIParameters.model_validate(function_parameters)
+                    parsed_parameters = models.parse_function_parameters(RemoveAIParameters, function_parameters)
                 except pydantic.ValidationError as error:
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(
@@ -0,0 +1,134 @@
+import asyncio
+import collections
+import functools
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, final
+
+from games_backend.app_logger import logger
+
+
+@final
+class _AIJob:
+    def __init__(
+        self, think: Callable[[], Any], on_done: Callable[[Any], None], human_facing: bool, done: asyncio.Future[None]
+    ):
+        self.think: Callable[[], Any] = think
+        self.on_done: Callable[[Any], None] = on_done
+        self.human_facing: bool = human_facing
+        self.done: asyncio.Future[None] = done
+
+    def finish(self) -> None:
+        if not self.done.done():
+            self.done.set_result(None)
+
+
+@final
+class AIScheduler:
+    """
+    Runs AI decisions on a worker pool shared by every game, so thinking never blocks the event loop.
+
+    Jobs are submitted to FIFO queues, the game manager gives each AI player its own. Free workers are handed out round
+    robin across the queues with jobs, those of games with human players first, and no queue runs more than
+    `max_per_queue` jobs at once. With the default cap of one, the jobs of a queue run one at a time in the order they
+    were submitted, which the game manager relies on to never run an AI on two threads at once.
+    """
+
+    def __init__(self, max_workers: int = 4, max_per_queue: int = 1):
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="game-ai")
+        self._max_workers: int = max_workers
+        self._max_per_queue: int = max_per_queue
+        self._queues: dict[str, collections.deque[_AIJob]] = {}
+        # Queues with jobs waiting, in the order they will next be offered a worker.
+        self._ready: collections.deque[str] = collections.deque()
+        self._running: int = 0
+        self._running_per_queue: collections.Counter[str] = collections.Counter()
+        self._is_shutdown: bool = False
+
+    @property
+    def queued_jobs(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running_jobs(self) -> int:
+        return self._running
+
+    def submit(
+        self, queue_id: str, think: Callable[[], Any], on_done: Callable[[Any], None], human_facing: bool = False
+    ) -> asyncio.Future[None]:
+        """
+        Queue `think` to run on the worker pool, `on_done` is then called with its result on the event loop. The
+        returned future is done once the job has finished, whether it succeeded or not.
+        """
+        if queue_id not in self._queues:
+            self._queues[queue_id] = collections.deque()
+            self._ready.append(queue_id)
+        job = _AIJob(think, on_done, human_facing, asyncio.get_running_loop().create_future())
+        self._queues[queue_id].append(job)
+        self._dispatch()
+        return job.done
+
+    def shutdown(self) -> None:
+        self._is_shutdown = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        # Jobs still queued will never run, so nothing waiting on them is left hanging.
+        for queue in self._queues.values():
+            for job in queue:
+                job.finish()
+
+    def _dispatch(self) -> None:
+        if self._is_shutdown:
+            return
+        loop = asyncio.get_running_loop()
+        while self._running < self._max_workers:
+            picked = self._next_job()
+            if picked is None:
+                return
+            queue_id, job = picked
+            self._running += 1
+            self._running_per_queue[queue_id] += 1
+            future = loop.run_in_executor(self._executor, job.think)
+            future.add_done_callback(functools.partial(self._finished, queue_id, job))
+
+    def _next_job(self) -> tuple[str, _AIJob] | None:
+        """
+        Pick the next job, from the first ready queue of a game with human players and spare capacity, or failing that
+        the first ready queue with spare capacity. The picked queue goes to the back of the ready queues.
+        """
+        candidates = [queue_id for queue_id in self._ready if self._running_per_queue[queue_id] < self._max_per_queue]
+        if not candidates:
+            return None
+        queue_id = next((queue_id for queue_id in candidates if self._queues[queue_id][0].human_facing), candidates[0])
+        queue = self._queues[queue_id]
+        job = queue.popleft()
+        self._ready.remove(queue_id)
+        if queue:
+            self._ready.append(queue_id)
+        else:
+            del self._queues[queue_id]
+        return queue_id, job
+
+    def _finished(self, queue_id: str, job: _AIJob, future: asyncio.Future[Any]) -> None:
+        self._running -= 1
+        self._running_per_queue[queue_id] -= 1
+        if self._running_per_queue[queue_id] == 0:
+            del self._running_per_queue[queue_id]
+        try:
+            if future.cancelled():
+                return
+            if (error := future.exception()) is not None:
+                logger.error(f"AI job in queue {queue_id} failed: {error!r}")
+                return
+            job.on_done(future.result())
+        finally:
+            job.finish()
+            self._dispatch()
+
+
+@functools.lru_cache(maxsize=1)
+def get_shared_ai_scheduler() -> AIScheduler:
+    """
+    The scheduler shared by every game in this process.
+    """
+    return AIScheduler(max_workers=int(os.getenv("AI_WORKERS", str(min(4, os.cpu_count() or 1)))))
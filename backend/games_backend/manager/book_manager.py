@@ -1,80 +1,441 @@
 import asyncio
+import functools
+import heapq
+import itertools
+import os
+import time
+from collections.abc import Awaitable, Sequence
 
-from games_backend import models
+from games_backend import metrics, models
 from games_backend.app_logger import logger
+from games_backend.game_base import GameBase
 from games_backend.manager.db_manager import DBManager
 from games_backend.manager.game_manager import GameManager
-from games_backend.utils import non_matching_game_name
+from games_backend.manager.id_allocator import GameIdAllocator
+from games_backend.sharding import Shard
+
+DEFAULT_SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "50"))
+DEFAULT_WRITE_BEHIND_DELAY = float(os.getenv("WRITE_BEHIND_DELAY", "1.0"))
+DEFAULT_SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "10"))
+# Games written per batch, and batches written at once, when saving everything on shutdown.
+SHUTDOWN_WRITE_BATCH_SIZE = 256
+SHUTDOWN_WRITE_PARALLELISM = 4
+
+
+def _resident_memory_bytes() -> int | None:
+    """
+    Resident set size of this process, or None where `/proc` is not available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
 
 
 class BookManager:
     """
     Manages the games, it does this by keeping in memory active games and off loading into a database ones that
     are no longer active.
+
+    The database keeps the durable copy of every game, resident or not, and games are read through into memory when
+    first needed. Changes are written behind: successful actions mark their game dirty, and every
+    `write_behind_delay` seconds the dirty games are written in one batch, however many moves each had. A game's
+    queued actions are appended to its action log, unless one of them reached a multiple of `snapshot_interval` or
+    can not be replayed, then a single full snapshot is saved instead and the log starts again from it. Loading a game
+    restores its latest snapshot and replays the log on top.
+
+    Resident games are indexed by when they were last active, so finding the games to evict (see
+    `models.EvictionSettings`) only looks at the idlest games rather than scanning them all.
+
+    When running as one of several workers, `shard` decides which games this worker owns. New games are only given IDs
+    it owns, and `rebalance` hands the games it no longer owns to their new owners as snapshots.
     """
 
-    def __init__(self, db_manager: DBManager):
+    def __init__(
+        self,
+        db_manager: DBManager,
+        snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+        eviction: models.EvictionSettings | None = None,
+        shard: Shard | None = None,
+        write_behind_delay: float = DEFAULT_WRITE_BEHIND_DELAY,
+    ):
         self._game_cache: dict[str, GameManager] = {}
         self._db_manager = db_manager
         self._closed = False
+        self._eviction: models.EvictionSettings = eviction or models.EvictionSettings()
+        # Min heap of (last activity, tie breaker, game ID, manager), one entry per resident game. Entries are only
+        # refreshed when they reach the top, an entry older than its game's last activity is then pushed back.
+        self._idle_index: list[tuple[float, int, str, GameManager]] = []
+        self._index_order = itertools.count()
+        self._eviction_task: asyncio.Task[None] | None = None
+        self._shard: Shard | None = shard
+        self._id_allocator: GameIdAllocator = GameIdAllocator(
+            db_manager, accepts=shard.owns if shard is not None else None
+        )
+        self._snapshot_interval: int = snapshot_interval
+        # Games with a snapshot in the database for their action log to build on.
+        self._persisted: set[str] = set()
+        # Write-behind queue of the games changed since they were last written, with the actions to append to their
+        # logs. Games in `_needs_snapshot` are written as a full snapshot instead.
+        self._dirty: dict[str, tuple[GameManager, list[models.GameAction]]] = {}
+        self._needs_snapshot: set[str] = set()
+        self._write_behind_delay: float = write_behind_delay
+        self._scheduled_write: asyncio.TimerHandle | None = None
+        self._pending_writes: set[asyncio.Task[None]] = set()
 
     def add_game(self, game_id: str, game_manager: GameManager):
         if game_id in self._game_cache:
             raise KeyError(f"Game ID to be added {game_id} already exists.")
         self._game_cache[game_id] = game_manager
+        game_manager.set_action_recorder(functools.partial(self._record_action, game_id, game_manager))
+        self._index_game(game_id, game_manager, game_manager.last_activity)
         logger.info(f"Created game {game_id}.")
+        max_resident_games = self._eviction.max_resident_games
+        if max_resident_games is not None and len(self._game_cache) > max_resident_games:
+            self._schedule_audit()
 
     async def remove_game(self, game_id: str):
         if game_id in self._game_cache:
             manager = self._game_cache.pop(game_id)
             await manager.close_game()
             logger.info(f"Closed game {game_id}.")
+        self._persisted.discard(game_id)
+        self._dirty.pop(game_id, None)
+        self._needs_snapshot.discard(game_id)
         await self._db_manager.delete_game(game_id)
 
     async def get_game(self, game_id: str) -> GameManager:
         if game_id in self._game_cache:
             return self._game_cache[game_id]
-        game = await self._db_manager.get_game(game_id)
-        self._game_cache[game_id] = GameManager.from_game_and_id(game_id, game)
-        await self._db_manager.delete_game(game_id)
+        game = await self._load_game(game_id)
+        if game_id not in self._game_cache:
+            self.add_game(game_id, GameManager.from_game_and_id(game_id, game))
         return self._game_cache[game_id]
 
+    async def _load_game(self, game_id: str) -> GameBase:
+        """
+        Restore the game's latest snapshot and replay the actions logged since.
+        """
+        game = await self._db_manager.get_game(game_id)
+        actions = await self._db_manager.get_actions(game_id, after_version=game.state_version)
+        for action in actions:
+            response = await game.perform_function_call_async(
+                action.player_position, action.function_name, action.parameters
+            )
+            if response is not None or game.state_version != action.state_version:
+                logger.error(f"Replaying action {action.state_version} of game {game_id} failed, stopping the replay.")
+                await self._db_manager.save_game(game_id, game)
+                break
+        self._persisted.add(game_id)
+        logger.info(f"Loaded game {game_id} at version {game.state_version}, replaying {len(actions)} actions.")
+        return game
+
+    def _record_action(self, game_id: str, game_manager: GameManager, action: models.GameAction):
+        _, actions = self._dirty.setdefault(game_id, (game_manager, []))
+        actions.append(action)
+        if (
+            action.state_version % self._snapshot_interval == 0
+            or not game_manager.get_game().last_function_call_is_replayable()
+        ):
+            self._needs_snapshot.add(game_id)
+        self._schedule_write()
+
+    def _schedule_write(self):
+        if self._scheduled_write is None:
+            self._scheduled_write = asyncio.get_running_loop().call_later(
+                self._write_behind_delay, self._start_scheduled_write
+            )
+
+    def _start_scheduled_write(self):
+        self._scheduled_write = None
+        self._track_write(self._write_games(self._take_dirty()))
+
+    def _cancel_scheduled_write(self):
+        if self._scheduled_write is not None:
+            self._scheduled_write.cancel()
+            self._scheduled_write = None
+
+    def _take_dirty(self) -> dict[str, tuple[GameManager, list[models.GameAction]]]:
+        dirty, self._dirty = self._dirty, {}
+        return dirty
+
+    async def _write_games(self, games: dict[str, tuple[GameManager, list[models.GameAction]]]):
+        """
+        Write each game's changes in one batch, as a snapshot for games that need one and otherwise as appends to
+        their logs. Games without a snapshot in the database yet always get one, games with nothing to write are
+        skipped.
+        """
+        snapshots = {
+            game_id: manager.get_game()
+            for game_id, (manager, _) in games.items()
+            if game_id in self._needs_snapshot or game_id not in self._persisted
+        }
+        actions = {game_id: queued for game_id, (_, queued) in games.items() if game_id not in snapshots and queued}
+        self._needs_snapshot.difference_update(games)
+        self._persisted.update(snapshots)
+        if not snapshots and not actions:
+            return
+        try:
+            await asyncio.gather(self._db_manager.save_games(snapshots), self._db_manager.append_actions(actions))
+        except Exception as error:
+            logger.error(f"Failed to persist {len(snapshots) + len(actions)} games: {error!r}")
+            # The logs may now have gaps, so the games still here are written again as full snapshots.
+            for game_id, (manager, _) in games.items():
+                if self._game_cache.get(game_id) is manager:
+                    self._dirty.setdefault(game_id, (manager, []))
+                    self._needs_snapshot.add(game_id)
+            if self._dirty:
+                self._schedule_write()
+            raise
+
+    def _track_write(self, write: Awaitable[None]):
+        task = asyncio.ensure_future(write)
+        self._pending_writes.add(task)
+        task.add_done_callback(self._write_done)
+
+    def _write_done(self, task: asyncio.Task[None]):
+        self._pending_writes.discard(task)
+        if not task.cancelled():
+            # Already logged, and the games queued again, by `_write_games`.
+            _ = task.exception()
+
+    async def flush(self):
+        """
+        Write every queued change now, and wait for the writes already in flight.
+        """
+        self._cancel_scheduled_write()
+        if self._dirty:
+            self._track_write(self._write_games(self._take_dirty()))
+        while self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
     async def get_all_game_ids(self) -> set[str]:
         return set(self._game_cache.keys()) | await self._db_manager.get_all_game_ids()
 
     async def get_free_game_id(self) -> str:
-        return non_matching_game_name(await self.get_all_game_ids())
+        """
+        Reserve an ID for a new game, see `GameIdAllocator`.
+        """
+        return await self._id_allocator.allocate()
+
+    async def get_index_entry(self, game_id: str) -> models.GameIndexEntry:
+        """
+        The game's metadata and AI models. Games that are not resident are looked up in the database's index, so they
+        are never loaded.
+        """
+        if (game_manager := self._game_cache.get(game_id)) is not None:
+            return game_manager.get_game().get_index_entry()
+        try:
+            return await self._db_manager.get_index_entry(game_id)
+        except KeyError:
+            # Saved before the index existed, so the game is loaded, and indexed the next time it is saved.
+            return (await self.get_game(game_id)).get_game().get_index_entry()
 
     async def get_game_metadata(self, game_id: str) -> models.GameMetadataUnion:
-        game = await self.get_game(game_id)
-        return game.get_metadata()
+        return (await self.get_index_entry(game_id)).metadata
 
     async def get_game_models(self, game_id: str) -> dict[str, str]:
-        game = await self.get_game(game_id)
-        return game.get_game_models()
+        return (await self.get_index_entry(game_id)).ai_models
+
+    def update_metrics(self):
+        """
+        Set the load gauges from the resident games, called whenever the metrics are read so games do not have to keep
+        them up to date.
+        """
+        load: dict[str, list[int]] = {game_type.value: [0, 0, 0, 0] for game_type in models.GameType}
+        for manager in self._game_cache.values():
+            counts = load.setdefault(manager.get_game().metrics_label, [0, 0, 0, 0])
+            counts[0] += 1
+            counts[1] += manager.number_of_humans
+            counts[2] += manager.number_of_ais
+            counts[3] += manager.mailbox_depth
+        for label, (games, humans, ais, mailbox_depth) in load.items():
+            metrics.ACTIVE_GAMES.labels(label).set(games)
+            metrics.CONNECTED_HUMANS.labels(label).set(humans)
+            metrics.CONNECTED_AIS.labels(label).set(ais)
+            metrics.MAILBOX_DEPTH.labels(label).set(mailbox_depth)
 
     async def audit_games(self):
-        logger.info("Auditing games.")
-        inactive_games = [
-            (game_id, game_manager) for game_id, game_manager in self._game_cache.items() if not game_manager.is_active
-        ]
-        logger.info(f"Found {len(inactive_games)} to save to the db.")
-        for game_id, game_manager in inactive_games:
-            await self._db_manager.save_game(game_id, game_manager.get_game())
+        """
+        Save and evict the games that are idle for longer than the TTL, and then the least recently active games while
+        over the resident game or memory limits. Games with connected players are never evicted.
+        """
+        evictions = self._pick_evictions(time.monotonic(), self._resident_target())
+        if not evictions:
+            return
+        logger.info(f"Evicting {len(evictions)} idle games to the db.")
+        # The database already has every change but those still queued, so only those are written.
+        await self._write_games({game_id: self._dirty.pop(game_id, (manager, [])) for game_id, manager, _ in evictions})
+        for game_id, manager, last_activity in evictions:
+            if self._game_cache.get(game_id) is not manager:
+                continue
+            if manager.is_active or manager.last_activity != last_activity:
+                # Picked up again while it was being saved, so it stays.
+                self._index_game(game_id, manager, manager.last_activity)
+                continue
+            del self._game_cache[game_id]
+            await manager.close_game()
+
+    async def rebalance(self, workers: Sequence[str]) -> list[str]:
+        """
+        Switch to a new set of workers, handing every game this worker no longer owns to its new owner. Returns the IDs
+        of the games handed over.
+        """
+        if self._shard is None:
+            raise ValueError("Games can only be rebalanced between sharded workers.")
+        shard = self._shard
+        shard.set_workers(workers)
+        moving = {game_id: manager for game_id, manager in self._game_cache.items() if not shard.owns(game_id)}
+        for game_id in moving:
+            del self._game_cache[game_id]
+        # Closing disconnects the players, when they reconnect they are routed to the new owner.
+        await asyncio.gather(*(self._close_game_manager(game_id, manager) for game_id, manager in moving.items()))
+        games = {game_id: manager.get_game() for game_id, manager in moving.items()}
+        if not self._db_manager.is_shared:
+            # Evicted games only exist in this process, so they have to be handed over as well.
+            for game_id in await self._db_manager.get_all_game_ids():
+                if game_id not in games and not shard.owns(game_id):
+                    games[game_id] = await self._load_game(game_id)
+        if not games:
+            return []
+        logger.info(f"Handing {len(games)} games over to other workers.")
+        # Written first, so a game that fails to hand over is not lost.
+        try:
+            await self._write_games(
+                {game_id: self._dirty.pop(game_id, (manager, [])) for game_id, manager in moving.items()}
+            )
+        except Exception:
+            # Already logged, the new owners still get the games from their snapshots.
+            pass
+        results = await asyncio.gather(
+            *(shard.send_game(shard.owner(game_id), game_id, game.to_snapshot()) for game_id, game in games.items()),
+            return_exceptions=True,
+        )
+        moved: list[str] = []
+        for game_id, result in zip(games, results):
+            self._persisted.discard(game_id)
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to hand game {game_id} over to {shard.owner(game_id)}: {result!r}")
+                continue
+            if not self._db_manager.is_shared:
+                await self._db_manager.delete_game(game_id)
+            moved.append(game_id)
+        return moved
+
+    async def receive_game(self, game_id: str, snapshot: bytes):
+        """
+        Take over a game handed over by another worker. A copy loaded while the game was moving is replaced, unless it
+        is already ahead of the snapshot.
+        """
+        game = GameBase.from_snapshot(snapshot)
+        if (resident := self._game_cache.get(game_id)) is not None:
+            if resident.get_game().state_version >= game.state_version:
+                logger.info(f"Keeping game {game_id}, it is already at version {resident.get_game().state_version}.")
+                return
             del self._game_cache[game_id]
+            await self._close_game_manager(game_id, resident)
+        self._persisted.discard(game_id)
+        # Until its first write the game is only in memory, so its ID is reserved to keep it from being handed out for a
+        # new game. A shared database already has it from the previous owner, the reservation then changes nothing.
+        await self._db_manager.reserve_game_id(game_id)
+        self.add_game(game_id, GameManager.from_game_and_id(game_id, game))
+
+    async def _close_game_manager(self, game_id: str, game_manager: GameManager):
+        try:
+            await asyncio.wait_for(game_manager.close_game(), timeout=5.0)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout while closing game {game_id}.")
+
+    def _index_game(self, game_id: str, game_manager: GameManager, last_activity: float):
+        heapq.heappush(self._idle_index, (last_activity, next(self._index_order), game_id, game_manager))
+
+    def _resident_target(self) -> int | None:
+        """
+        The number of games to keep in memory, or None if there is no limit right now. Over the memory budget the
+        target assumes memory use is proportional to the number of resident games.
+        """
+        targets: list[int] = []
+        if self._eviction.max_resident_games is not None:
+            targets.append(self._eviction.max_resident_games)
+        memory_budget = self._eviction.memory_budget_bytes
+        if memory_budget is not None and (memory := _resident_memory_bytes()) is not None and memory > memory_budget:
+            targets.append(len(self._game_cache) * memory_budget // memory)
+        return min(targets, default=None)
+
+    def _pick_evictions(self, now: float, target: int | None) -> list[tuple[str, GameManager, float]]:
+        idle_before = now - self._eviction.idle_ttl
+        evictions: list[tuple[str, GameManager, float]] = []
+        # Every entry is looked at most once per audit, even if it is pushed back.
+        for _ in range(len(self._idle_index)):
+            last_activity, _, game_id, manager = self._idle_index[0]
+            over_target = target is not None and len(self._game_cache) - len(evictions) > target
+            if last_activity > idle_before and not over_target:
+                break
+            heapq.heappop(self._idle_index)
+            if self._game_cache.get(game_id) is not manager:
+                continue
+            if manager.is_active:
+                self._index_game(game_id, manager, now)
+            elif manager.last_activity > last_activity:
+                self._index_game(game_id, manager, manager.last_activity)
+            else:
+                evictions.append((game_id, manager, last_activity))
+        return evictions
 
-    async def graceful_close(self):
-        for game_id, game_manager in self._game_cache.items():
-            await self._db_manager.save_game(game_id, game_manager.get_game())
-        # Save the games before trying to disconnect the client to maximise the chance we have saved all the
-        # data.
-        for game_id, game_manager in self._game_cache.items():
-            try:
-                await asyncio.wait_for(game_manager.close_game(), timeout=5.0)
-            except asyncio.TimeoutError:
-                logger.warning(f"Timeout while closing game {game_id}.")
+    def _schedule_audit(self):
+        if self._eviction_task is None or self._eviction_task.done():
+            self._eviction_task = asyncio.ensure_future(self.audit_games())
+
+    async def graceful_close(self, timeout: float = DEFAULT_SHUTDOWN_TIMEOUT):
+        """
+        Save the games and then disconnect every client, giving up on whatever is left after `timeout` seconds in
+        total. Games are written in batches, a few batches at a time, and every game is closed at once.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            async with asyncio.timeout_at(deadline):
+                await self._save_all_games()
+        except TimeoutError:
+            logger.error(f"Saving games on shutdown took longer than {timeout} seconds, unsaved changes are lost.")
+        # Save the games before trying to disconnect the clients to maximise the chance we have saved all the data.
+        closing = [asyncio.ensure_future(game_manager.close_game()) for game_manager in self._game_cache.values()]
+        if closing:
+            _, still_closing = await asyncio.wait(closing, timeout=max(deadline - loop.time(), 0))
+            if still_closing:
+                logger.warning(f"Timeout while closing {len(still_closing)} games.")
+                for task in still_closing:
+                    task.cancel()
+        # Failed writes queue themselves to be tried again, which can not happen once the database is closed.
+        self._cancel_scheduled_write()
+        await self._db_manager.close()
         self._closed = True
 
+    async def _save_all_games(self):
+        if self._eviction_task is not None:
+            await asyncio.gather(self._eviction_task, return_exceptions=True)
+        self._cancel_scheduled_write()
+        games = self._take_dirty()
+        games |= {
+            game_id: (game_manager, [])
+            for game_id, game_manager in self._game_cache.items()
+            if game_id not in games and game_id not in self._persisted
+        }
+        parallel_writes = asyncio.Semaphore(SHUTDOWN_WRITE_PARALLELISM)
+
+        async def write(batch: tuple[tuple[str, tuple[GameManager, list[models.GameAction]]], ...]):
+            async with parallel_writes:
+                await self._write_games(dict(batch))
+
+        # Failed writes are already logged by `_write_games`.
+        await asyncio.gather(
+            *(write(batch) for batch in itertools.batched(games.items(), SHUTDOWN_WRITE_BATCH_SIZE)),
+            return_exceptions=True,
+        )
+        while self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
     @property
     def is_closed(self) -> bool:
         return self._closed
@@ -1,42 +1,137 @@
 import abc
-from typing import override
+import asyncio
+import sqlite3
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, ClassVar, Self, override
 
+import redis.asyncio
+
+from games_backend import models
 from games_backend.app_logger import logger
 from games_backend.game_base import GameBase
 
 
+def serialise_game(game: GameBase) -> bytes:
+    """
+    Compact binary form of a game for storing outside the process, see `GameBase.to_snapshot`.
+    """
+    return game.to_snapshot()
+
+
+def deserialise_game(data: bytes) -> GameBase:
+    return GameBase.from_snapshot(data)
+
+
+def serialise_index_entry(game: GameBase) -> bytes:
+    return game.get_index_entry().model_dump_json().encode()
+
+
+def deserialise_index_entry(data: bytes) -> models.GameIndexEntry:
+    return models.GameIndexEntry.model_validate_json(data)
+
+
 class DBManager(abc.ABC):
+    """
+    Stores each game as a snapshot plus a log of the actions taken since. Saving a game replaces its snapshot and drops
+    the logged actions the snapshot already covers, deleting a game drops its log as well.
+    """
+
+    # Whether every worker process sees the same stored games.
+    is_shared: ClassVar[bool] = True
+
     @abc.abstractmethod
     async def save_game(self, game_id: str, game: GameBase) -> None: ...
 
+    async def save_games(self, games: dict[str, GameBase]) -> None:
+        """
+        Save several games at once, managers that can batch their writes should override this.
+        """
+        for game_id, game in games.items():
+            await self.save_game(game_id, game)
+
     @abc.abstractmethod
     async def get_game(self, game_id: str) -> GameBase: ...
 
+    @abc.abstractmethod
+    async def get_index_entry(self, game_id: str) -> models.GameIndexEntry:
+        """
+        The game's index entry, written with every save, without reading the game itself. Raises KeyError if there is
+        none.
+        """
+
     @abc.abstractmethod
     async def delete_game(self, game_id: str) -> None: ...
 
     @abc.abstractmethod
     async def get_all_game_ids(self) -> set[str]: ...
 
+    @abc.abstractmethod
+    async def reserve_game_id(self, game_id: str) -> bool:
+        """
+        Atomically claim a game ID for a new game, returning False if it is already taken. IDs stay taken until the
+        game is deleted.
+        """
+
+    @abc.abstractmethod
+    async def append_action(self, game_id: str, action: models.GameAction) -> None: ...
+
+    async def append_actions(self, actions: dict[str, list[models.GameAction]]) -> None:
+        """
+        Append to several games' logs at once, managers that can batch their writes should override this.
+        """
+        for game_id, game_actions in actions.items():
+            for action in game_actions:
+                await self.append_action(game_id, action)
+
+    @abc.abstractmethod
+    async def get_actions(self, game_id: str, after_version: int) -> list[models.GameAction]:
+        """
+        The logged actions of a game that produced versions after `after_version`, oldest first.
+        """
+
+    async def close(self) -> None:
+        """
+        Release any connections held by the manager.
+        """
+
 
 class InMemoryDBManager(DBManager):
+    is_shared: ClassVar[bool] = False
+
     def __init__(self):
-        self._games: dict[str, GameBase] = {}
+        # Serialised, so a stored game is a copy that does not change with the live game.
+        self._games: dict[str, bytes] = {}
+        self._index: dict[str, models.GameIndexEntry] = {}
+        self._actions: dict[str, list[models.GameAction]] = {}
+        self._reserved_ids: set[str] = set()
 
     @override
     async def save_game(self, game_id: str, game: GameBase) -> None:
         logger.info(f"Saving game {game_id} to in memory DB.")
-        self._games[game_id] = game
+        self._games[game_id] = serialise_game(game)
+        if game_id not in self._index:
+            self._index[game_id] = game.get_index_entry()
+        self._actions[game_id] = [
+            action for action in self._actions.get(game_id, []) if action.state_version > game.state_version
+        ]
 
     @override
     async def get_game(self, game_id: str) -> GameBase:
         logger.info(f"Retrieving {game_id} from in memory DB.")
         # This will raise key error if it does not exist.
-        return self._games[game_id]
+        return deserialise_game(self._games[game_id])
+
+    @override
+    async def get_index_entry(self, game_id: str) -> models.GameIndexEntry:
+        return self._index[game_id]
 
     @override
     async def delete_game(self, game_id: str) -> None:
         logger.info(f"Deleting {game_id} from in memory DB.")
+        self._actions.pop(game_id, None)
+        self._index.pop(game_id, None)
+        self._reserved_ids.discard(game_id)
         if game_id not in self._games:
             return
         _ = self._games.pop(game_id)
@@ -45,5 +140,340 @@ class InMemoryDBManager(DBManager):
     async def get_all_game_ids(self) -> set[str]:
         return set(self._games.keys())
 
+    @override
+    async def reserve_game_id(self, game_id: str) -> bool:
+        if game_id in self._reserved_ids or game_id in self._games:
+            return False
+        self._reserved_ids.add(game_id)
+        return True
+
+    @override
+    async def append_action(self, game_id: str, action: models.GameAction) -> None:
+        self._actions.setdefault(game_id, []).append(action)
+
+    @override
+    async def get_actions(self, game_id: str, after_version: int) -> list[models.GameAction]:
+        return [action for action in self._actions.get(game_id, []) if action.state_version > after_version]
+
+
+class RedisDBManager(DBManager):
+    """
+    Stores games in Redis, one key per game holding its serialised form, along with a set of every stored game ID so
+    listing games does not need to scan the keyspace. Batches of games are written in a single pipelined round trip.
+    Game IDs are reserved with a key of their own, so an ID reserved for a game that is never saved is not listed.
+
+    Each game's action log is a sorted set scored by state version, so appending is a single ZADD and the actions a
+    snapshot covers are trimmed by score whatever order the writes land in.
+    """
+
+    def __init__(self, client: redis.asyncio.Redis, key_prefix: str = "games:"):
+        self._client: redis.asyncio.Redis = client
+        self._key_prefix: str = key_prefix
+        self._ids_key: str = f"{key_prefix}ids"
+        self._index_key: str = f"{key_prefix}index"
+
+    @classmethod
+    def from_url(cls, url: str, max_connections: int = 16) -> Self:
+        pool = redis.asyncio.ConnectionPool.from_url(url, max_connections=max_connections)
+        return cls(redis.asyncio.Redis(connection_pool=pool))
+
+    @override
+    async def save_game(self, game_id: str, game: GameBase) -> None:
+        await self.save_games({game_id: game})
+
+    @override
+    async def save_games(self, games: dict[str, GameBase]) -> None:
+        if not games:
+            return
+        logger.info(f"Saving {len(games)} games to redis DB.")
+        async with self._client.pipeline(transaction=False) as pipe:
+            for game_id, game in games.items():
+                pipe.set(self._game_key(game_id), serialise_game(game))
+                pipe.zremrangebyscore(self._actions_key(game_id), "-inf", game.state_version)
+            pipe.hset(
+                self._index_key, mapping={game_id: serialise_index_entry(game) for game_id, game in games.items()}
+            )
+            pipe.sadd(self._ids_key, *games.keys())
+            await pipe.execute()
+
+    @override
+    async def get_game(self, game_id: str) -> GameBase:
+        logger.info(f"Retrieving {game_id} from redis DB.")
+        data = await self._client.get(self._game_key(game_id))
+        if data is None:
+            raise KeyError(game_id)
+        return deserialise_game(data)
+
+    @override
+    async def get_index_entry(self, game_id: str) -> models.GameIndexEntry:
+        data = await self._client.hget(self._index_key, game_id)
+        if data is None:
+            raise KeyError(game_id)
+        return deserialise_index_entry(data)
+
+    @override
+    async def delete_game(self, game_id: str) -> None:
+        logger.info(f"Deleting {game_id} from redis DB.")
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.delete(self._game_key(game_id), self._actions_key(game_id))
+            pipe.hdel(self._index_key, game_id)
+            pipe.srem(self._ids_key, game_id)
+            pipe.delete(self._reserved_key(game_id))
+            await pipe.execute()
+
+    @override
+    async def get_all_game_ids(self) -> set[str]:
+        return {game_id.decode() for game_id in await self._client.smembers(self._ids_key)}
+
+    @override
+    async def reserve_game_id(self, game_id: str) -> bool:
+        # SET NX is atomic and reports whether the key was set, so only one creator can ever claim an ID. Games saved
+        # without a reservation, such as those handed over by another worker, still hold on to their ID.
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.set(self._reserved_key(game_id), b"", nx=True)
+            pipe.sismember(self._ids_key, game_id)
+            reserved, saved = await pipe.execute()
+        return bool(reserved) and not saved
+
+    @override
+    async def append_action(self, game_id: str, action: models.GameAction) -> None:
+        await self._client.zadd(self._actions_key(game_id), {action.model_dump_json(): action.state_version})
+
+    @override
+    async def append_actions(self, actions: dict[str, list[models.GameAction]]) -> None:
+        if not actions:
+            return
+        async with self._client.pipeline(transaction=False) as pipe:
+            for game_id, game_actions in actions.items():
+                pipe.zadd(
+                    self._actions_key(game_id),
+                    {action.model_dump_json(): action.state_version for action in game_actions},
+                )
+            await pipe.execute()
+
+    @override
+    async def get_actions(self, game_id: str, after_version: int) -> list[models.GameAction]:
+        actions = await self._client.zrangebyscore(self._actions_key(game_id), f"({after_version}", "+inf")
+        return [models.GameAction.model_validate_json(action) for action in actions]
+
+    @override
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def _game_key(self, game_id: str) -> str:
+        return f"{self._key_prefix}game:{game_id}"
+
+    def _actions_key(self, game_id: str) -> str:
+        return f"{self._key_prefix}actions:{game_id}"
+
+    def _reserved_key(self, game_id: str) -> str:
+        return f"{self._key_prefix}reserved:{game_id}"
+
+
+class SQLiteDBManager(DBManager):
+    """
+    Stores games in an SQLite database file, so they survive restarts without a separate service.
+
+    The connection lives on a dedicated thread that does all of the disk I/O. Saves issued while a write is waiting to
+    run are grouped into a single transaction, and the database runs in WAL mode so reads are not blocked by writes.
+    Logged actions go through the same grouped writes, so a burst of moves costs one transaction.
+    """
+
+    _SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS games (
+            game_id TEXT PRIMARY KEY,
+            data BLOB NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS actions (
+            game_id TEXT NOT NULL,
+            state_version INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (game_id, state_version)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS game_index (
+            game_id TEXT PRIMARY KEY,
+            data BLOB NOT NULL
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS reserved_ids (
+            game_id TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+        """,
+    )
+
+    def __init__(self, path: str):
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-db")
+        self._connection: sqlite3.Connection = self._executor.submit(self._connect, path).result()
+        # Serialised games, with their state version and index entry, and actions waiting for the next write
+        # transaction.
+        self._pending: dict[str, tuple[bytes, int, bytes]] = {}
+        self._pending_actions: list[tuple[str, int, bytes]] = []
+        self._pending_write: asyncio.Future[None] | None = None
+
+    @override
+    async def save_game(self, game_id: str, game: GameBase) -> None:
+        await self.save_games({game_id: game})
+
+    @override
+    async def save_games(self, games: dict[str, GameBase]) -> None:
+        if not games:
+            return
+        logger.info(f"Saving {len(games)} games to sqlite DB.")
+        self._pending.update(
+            {
+                game_id: (serialise_game(game), game.state_version, serialise_index_entry(game))
+                for game_id, game in games.items()
+            }
+        )
+        await self._join_pending_write()
+
+    @override
+    async def get_game(self, game_id: str) -> GameBase:
+        logger.info(f"Retrieving {game_id} from sqlite DB.")
+        if game_id in self._pending:
+            return deserialise_game(self._pending[game_id][0])
+        row = await self._run(
+            lambda: self._connection.execute("SELECT data FROM games WHERE game_id = ?", (game_id,)).fetchone()
+        )
+        if row is None:
+            raise KeyError(game_id)
+        return deserialise_game(row[0])
+
+    @override
+    async def get_index_entry(self, game_id: str) -> models.GameIndexEntry:
+        if game_id in self._pending:
+            return deserialise_index_entry(self._pending[game_id][2])
+        row = await self._run(
+            lambda: self._connection.execute("SELECT data FROM game_index WHERE game_id = ?", (game_id,)).fetchone()
+        )
+        if row is None:
+            raise KeyError(game_id)
+        return deserialise_index_entry(row[0])
+
+    @override
+    async def delete_game(self, game_id: str) -> None:
+        logger.info(f"Deleting {game_id} from sqlite DB.")
+        self._pending.pop(game_id, None)
+        self._pending_actions = [action for action in self._pending_actions if action[0] != game_id]
+        await self._run(
+            self._write,
+            ("DELETE FROM games WHERE game_id = ?", [(game_id,)]),
+            ("DELETE FROM actions WHERE game_id = ?", [(game_id,)]),
+            ("DELETE FROM game_index WHERE game_id = ?", [(game_id,)]),
+            ("DELETE FROM reserved_ids WHERE game_id = ?", [(game_id,)]),
+        )
+
+    @override
+    async def get_all_game_ids(self) -> set[str]:
+        # Only reads the primary key index, never the game data.
+        rows = await self._run(lambda: self._connection.execute("SELECT game_id FROM games").fetchall())
+        return {row[0] for row in rows} | self._pending.keys()
+
+    @override
+    async def reserve_game_id(self, game_id: str) -> bool:
+        if game_id in self._pending:
+            return False
+        return await self._run(self._reserve, game_id)
+
+    @override
+    async def append_action(self, game_id: str, action: models.GameAction) -> None:
+        await self.append_actions({game_id: [action]})
+
+    @override
+    async def append_actions(self, actions: dict[str, list[models.GameAction]]) -> None:
+        if not actions:
+            return
+        self._pending_actions.extend(
+            (game_id, action.state_version, action.model_dump_json().encode())
+            for game_id, game_actions in actions.items()
+            for action in game_actions
+        )
+        await self._join_pending_write()
+
+    @override
+    async def get_actions(self, game_id: str, after_version: int) -> list[models.GameAction]:
+        # Taken before reading, so actions that move from pending to written during the read are not missed.
+        pending = {
+            version: data
+            for pending_id, version, data in self._pending_actions
+            if pending_id == game_id and version > after_version
+        }
+        rows = await self._run(
+            lambda: self._connection.execute(
+                "SELECT state_version, data FROM actions WHERE game_id = ? AND state_version > ?",
+                (game_id, after_version),
+            ).fetchall()
+        )
+        logged = dict(rows) | pending
+        return [models.GameAction.model_validate_json(logged[version]) for version in sorted(logged)]
+
+    @override
+    async def close(self) -> None:
+        if self._pending_write is not None:
+            await asyncio.shield(self._pending_write)
+        await self._run(self._connection.close)
+        self._executor.shutdown()
+
+    async def _join_pending_write(self) -> None:
+        if self._pending_write is None:
+            self._pending_write = asyncio.ensure_future(self._write_pending())
+        await asyncio.shield(self._pending_write)
+
+    async def _write_pending(self) -> None:
+        # Give writes issued in the same pass of the event loop the chance to join this transaction.
+        await asyncio.sleep(0)
+        games, self._pending = self._pending, {}
+        actions, self._pending_actions = self._pending_actions, []
+        self._pending_write = None
+        await self._run(
+            self._write,
+            (
+                "INSERT OR REPLACE INTO games (game_id, data) VALUES (?, ?)",
+                [(game_id, data) for game_id, (data, _, _) in games.items()],
+            ),
+            (
+                "INSERT OR REPLACE INTO game_index (game_id, data) VALUES (?, ?)",
+                [(game_id, index_entry) for game_id, (_, _, index_entry) in games.items()],
+            ),
+            ("INSERT OR REPLACE INTO actions (game_id, state_version, data) VALUES (?, ?, ?)", actions),
+            (
+                "DELETE FROM actions WHERE game_id = ? AND state_version <= ?",
+                [(game_id, version) for game_id, (_, version, _) in games.items()],
+            ),
+        )
+
+    async def _run(self, function: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _reserve(self, game_id: str) -> bool:
+        # Writes are serialised by SQLite, so the check and the insert can not interleave with another reservation.
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO reserved_ids (game_id) "
+                + "SELECT ? WHERE NOT EXISTS (SELECT 1 FROM games WHERE game_id = ?)",
+                (game_id, game_id),
+            )
+        return cursor.rowcount == 1
+
+    def _write(self, *statements: tuple[str, list[tuple[Any, ...]]]) -> None:
+        """
+        Run each statement over its rows, all in one transaction.
+        """
+        with self._connection:
+            for statement, rows in statements:
+                self._connection.executemany(statement, rows)
 
-# TODO: Make redis db manager
+    @classmethod
+    def _connect(cls, path: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in cls._SCHEMA:
+            connection.execute(statement)
+        return connection
@@ -0,0 +1,166 @@
+import struct
+import zlib
+from typing import Any, Self, final
+
+import pydantic_core
+
+from games_backend import models
+
+# -------------------------------------
+# Binary framing
+# -------------------------------------
+#
+# A binary frame is a fixed header followed by the payload:
+#   byte 0: framing version
+#   byte 1: response type code (see RESPONSE_TYPE_CODES)
+#   byte 2: flags
+#   bytes 3-10: the frame's sequence number, only if FLAG_SEQUENCED is set.
+#   rest:   the JSON encoded response without its message type, deflate compressed if FLAG_COMPRESSED is set.
+# The message type lives in the header, so clients can dispatch on it without decoding the payload.
+#
+# Frames sent to clients that can resume their session are numbered, JSON frames with a leading "sequence" field and
+# binary frames in the header.
+
+BINARY_FRAME_VERSION = 1
+FLAG_COMPRESSED = 0b0000_0001
+FLAG_SEQUENCED = 0b0000_0010
+# Payloads smaller than this are not worth compressing.
+COMPRESSION_THRESHOLD = 256
+
+_HEADER = struct.Struct("!BBB")
+_SEQUENCE = struct.Struct("!Q")
+
+# These codes are part of the wire format, new response types must be given a new code rather than reusing one.
+RESPONSE_TYPE_CODES: dict[models.ResponseType, int] = {
+    models.ResponseType.SIMPLE: 0,
+    models.ResponseType.ERROR: 1,
+    models.ResponseType.GAME_STATE: 2,
+    models.ResponseType.SESSION_STATE: 3,
+    models.ResponseType.AI_PLAYERS: 4,
+    models.ResponseType.MODEL: 5,
+    models.ResponseType.GAME_STATE_DELTA: 6,
+    models.ResponseType.BUNDLE: 7,
+    models.ResponseType.RESUME: 8,
+}
+_CODE_TO_RESPONSE_TYPE: dict[int, models.ResponseType] = {code: kind for kind, code in RESPONSE_TYPE_CODES.items()}
+
+
+def encode_binary_frame(message: models.Response) -> bytes:
+    return _binary_frame(message.message_type, message.model_dump_json(exclude={"message_type"}).encode())
+
+
+def _binary_frame(message_type: models.ResponseType, payload: bytes) -> bytes:
+    flags = 0
+    if len(payload) >= COMPRESSION_THRESHOLD:
+        compressed = zlib.compress(payload, level=1)
+        if len(compressed) < len(payload):
+            payload = compressed
+            flags |= FLAG_COMPRESSED
+    return _HEADER.pack(BINARY_FRAME_VERSION, RESPONSE_TYPE_CODES[message_type], flags) + payload
+
+
+def _sequenced_frame(frame: str | bytes, sequence: int) -> str | bytes:
+    if isinstance(frame, str):
+        return f'{{"sequence":{sequence},{frame[1:]}'
+    version, code, flags = _HEADER.unpack_from(frame)
+    return _HEADER.pack(version, code, flags | FLAG_SEQUENCED) + _SEQUENCE.pack(sequence) + frame[_HEADER.size :]
+
+
+def decode_binary_frame(frame: bytes) -> tuple[models.ResponseType, dict[str, Any]]:
+    """
+    Decode a binary frame into its message type and the rest of the raw response, with the frame's sequence number
+    under "sequence" if it has one.
+    """
+    version, code, flags = _HEADER.unpack_from(frame)
+    if version != BINARY_FRAME_VERSION:
+        raise ValueError(f"Unsupported binary frame version {version}.")
+    payload = frame[_HEADER.size :]
+    sequence = None
+    if flags & FLAG_SEQUENCED:
+        (sequence,) = _SEQUENCE.unpack_from(payload)
+        payload = payload[_SEQUENCE.size :]
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    decoded = pydantic_core.from_json(payload)
+    if sequence is not None:
+        decoded["sequence"] = sequence
+    return _CODE_TO_RESPONSE_TYPE[code], decoded
+
+
+@final
+class OutboundMessage:
+    """
+    A response together with its encoded forms. Each encoding is done lazily and at most once, so the same message
+    can be fanned out to many clients without serialising it for each of them.
+    """
+
+    def __init__(self, message: models.Response):
+        self._message: models.Response = message
+        self._encoded: dict[models.FrameEncoding, str | bytes] = {}
+        self._parts: list[OutboundMessage] = []
+        self._source: OutboundMessage | None = None
+        self._sequence: int | None = None
+
+    @classmethod
+    def with_json(cls, message: models.Response, encoded: str) -> Self:
+        """
+        A message whose JSON encoding was built by the caller, it must match what encoding the message would give.
+        """
+        outbound = cls(message)
+        outbound._encoded[models.FrameEncoding.JSON] = encoded
+        return outbound
+
+    @classmethod
+    def bundle(cls, parts: list["OutboundMessage"]) -> Self:
+        """
+        Combine several messages into a single bundle message. The bundle is encoded by splicing together the JSON
+        of its parts, so parts shared between clients are still only serialised once.
+        """
+        message = models.BundleResponse.model_construct(
+            parameters=models.BundleResponseParameters.model_construct(messages=[part.message for part in parts])
+        )
+        bundle = cls(message)
+        bundle._parts = parts
+        return bundle
+
+    @classmethod
+    def sequenced(cls, message: "OutboundMessage", sequence: int) -> Self:
+        """
+        The message numbered as one frame of a client's session. It is encoded by adding the number to the message's
+        own encoding, so a message numbered for many clients is still only serialised once.
+        """
+        outbound = cls(message.message)
+        outbound._source = message
+        outbound._sequence = sequence
+        return outbound
+
+    @property
+    def message(self) -> models.Response:
+        return self._message
+
+    @property
+    def sequence(self) -> int | None:
+        return self._sequence
+
+    def encode(self, encoding: models.FrameEncoding) -> str | bytes:
+        if encoding not in self._encoded:
+            match encoding:
+                case _ if self._source is not None and self._sequence is not None:
+                    self._encoded[encoding] = _sequenced_frame(self._source.encode(encoding), self._sequence)
+                case models.FrameEncoding.JSON if self._parts:
+                    self._encoded[encoding] = (
+                        f'{{"message_type":"{models.ResponseType.BUNDLE.value}",{self._spliced_parameters()}}}'
+                    )
+                case models.FrameEncoding.JSON:
+                    self._encoded[encoding] = self._message.model_dump_json()
+                case models.FrameEncoding.BINARY if self._parts:
+                    self._encoded[encoding] = _binary_frame(
+                        models.ResponseType.BUNDLE, f"{{{self._spliced_parameters()}}}".encode()
+                    )
+                case models.FrameEncoding.BINARY:
+                    self._encoded[encoding] = encode_binary_frame(self._message)
+        return self._encoded[encoding]
+
+    def _spliced_parameters(self) -> str:
+        messages = ",".join(str(part.encode(models.FrameEncoding.JSON)) for part in self._parts)
+        return f'"parameters":{{"messages":[{messages}]}}'
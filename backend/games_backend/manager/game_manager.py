@@ -1,36 +1,131 @@
 import asyncio
+import enum
+import functools
+import math
+import os
+import secrets
+import time
 import uuid
+from collections.abc import Callable, Hashable
 from typing import Self, final
 
 import pydantic
-from fastapi import WebSocket
+from fastapi import WebSocket, WebSocketDisconnect
 
-from games_backend import game_base, models
+from games_backend import game_base, metrics, models
 from games_backend.ai_base import GameAI
-from games_backend.app_logger import logger
+from games_backend.app_logger import Event, get_logger, logger
 from games_backend.manager.ai_manager import AIManager
+from games_backend.manager.ai_scheduler import AIScheduler, get_shared_ai_scheduler
+from games_backend.manager.frames import OutboundMessage
+from games_backend.manager.replay import DEFAULT_REPLAY_SIZE, ReplayBuffer
+from games_backend.manager.request_parser import MANAGER_GAME_FUNCTIONS, get_request_parser, rejection_reason
 from games_backend.manager.session_manager import SessionManager
+from games_backend.manager.state_views import GameStateView, GameStateViews
+from games_backend.manager.transport import WebSocketTransport
 
-Player = WebSocket | GameAI
+Player = WebSocketTransport | GameAI
+
+# Every message from clients, logged at debug.
+message_logger = get_logger("messages")
+
+_MESSAGES_IN = metrics.MESSAGES_IN.labels()
+_MESSAGES_OUT = metrics.MESSAGES_OUT.labels()
+_PLAYER_BROADCAST_SECONDS = metrics.BROADCAST_SECONDS.labels("players")
+_SPECTATOR_BROADCAST_SECONDS = metrics.BROADCAST_SECONDS.labels("spectators")
+
+# The number of client actions a game will hold before it starts rejecting new ones.
+DEFAULT_MAILBOX_SIZE = 256
+# The minimum number of seconds between updates pushed to spectators, zero pushes every change.
+DEFAULT_SPECTATOR_INTERVAL = float(os.getenv("SPECTATOR_UPDATE_INTERVAL", "0"))
+# The number of seconds a resumable client's seat is kept after its connection drops.
+DEFAULT_RESUME_GRACE = float(os.getenv("RESUME_GRACE_PERIOD", "30"))
+# Clients closing their websocket with this code are leaving, rather than dropping out.
+NORMAL_CLOSURE = 1000
+
+
+class Channel(enum.Enum):
+    """
+    The independent parts of the state clients are kept up to date with.
+    """
+
+    SESSION = "session"
+    GAME = "game"
+    AI = "ai"
 
 
 @final
 class GameManager:
-    def __init__(self, game_id: str, game: game_base.GameBase, session: SessionManager):
+    def __init__(
+        self,
+        game_id: str,
+        game: game_base.GameBase,
+        session: SessionManager,
+        mailbox_size: int = DEFAULT_MAILBOX_SIZE,
+        ai_scheduler: AIScheduler | None = None,
+        spectator_interval: float = DEFAULT_SPECTATOR_INTERVAL,
+        resume_grace: float = DEFAULT_RESUME_GRACE,
+        replay_size: int = DEFAULT_REPLAY_SIZE,
+    ):
         self._game_id = game_id
         self._id_to_player: dict[str, Player] = {}
         self._player_to_id: dict[Player, str] = {}
         self._player_lock = asyncio.Lock()
         self._game = game
         self._session = session
+        self._request_parser = get_request_parser(type(game))
         self._is_closed = False
+        # Monotonic time of the last connection, disconnection or action, used to find idle games to evict.
+        self._last_activity: float = time.monotonic()
+
+        self._state_views = GameStateViews(game)
+        # The view key and state version of the last game state each client was sent.
+        self._client_views: dict[str, tuple[Hashable, int]] = {}
+        # Channels that have changed since they were last broadcast.
+        self._dirty_channels: set[Channel] = set()
+
+        # Every action is processed by a single consumer in the order it arrived, so actions never interleave.
+        self._mailbox: asyncio.Queue[tuple[str, models.WebSocketRequest]] = asyncio.Queue()
+        self._mailbox_size: int = mailbox_size
+        self._mailbox_consumer: asyncio.Task[None] | None = None
+        self._max_mailbox_depth: int = 0
+        self._processed_actions: int = 0
+        # Actions put in the mailbox that have not finished being processed yet.
+        self._unfinished_actions: int = 0
+        self._rejected_actions: int = 0
 
-        self._action_bus: list[tuple[str, models.WebSocketRequest]] = []
-        self._action_lock = asyncio.Lock()
+        self._ai_scheduler: AIScheduler = ai_scheduler or get_shared_ai_scheduler()
+        self._ai_think_seconds: metrics.HistogramChild = metrics.AI_THINK_SECONDS.labels(game.metrics_label)
+        self._action_recorder: Callable[[models.GameAction], None] | None = None
+
+        # Clients without a position are spectators, they are kept up to date by their own fan-out task.
+        self._spectator_interval: float = spectator_interval
+        self._spectator_dirty_channels: set[Channel] = set()
+        self._spectator_wakeup = asyncio.Event()
+        self._spectators_idle = asyncio.Event()
+        self._spectators_idle.set()
+        self._spectator_fan_out: asyncio.Task[None] | None = None
+        # The game state view last pushed to spectators, later pushes are sent as deltas from it.
+        self._last_spectator_view: GameStateView | None = None
+
+        # Clients with the resume feature keep their seat for `resume_grace` seconds after their connection drops,
+        # while the frames they miss are kept in the replay buffer.
+        self._resume_grace: float = resume_grace
+        self._replay: ReplayBuffer = ReplayBuffer(replay_size)
+        self._resume_tokens: dict[str, str] = {}
+        self._suspended: dict[str, asyncio.Task[None]] = {}
+        # The last message passed to each AI, done once the AI has handled it.
+        self._ai_jobs: dict[str, asyncio.Future[None]] = {}
 
     def _set_ai_manager(self, ai_manager: AIManager):
         self._ai_manager: AIManager = ai_manager
 
+    def set_action_recorder(self, recorder: Callable[[models.GameAction], None] | None):
+        """
+        Set the callback told about every successful game function call, straight after it changed the game.
+        """
+        self._action_recorder = recorder
+
     @property
     def is_closed(self) -> bool:
         return self._is_closed
@@ -39,36 +134,88 @@ class GameManager:
     def is_active(self) -> bool:
         return len(self._player_to_id) > 0
 
+    @property
+    def last_activity(self) -> float:
+        return self._last_activity
+
+    @property
+    def has_human_players(self) -> bool:
+        return any(isinstance(player, WebSocketTransport) for player in self._player_to_id)
+
+    @property
+    def number_of_humans(self) -> int:
+        return sum(isinstance(player, WebSocketTransport) for player in self._player_to_id)
+
+    @property
+    def number_of_ais(self) -> int:
+        return sum(isinstance(player, GameAI) for player in self._player_to_id)
+
+    @property
+    def mailbox_depth(self) -> int:
+        return self._mailbox.qsize()
+
+    def get_mailbox_stats(self) -> models.MailboxStats:
+        return models.MailboxStats(
+            depth=self._mailbox.qsize(),
+            max_depth=self._max_mailbox_depth,
+            capacity=self._mailbox_size,
+            processed=self._processed_actions,
+            rejected=self._rejected_actions,
+        )
+
     async def close_game(self):
+        """
+        Disconnect every client, all at once, and stop processing actions.
+        """
         logger.info(f"Closing game {self._game_id}.")
         if self._is_closed:
             return
-        async with self._player_lock:
-            for client_id in self._player_to_id.values():
-                await self._disconnect(client_id)
+        # Closed first so no client joins while the others are leaving, and the leavers are not sent updates.
         self._is_closed = True
+        async with self._player_lock:
+            client_ids = list(self._player_to_id.values())
+        # `_disconnect` takes the lock itself, so it is called with the lock released.
+        await asyncio.gather(*(self._disconnect(client_id) for client_id in client_ids), return_exceptions=True)
+        if self._mailbox_consumer is not None:
+            self._mailbox_consumer.cancel()
+        if self._spectator_fan_out is not None:
+            self._spectator_fan_out.cancel()
 
-    async def handle_connection(self, client: WebSocket):
+    async def handle_connection(
+        self,
+        client: WebSocket,
+        encoding: models.FrameEncoding = models.FrameEncoding.JSON,
+        features: frozenset[models.ClientFeature] = frozenset(),
+        settings: models.OutboundQueueSettings | None = None,
+        resume_token: str | None = None,
+        last_seen: int = 0,
+    ):
+        """
+        Serve a websocket client until it leaves. Clients with the resume feature that pass the token of a session
+        still in its grace window take its place, and are only sent the frames after `last_seen`.
+        """
         if self._is_closed:
             raise ValueError(f"Game ({self._game_id}) is closed can not add new clients.")
-        client_id = await self._connect_human(client)
-        await self._message_client_locked(
-            client_id=client_id,
-            message=models.SimpleResponse(
-                parameters=models.SimpleResponseParameters(message=f"Client {client_id} connected.")
-            ),
-        )
-        await self._update_client_state(client_id)
+        client_id = None
+        if resume_token is not None and models.ClientFeature.RESUME in features:
+            client_id = await self._resume_human(client, resume_token, last_seen, encoding, features, settings)
+        if client_id is None:
+            client_id = await self._connect_human(client, encoding, features, settings)
+            await self._update_client_state(client_id)
+        leaving = False
         try:
             while not self._is_closed:
                 message_text = await client.receive_text()
-                logger.info(f"Client {client_id} messaged with {message_text} ({type(message_text)}).")
+                _MESSAGES_IN.inc()
+                message_logger.debug(Event("message", game=self._game_id, client=client_id, text=message_text))
                 await self._handle_message(client_id, message_text)
+        except WebSocketDisconnect as error:
+            leaving = error.code == NORMAL_CLOSURE
         except Exception:
             logger.error(f"Error while handling message from client {client_id}.")
 
         logger.info(f"Client {client_id} closed connection.")
-        await self._disconnect(client_id)
+        await self._connection_lost(client_id, client, leaving=leaving)
 
     def get_metadata(self) -> models.GameMetadataUnion:
         return self._game.get_metadata()
@@ -86,20 +233,86 @@ class GameManager:
         ai_manager = AIManager(
             game_models=game.get_game_ai(),
             add_ai=manager._connect_ai,
-            act_as_ai=manager._action_message,
+            act_as_ai=manager._act_as_ai,
             remove_ai=manager._disconnect,
         )
         manager._set_ai_manager(ai_manager)
         return manager
 
-    async def _connect_human(self, client: WebSocket) -> str:
-        await client.accept()
+    async def _connect_human(
+        self,
+        websocket: WebSocket,
+        encoding: models.FrameEncoding = models.FrameEncoding.JSON,
+        features: frozenset[models.ClientFeature] = frozenset(),
+        settings: models.OutboundQueueSettings | None = None,
+    ) -> str:
+        await websocket.accept()
+        client = WebSocketTransport(websocket, encoding, features, settings)
         client_id = str(uuid.uuid4())
-        logger.info(f"Client {client} ({client_id}) joined game {self._game_id}.")
+        logger.info(
+            f"Client {websocket} ({client_id}) joined game {self._game_id} using {encoding.value} frames "
+            + f"with features {sorted(feature.value for feature in features)}."
+        )
         async with self._player_lock:
             self._player_to_id[client] = client_id
             self._id_to_player[client_id] = client
             self._session.add_client(client_id)
+            if models.ClientFeature.RESUME in features:
+                self._resume_tokens[client_id] = secrets.token_urlsafe(24)
+                self._replay.track(client_id)
+            self._last_activity = time.monotonic()
+        client.start(on_failure=functools.partial(self._connection_lost, client_id, websocket))
+        return client_id
+
+    async def _resume_human(
+        self,
+        websocket: WebSocket,
+        resume_token: str,
+        last_seen: int,
+        encoding: models.FrameEncoding,
+        features: frozenset[models.ClientFeature],
+        settings: models.OutboundQueueSettings | None,
+    ) -> str | None:
+        """
+        Put a new connection in the place of the session holding the resume token, returning the session's client ID,
+        or None if no session holds it. The client is sent the frames it missed, or the full state if they are no
+        longer all in the replay buffer.
+        """
+        client = WebSocketTransport(websocket, encoding, features, settings)
+        async with self._player_lock:
+            client_id = next(
+                (
+                    client_id
+                    for client_id, token in self._resume_tokens.items()
+                    if secrets.compare_digest(token, resume_token)
+                ),
+                None,
+            )
+            previous = self._id_to_player.get(client_id) if client_id is not None else None
+            if client_id is None or not isinstance(previous, WebSocketTransport):
+                logger.info(f"Resume token for game {self._game_id} is unknown or expired, connecting as a new client.")
+                return None
+            if (expiry := self._suspended.pop(client_id, None)) is not None:
+                expiry.cancel()
+            del self._player_to_id[previous]
+            self._player_to_id[client] = client_id
+            self._id_to_player[client_id] = client
+            self._last_activity = time.monotonic()
+            client.enqueue(self._get_resume_message(client_id, resumed=True))
+            frames = self._replay.replay(client_id, last_seen)
+            if frames is None or len(frames) >= client.capacity:
+                logger.info(f"Client {client_id} resumed game {self._game_id}, sending the full state.")
+                frames = [
+                    self._replay.record(client_id, message) for message in self._get_current_state_messages(client_id)
+                ]
+            else:
+                logger.info(f"Client {client_id} resumed game {self._game_id}, replaying {len(frames)} frames.")
+            for frame in frames:
+                client.enqueue(frame)
+        # The previous connection may still be open if the client noticed the drop before the server did.
+        await previous.close()
+        await websocket.accept()
+        client.start(on_failure=functools.partial(self._connection_lost, client_id, websocket))
         return client_id
 
     async def _connect_ai(self, client: GameAI) -> str:
@@ -109,103 +322,417 @@ class GameManager:
             self._player_to_id[client] = client_id
             self._id_to_player[client_id] = client
             self._session.add_client(client_id)
+            self._last_activity = time.monotonic()
         return client_id
 
+    async def _connection_lost(self, client_id: str, websocket: WebSocket, leaving: bool = False):
+        """
+        Handle a client's websocket closing or failing. Resumable clients that did not leave keep their seat for the
+        grace window, the rest are disconnected.
+        """
+        client = self._id_to_player.get(client_id)
+        if not isinstance(client, WebSocketTransport) or client.websocket is not websocket:
+            # The client has already resumed on a new connection, or has been disconnected.
+            return
+        if leaving or self._is_closed or client_id not in self._resume_tokens:
+            await self._disconnect(client_id)
+            return
+        if client_id in self._suspended:
+            return
+        logger.info(f"Client {client_id} dropped out of game {self._game_id}, keeping its seat to resume.")
+        self._suspended[client_id] = asyncio.create_task(self._expire_suspension(client_id))
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+    async def _expire_suspension(self, client_id: str):
+        await asyncio.sleep(self._resume_grace)
+        del self._suspended[client_id]
+        logger.info(f"Client {client_id} did not resume game {self._game_id} in time.")
+        await self._disconnect(client_id)
+
     async def _disconnect(self, client_id: str):
         client = self._id_to_player.get(client_id)
         if client is None:
             return
+        self._last_activity = time.monotonic()
         async with self._player_lock:
-            if isinstance(client, WebSocket):
-                try:
-                    await client.close()
-                except Exception:
-                    pass
+            # The writer failing, the receive loop ending and the game closing can all disconnect the same client, only
+            # the first of them removes it.
+            if self._id_to_player.get(client_id) is not client:
+                return
             logger.info(f"Client {client_id} left game {self._game_id}")
             del self._player_to_id[client]
             del self._id_to_player[client_id]
+            self._client_views.pop(client_id, None)
             self._session.remove_client(client_id)
-        await self._broadcast_session_state()
-        await self._broadcast_ai_state()
+            self._resume_tokens.pop(client_id, None)
+            self._replay.forget(client_id)
+            self._ai_jobs.pop(client_id, None)
+            if (expiry := self._suspended.pop(client_id, None)) is not None:
+                expiry.cancel()
+        # Closing writes to the websocket, so it is done outside the lock in case the client is slow.
+        if isinstance(client, WebSocketTransport):
+            try:
+                await client.close()
+            except Exception:
+                pass
+        if not self._is_closed:
+            self._mark_dirty(Channel.SESSION, Channel.AI)
+            await self._broadcast_changes()
 
-    async def _message_client_locked(self, client_id: str, message: models.Response):
+    async def _message_client_locked(self, client_id: str, message: models.Response | OutboundMessage):
+        if not isinstance(message, OutboundMessage):
+            message = OutboundMessage(message)
         disconnect = False
         async with self._player_lock:
             disconnect = await self._message_client(client_id, message)
         if disconnect:
             await self._disconnect(client_id)
 
-    async def _message_client(self, client_id: str, message: models.Response) -> bool:
+    async def _message_client(self, client_id: str, message: OutboundMessage) -> bool:
         client = self._id_to_player.get(client_id)
-        if isinstance(client, WebSocket):
-            try:
-                await client.send_json(message.model_dump_json())
-            except Exception:
-                return True
+        if isinstance(client, WebSocketTransport):
+            if not self._enqueue(client_id, client, message):
+                return self._handle_overflow(client_id, client)
         elif isinstance(client, GameAI):
-            result = client.handle_message(message)
-            if result is not None:
-                async with self._action_lock:
-                    self._action_bus.append((client_id, result))
+            self._message_ai(client_id, client, message.message)
+        return False
+
+    def _enqueue(self, client_id: str, client: WebSocketTransport, message: OutboundMessage) -> bool:
+        """
+        Queue a message for a websocket client, numbered and kept in the replay buffer if the client can resume.
+        """
+        if client_id in self._resume_tokens:
+            message = self._replay.record(client_id, message)
+        _MESSAGES_OUT.inc()
+        return client.enqueue(message)
+
+    def _message_ai(self, client_id: str, client: GameAI, message: models.Response):
+        """
+        Pass a message to an AI. Every message is handled on the shared AI worker pool, in the AI's own FIFO queue, so
+        an AI only ever runs on one thread at a time and sees its messages in order, while other AIs in the game think
+        alongside it. Any resulting action is put in the mailbox once it is ready.
+        """
+        if message.message_type == models.ResponseType.GAME_STATE:
+            # Game states are what the AI decides its moves on, so only those are timed as thinking.
+            think = functools.partial(self._think, client, message)
+        else:
+            think = functools.partial(client.handle_message, message)
+        self._ai_jobs[client_id] = self._ai_scheduler.submit(
+            queue_id=client_id,
+            think=think,
+            on_done=functools.partial(self._submit_ai_action, client_id, client),
+            human_facing=self.has_human_players,
+        )
+
+    async def _act_as_ai(self, client_id: str, parsed_message: models.WebSocketRequest):
+        await self._action_message(client_id, parsed_message)
+        if parsed_message.request_type == models.WebSocketRequestType.SESSION:
+            # The AI manager reads an AI's seat straight after seating it, so wait for the AI to see the session state.
+            # Only that AI's own messages are waited for, not the thinking of the game's other AIs.
+            if (job := self._ai_jobs.get(client_id)) is not None:
+                await job
+
+    def _think(self, client: GameAI, message: models.Response) -> models.WebSocketRequest | None:
+        with self._ai_think_seconds.time():
+            return client.handle_message(message)
+
+    def _submit_ai_action(self, client_id: str, client: GameAI, action: models.WebSocketRequest | None):
+        # The AI may have been removed while it was thinking.
+        if action is not None and self._id_to_player.get(client_id) is client:
+            self._submit_action(client_id, action, bounded=False)
+
+    async def _message_client_all(self, client_id: str, messages: list[OutboundMessage]) -> bool:
+        """
+        Send several messages to a client, as a single bundle frame if the client supports it.
+        """
+        client = self._id_to_player.get(client_id)
+        if (
+            len(messages) > 1
+            and isinstance(client, WebSocketTransport)
+            and models.ClientFeature.BUNDLE in client.features
+        ):
+            return await self._message_client(client_id, OutboundMessage.bundle(messages))
+        for message in messages:
+            if await self._message_client(client_id, message):
+                return True
         return False
 
+    def _handle_overflow(self, client_id: str, client: WebSocketTransport) -> bool:
+        """
+        Apply the client's overflow policy once its outbound queue is full, returning whether to disconnect it.
+        """
+        match client.overflow_policy:
+            case models.OverflowPolicy.DISCONNECT:
+                logger.warning(f"Client {client_id} in game {self._game_id} fell behind, disconnecting.")
+                return True
+            case models.OverflowPolicy.KEEP_LATEST:
+                logger.warning(f"Client {client_id} in game {self._game_id} fell behind, sending the latest state.")
+                client.clear()
+                messages = self._get_current_state_messages(client_id)
+                if models.ClientFeature.BUNDLE in client.features:
+                    messages = [OutboundMessage.bundle(messages)]
+                for message in messages:
+                    self._enqueue(client_id, client, message)
+                return False
+
+    def _get_current_state_messages(self, client_id: str) -> list[OutboundMessage]:
+        """
+        The messages that bring a client up to date with every channel, whatever it was sent before.
+        """
+        view_key, view = self._state_views.get_view(self._session.get_client_position(client_id))
+        self._client_views[client_id] = (view_key, view.version)
+        return [
+            self._session.get_session_state_message_for_client(client_id),
+            view.snapshot,
+            self._get_ai_state_message(),
+        ]
+
     async def _update_client_state(self, client_id: str):
-        session_state = self._session.get_session_state_response_for_client(client_id)
-        await self._message_client_locked(client_id, session_state)
-        game_position = self._session.get_client_position(client_id)
-        game_state = self._game.get_game_state_response(game_position)
-        await self._message_client_locked(client_id, game_state)
-        ai_state = self._ai_manager.get_ai_players()
-        message = models.AIStateResponse(parameters=models.AIStateResponseParameters(ai_players=ai_state))
-        await self._message_client_locked(client_id, message)
-
-    async def _broadcast_session_state(self):
-        to_disconnect: list[str] = []
+        """
+        Bring a newly connected client up to date with every channel.
+        """
+        disconnect = False
         async with self._player_lock:
-            for client_id in self._player_to_id.values():
-                message = self._session.get_session_state_response_for_client(client_id)
-                if await self._message_client(client_id, message):
-                    to_disconnect.append(client_id)
-        for client_id in to_disconnect:
+            client = self._id_to_player.get(client_id)
+            if isinstance(client, WebSocketTransport) and client_id in self._resume_tokens:
+                client.enqueue(self._get_resume_message(client_id, resumed=False))
+            connected = OutboundMessage(
+                models.SimpleResponse(
+                    parameters=models.SimpleResponseParameters(message=f"Client {client_id} connected.")
+                )
+            )
+            messages = [connected, *self._get_current_state_messages(client_id)]
+            disconnect = await self._message_client_all(client_id, messages)
+        if disconnect:
             await self._disconnect(client_id)
 
-    async def _broadcast_game_state(self):
+    async def _send_game_state_snapshot(self, client_id: str):
+        """
+        Send the client the full game state, this is also how clients that missed a delta resynchronise.
+        """
+        disconnect = False
+        async with self._player_lock:
+            view_key, view = self._state_views.get_view(self._session.get_client_position(client_id))
+            self._client_views[client_id] = (view_key, view.version)
+            disconnect = await self._message_client(client_id, view.snapshot)
+        if disconnect:
+            await self._disconnect(client_id)
+
+    def _mark_dirty(self, *channels: Channel):
+        self._dirty_channels.update(channels)
+
+    async def _broadcast_changes(self):
+        """
+        Send every player the channels that have changed since the last broadcast, and hand the changes to the
+        spectator fan-out. Players whose view of the game changed, for example by taking a seat, also get the game
+        state even if the game itself did not change.
+        """
         to_disconnect: list[str] = []
+        start = time.perf_counter()
         async with self._player_lock:
-            for client_id in self._id_to_player:
-                game_position = self._session.get_client_position(client_id)
-                message = self._game.get_game_state_response(game_position)
-                if await self._message_client(client_id, message):
+            dirty_channels = self._dirty_channels
+            self._dirty_channels = set()
+            ai_message = self._get_ai_state_message() if Channel.AI in dirty_channels else None
+            for client_id, client in self._id_to_player.items():
+                if self._is_spectator(client_id, client):
+                    continue
+                messages: list[OutboundMessage] = []
+                if Channel.SESSION in dirty_channels:
+                    messages.append(self._session.get_session_state_message_for_client(client_id))
+                if Channel.GAME in dirty_channels or self._has_view_changed(client_id):
+                    game_message = self._get_game_state_message(client_id, client)
+                    if game_message is not None:
+                        messages.append(game_message)
+                if ai_message is not None:
+                    messages.append(ai_message)
+                if messages and await self._message_client_all(client_id, messages):
                     to_disconnect.append(client_id)
+        _PLAYER_BROADCAST_SECONDS.observe(time.perf_counter() - start)
+        self._mark_spectators_dirty(dirty_channels)
         for client_id in to_disconnect:
             await self._disconnect(client_id)
 
-    async def _broadcast_ai_state(self):
+    def _is_spectator(self, client_id: str, client: Player) -> bool:
+        return isinstance(client, WebSocketTransport) and self._session.get_client_position(client_id) is None
+
+    def _mark_spectators_dirty(self, channels: set[Channel]):
+        if not channels:
+            return
+        self._spectator_dirty_channels.update(channels)
+        self._spectators_idle.clear()
+        if self._spectator_fan_out is None or self._spectator_fan_out.done():
+            self._spectator_fan_out = asyncio.create_task(self._run_spectator_fan_out())
+        self._spectator_wakeup.set()
+
+    async def _run_spectator_fan_out(self):
+        """
+        Push changes to the spectators, at most once every `spectator_interval` seconds with the changes in between
+        coalesced into a single update.
+        """
+        loop = asyncio.get_running_loop()
+        last_push = -math.inf
+        while True:
+            await self._spectator_wakeup.wait()
+            delay = last_push + self._spectator_interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._spectator_wakeup.clear()
+            dirty_channels = self._spectator_dirty_channels
+            self._spectator_dirty_channels = set()
+            last_push = loop.time()
+            try:
+                with _SPECTATOR_BROADCAST_SECONDS.time():
+                    await self._push_to_spectators(dirty_channels)
+            except Exception:
+                logger.exception(f"Error while pushing to spectators of game {self._game_id}.")
+            if not self._spectator_dirty_channels:
+                self._spectators_idle.set()
+
+    async def _push_to_spectators(self, dirty_channels: set[Channel]):
+        """
+        Every spectator shares the same messages, so each is built and encoded once however many spectators there
+        are. Pushing only puts the messages on the spectators' queues, so it never waits on a slow spectator and
+        does not take the player lock.
+        """
+        session_message = self._session.get_session_state_message(None) if Channel.SESSION in dirty_channels else None
+        ai_message = self._get_ai_state_message() if Channel.AI in dirty_channels else None
+        _, view = self._state_views.get_view(None)
+        previous_view = self._last_spectator_view
+        self._last_spectator_view = view
         to_disconnect: list[str] = []
-        ai_players = self._ai_manager.get_ai_players()
-        message = models.AIStateResponse(parameters=models.AIStateResponseParameters(ai_players=ai_players))
-        async with self._player_lock:
-            for client_id in self._id_to_player:
-                if await self._message_client(client_id, message):
-                    to_disconnect.append(client_id)
+        for client_id, client in list(self._id_to_player.items()):
+            if not self._is_spectator(client_id, client):
+                continue
+            messages = [] if session_message is None else [session_message]
+            if Channel.GAME in dirty_channels or self._has_view_changed(client_id):
+                game_message = self._get_game_state_message(client_id, client, catch_up=previous_view)
+                if game_message is not None:
+                    messages.append(game_message)
+            if ai_message is not None:
+                messages.append(ai_message)
+            if messages and await self._message_client_all(client_id, messages):
+                to_disconnect.append(client_id)
         for client_id in to_disconnect:
             await self._disconnect(client_id)
 
+    def _get_resume_message(self, client_id: str, resumed: bool) -> OutboundMessage:
+        return OutboundMessage(
+            models.ResumeResponse(
+                parameters=models.ResumeResponseParameters(token=self._resume_tokens[client_id], resumed=resumed)
+            )
+        )
+
+    def _get_ai_state_message(self) -> OutboundMessage:
+        ai_players = self._ai_manager.get_ai_players()
+        return OutboundMessage(
+            models.AIStateResponse(parameters=models.AIStateResponseParameters(ai_players=ai_players))
+        )
+
+    def _has_view_changed(self, client_id: str) -> bool:
+        last_sent = self._client_views.get(client_id)
+        view_key = self._game.get_view_key(self._session.get_client_position(client_id))
+        return last_sent is None or last_sent[0] != view_key
+
+    def _get_game_state_message(
+        self, client_id: str, client: Player, catch_up: GameStateView | None = None
+    ) -> OutboundMessage | None:
+        """
+        Pick the game state message for the client. Clients sharing a view share the same message, so each view is
+        only built and encoded once per state version. Clients that asked for deltas get a delta when they hold the
+        previous version of their view (or the `catch_up` version), and nothing when they are already up to date.
+        """
+        view_key, view = self._state_views.get_view(self._session.get_client_position(client_id))
+        last_sent = self._client_views.get(client_id)
+        self._client_views[client_id] = (view_key, view.version)
+        if isinstance(client, WebSocketTransport) and models.ClientFeature.DELTA in client.features:
+            if last_sent == (view_key, view.version):
+                return None
+            if last_sent is not None and last_sent == (view_key, view.previous_version):
+                return view.delta
+            if catch_up is not None and last_sent == (view_key, catch_up.version):
+                return view.delta_from(catch_up)
+        return view.snapshot
+
     async def _handle_message(self, client_id: str, message: str):
+        """
+        Parse a client's message and put it in the mailbox. The cheapest rejections come first: a full mailbox before
+        the message is parsed, and unknown functions or calls the game rejects early before the parameters are.
+        """
+        if self._is_mailbox_full():
+            self._reject_action(client_id)
+            await self._send_error(client_id, "The game is busy, the action was rejected. Please try again.")
+            return
         try:
-            parsed_message = models.WebSocketRequest.model_validate_json(message)
+            parsed_message = self._request_parser.parse(message, functools.partial(self._check_request, client_id))
         except pydantic.ValidationError as error:
-            logger.exception("Could not parse message")
-            await self._message_client_locked(
-                client_id=client_id,
-                message=models.ErrorResponse(
-                    parameters=models.ErrorResponseParameters(error_message=f"Invalid message: {error}")
-                ),
-            )
+            if (reason := rejection_reason(error)) is not None:
+                message_logger.info(Event("rejected", game=self._game_id, client=client_id, reason=reason))
+                await self._send_error(client_id, reason)
+                return
+            message_logger.info(Event("invalid", game=self._game_id, client=client_id, error=error))
+            await self._send_error(client_id, f"Invalid message: {error}")
             return
-        asyncio.create_task(self._action_message(client_id, parsed_message))
+        if not self._submit_action(client_id, parsed_message):
+            await self._send_error(client_id, "The game is busy, the action was rejected. Please try again.")
+
+    def _check_request(
+        self, client_id: str, request_type: models.WebSocketRequestType, function_name: str
+    ) -> str | None:
+        if request_type != models.WebSocketRequestType.GAME or function_name in MANAGER_GAME_FUNCTIONS:
+            return None
+        if self._unfinished_actions:
+            # Earlier actions could still change the answer, the game checks the call itself once it is processed.
+            return None
+        position = self._session.get_client_position(client_id)
+        if position is None:
+            return "Take a position before making moves."
+        return self._game.check_function_call(position, function_name)
+
+    async def _send_error(self, client_id: str, error_message: str):
+        await self._message_client_locked(
+            client_id=client_id,
+            message=models.ErrorResponse(parameters=models.ErrorResponseParameters(error_message=error_message)),
+        )
+
+    def _is_mailbox_full(self) -> bool:
+        return self._mailbox.qsize() >= self._mailbox_size
+
+    def _reject_action(self, client_id: str):
+        self._rejected_actions += 1
+        logger.warning(f"Mailbox for game {self._game_id} is full, rejecting action from client {client_id}.")
+
+    def _submit_action(self, client_id: str, request: models.WebSocketRequest, bounded: bool = True) -> bool:
+        """
+        Put an action in the game's mailbox, returning False if it was rejected because the mailbox is full. Actions
+        from AI players are never rejected, as there is at most one in flight per AI.
+        """
+        if bounded and self._is_mailbox_full():
+            self._reject_action(client_id)
+            return False
+        if self._mailbox_consumer is None or self._mailbox_consumer.done():
+            self._mailbox_consumer = asyncio.create_task(self._consume_mailbox())
+        self._mailbox.put_nowait((client_id, request))
+        self._unfinished_actions += 1
+        self._max_mailbox_depth = max(self._max_mailbox_depth, self._mailbox.qsize())
+        return True
+
+    async def _consume_mailbox(self):
+        while True:
+            client_id, request = await self._mailbox.get()
+            try:
+                await self._action_message(client_id, request)
+            except Exception:
+                logger.exception(f"Error while handling action from client {client_id} in game {self._game_id}.")
+            finally:
+                self._processed_actions += 1
+                self._unfinished_actions -= 1
+                self._mailbox.task_done()
 
     async def _action_message(self, client_id: str, parsed_message: models.WebSocketRequest):
+        self._last_activity = time.monotonic()
         match parsed_message.request_type:
             case models.WebSocketRequestType.SESSION:
                 response = self._session.handle_function_call(
@@ -216,28 +743,34 @@ class GameManager:
                 if response:
                     await self._message_client_locked(client_id, response)
                 else:
-                    await self._broadcast_session_state()
-                    await self._broadcast_game_state()
-                    await self._broadcast_ai_state()
+                    self._mark_dirty(Channel.SESSION)
+                    await self._broadcast_changes()
             case models.WebSocketRequestType.GAME:
                 if parsed_message.function_name == "get_game_state":
-                    response = None
+                    await self._send_game_state_snapshot(client_id)
                 else:
                     position = self._session.get_client_position(client_id)
                     if position is None:
                         return
-                    response = self._game.handle_function_call(
+                    response = await self._game.perform_function_call_async(
                         player_position=position,
                         function_name=parsed_message.function_name,
                         function_parameters=parsed_message.parameters,
                     )
-
-                if response:
-                    await self._message_client_locked(client_id, response)
-                else:
-                    await self._broadcast_session_state()
-                    await self._broadcast_game_state()
-                    await self._broadcast_ai_state()
+                    if response:
+                        await self._message_client_locked(client_id, response)
+                    else:
+                        if self._action_recorder is not None:
+                            self._action_recorder(
+                                models.GameAction(
+                                    state_version=self._game.state_version,
+                                    player_position=position,
+                                    function_name=parsed_message.function_name,
+                                    parameters=models.function_parameters_as_dict(parsed_message.parameters),
+                                )
+                            )
+                        self._mark_dirty(Channel.GAME)
+                        await self._broadcast_changes()
             case models.WebSocketRequestType.AI:
                 response = await self._ai_manager.handle_function_call(
                     requester_client_id=client_id,
@@ -247,11 +780,5 @@ class GameManager:
                 if response:
                     await self._message_client_locked(client_id, response)
                 else:
-                    await self._broadcast_session_state()
-                    await self._broadcast_game_state()
-                    await self._broadcast_ai_state()
-
-        async with self._action_lock:
-            while len(self._action_bus) != 0:
-                action_client_id, action_message = self._action_bus.pop(0)
-                asyncio.create_task(self._action_message(action_client_id, action_message))
+                    self._mark_dirty(Channel.SESSION, Channel.AI)
+                    await self._broadcast_changes()
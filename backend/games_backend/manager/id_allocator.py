@@ -0,0 +1,69 @@
+import math
+import random
+import string
+from collections.abc import Callable
+from typing import final
+
+from games_backend.manager.db_manager import DBManager
+from games_backend.utils import GAME_NAME_LENGTH
+
+ID_SPACE = len(string.ascii_uppercase) ** GAME_NAME_LENGTH
+
+
+def game_id_from_index(index: int) -> str:
+    """
+    The game ID at an index of the ID space, written in base 26 with A as zero.
+    """
+    letters: list[str] = []
+    for _ in range(GAME_NAME_LENGTH):
+        index, letter = divmod(index, len(string.ascii_uppercase))
+        letters.append(string.ascii_uppercase[letter])
+    return "".join(reversed(letters))
+
+
+@final
+class GameIdAllocator:
+    """
+    Hands out free game IDs in constant time, however many games exist.
+
+    Candidates come from a counter run through a random affine permutation of the ID space, so they never repeat
+    until the whole space has been offered and are not guessable from each other. Each candidate is then reserved
+    atomically in the database, which skips IDs taken by earlier runs or other processes and means concurrent
+    creators can never be handed the same ID.
+
+    `accepts` limits the IDs handed out, for example to those owned by this worker, which costs a constant number of
+    extra candidates per ID as long as it accepts a fixed share of the space.
+    """
+
+    def __init__(
+        self,
+        db_manager: DBManager,
+        rng: random.Random | None = None,
+        accepts: Callable[[str], bool] | None = None,
+    ):
+        rng = rng or random.SystemRandom()
+        self._db_manager: DBManager = db_manager
+        self._accepts: Callable[[str], bool] | None = accepts
+        self._multiplier: int = rng.randrange(1, ID_SPACE)
+        while math.gcd(self._multiplier, ID_SPACE) != 1:
+            self._multiplier = rng.randrange(1, ID_SPACE)
+        self._offset: int = rng.randrange(ID_SPACE)
+        self._counter: int = 0
+
+    def next_candidate(self) -> str:
+        if self._counter >= ID_SPACE:
+            raise RuntimeError("Every game ID has been offered, there are no free game IDs left.")
+        index = (self._multiplier * self._counter + self._offset) % ID_SPACE
+        self._counter += 1
+        return game_id_from_index(index)
+
+    async def allocate(self) -> str:
+        """
+        Reserve and return a game ID no other game is using.
+        """
+        while True:
+            candidate = self.next_candidate()
+            if self._accepts is not None and not self._accepts(candidate):
+                continue
+            if await self._db_manager.reserve_game_id(candidate):
+                return candidate
@@ -0,0 +1,62 @@
+import collections
+import os
+from typing import final
+
+from games_backend.manager.frames import OutboundMessage
+
+# The number of frames a game keeps for clients that may resume, shared between all of its clients.
+DEFAULT_REPLAY_SIZE = int(os.getenv("REPLAY_BUFFER_SIZE", "1024"))
+
+
+@final
+class ReplayBuffer:
+    """
+    The most recent frames sent to a game's resumable clients, so a client that reconnects can be sent just the frames
+    it missed. Frames are numbered from a sequence shared by the whole game, and a client tells which frames it has
+    seen by the sequence number of the last one.
+
+    The buffer holds a fixed number of frames, once a client has had a frame it has not seen pushed out it can only be
+    brought back up to date with the full state.
+    """
+
+    def __init__(self, size: int = DEFAULT_REPLAY_SIZE):
+        self._size: int = size
+        self._frames: collections.deque[tuple[str, int, OutboundMessage]] = collections.deque()
+        self._last_sequence: int = 0
+        # The sequence number of the newest frame pushed out of the buffer for each client frames are kept for.
+        self._dropped: dict[str, int] = {}
+
+    @property
+    def last_sequence(self) -> int:
+        return self._last_sequence
+
+    def track(self, client_id: str):
+        self._dropped.setdefault(client_id, 0)
+
+    def forget(self, client_id: str):
+        self._dropped.pop(client_id, None)
+
+    def record(self, client_id: str, message: OutboundMessage) -> OutboundMessage:
+        """
+        Number a frame for a client and keep it, returning the numbered frame to send.
+        """
+        self._last_sequence += 1
+        frame = OutboundMessage.sequenced(message, self._last_sequence)
+        self._frames.append((client_id, self._last_sequence, frame))
+        if len(self._frames) > self._size:
+            dropped_id, dropped_sequence, _ = self._frames.popleft()
+            if dropped_id in self._dropped:
+                self._dropped[dropped_id] = dropped_sequence
+        return frame
+
+    def replay(self, client_id: str, last_seen: int) -> list[OutboundMessage] | None:
+        """
+        The client's frames after `last_seen` in the order they were sent, or None if some of them are gone.
+        """
+        if client_id not in self._dropped or self._dropped[client_id] > last_seen:
+            return None
+        return [
+            frame
+            for frame_client_id, sequence, frame in self._frames
+            if frame_client_id == client_id and sequence > last_seen
+        ]
@@ -0,0 +1,107 @@
+import functools
+from collections.abc import Callable
+from typing import Annotated, Any, Literal, Union, final
+
+import pydantic
+import pydantic_core
+
+from games_backend import models
+from games_backend.game_base import GameBase
+from games_backend.manager.ai_manager import AIManager
+from games_backend.manager.session_manager import SessionManager
+
+# Checks the request type and function name of a request for one of the game's own functions, returning why the
+# request is rejected or None if it may go ahead.
+RequestCheck = Callable[[models.WebSocketRequestType, str], str | None]
+
+REJECTED_ERROR_TYPE = "request_rejected"
+
+# Game functions handled by the game manager rather than the game.
+MANAGER_GAME_FUNCTIONS: dict[str, type[pydantic.BaseModel]] = {"get_game_state": models.NoParameters}
+
+
+class _CheckedRequest(models.WebSocketRequest):
+    """
+    Base of the generated models of requests for the game's own functions, which run the `check` in the validation
+    context as soon as the function name has been validated. This is an after validator on the function name rather
+    than a before validator on the model, as the latter would turn the whole message into Python objects first.
+    """
+
+    @pydantic.field_validator("function_name")
+    @classmethod
+    def _check(cls, function_name: str, info: pydantic.ValidationInfo) -> str:
+        check: RequestCheck | None = info.context.get("check") if info.context else None
+        if check is not None and (reason := check(info.data["request_type"], function_name)) is not None:
+            raise pydantic_core.PydanticCustomError(REJECTED_ERROR_TYPE, "{reason}", {"reason": reason})
+        return function_name
+
+
+def _request_model(
+    request_type: models.WebSocketRequestType, function_name: str, parameters: type[pydantic.BaseModel]
+) -> type[models.WebSocketRequest]:
+    checked = request_type == models.WebSocketRequestType.GAME and function_name not in MANAGER_GAME_FUNCTIONS
+    return pydantic.create_model(
+        f"{request_type.name.title()}{function_name.title().replace('_', '')}Request",
+        __base__=_CheckedRequest if checked else models.WebSocketRequest,
+        request_type=(Literal[request_type], ...),
+        function_name=(Literal[function_name], ...),
+        parameters=(parameters, ...),
+    )
+
+
+def _tagged_union(members: list[Any], tag: str) -> Any:
+    if len(members) == 1:
+        return members[0]
+    return Annotated[Union[tuple(members)], pydantic.Field(discriminator=tag)]
+
+
+@functools.cache
+def get_request_parser(game_type: type[GameBase]) -> "RequestParser":
+    """
+    The request parser for a game type, compiled once and shared by every game of the type.
+    """
+    return RequestParser(
+        {
+            models.WebSocketRequestType.SESSION: SessionManager.function_schemas,
+            models.WebSocketRequestType.GAME: game_type.function_schemas | MANAGER_GAME_FUNCTIONS,
+            models.WebSocketRequestType.AI: AIManager.function_schemas,
+        }
+    )
+
+
+@final
+class RequestParser:
+    """
+    Parses a websocket message straight into a request with its function's own parameters model, in a single pass.
+
+    Requests are a union tagged by request type then function name, so a request for an unknown function is rejected
+    from its tags alone without its parameters being validated. The check passed to `parse` runs in the same pass,
+    so rejected requests never reach the mailbox or the game.
+    """
+
+    def __init__(self, schemas: dict[models.WebSocketRequestType, dict[str, type[pydantic.BaseModel]]]):
+        request_types = [
+            _tagged_union(
+                [_request_model(request_type, name, parameters) for name, parameters in functions.items()],
+                "function_name",
+            )
+            for request_type, functions in schemas.items()
+        ]
+        self._adapter: pydantic.TypeAdapter[models.WebSocketRequest] = pydantic.TypeAdapter(
+            _tagged_union(request_types, "request_type")
+        )
+
+    def parse(self, message: str | bytes, check: RequestCheck | None = None) -> models.WebSocketRequest:
+        """
+        Parse a message, raising `pydantic.ValidationError` if it is invalid or rejected by `check`.
+        """
+        return self._adapter.validate_json(message, context=None if check is None else {"check": check})
+
+
+def rejection_reason(error: pydantic.ValidationError) -> str | None:
+    """
+    Why the request check rejected a request, or None if it failed validation for another reason.
+    """
+    return next(
+        (str(details["ctx"]["reason"]) for details in error.errors() if details["type"] == REJECTED_ERROR_TYPE), None
+    )
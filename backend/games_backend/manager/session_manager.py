@@ -1,9 +1,11 @@
-from typing import Any
+from typing import ClassVar
 
 import pydantic
+import pydantic_core
 
 from games_backend import models
 from games_backend.app_logger import logger
+from games_backend.manager.frames import OutboundMessage
 
 
 class SetPlayerParameters(pydantic.BaseModel):
@@ -15,11 +17,28 @@ class SetPlayerPositionParameters(pydantic.BaseModel):
 
 
 class SessionManager:
+    function_schemas: ClassVar[dict[str, type[pydantic.BaseModel]]] = {
+        "set_player_name": SetPlayerParameters,
+        "set_player_position": SetPlayerPositionParameters,
+        "leave_player_position": models.NoParameters,
+    }
+
     def __init__(self, max_players: int):
         self._max_players = max_players
         self._player_names: dict[str, str] = {}
         self._position_to_player: dict[int, str | None] = {i: None for i in range(max_players)}
         self._player_to_position: dict[str, int | None] = {}
+        # Bumped whenever the seated players change. The session state messages are cached until it moves on, with
+        # the seated players encoded once and shared by every message.
+        self._version: int = 0
+        self._cached_version: int = -1
+        self._positions: dict[int, str | None] = {}
+        self._encoded_positions: str = ""
+        self._messages: dict[int | None, OutboundMessage] = {}
+
+    @property
+    def version(self) -> int:
+        return self._version
 
     def get_client_position(self, client_id: str) -> int | None:
         self._check_client(client_id)
@@ -44,13 +63,41 @@ class SessionManager:
             )
         )
 
+    def get_session_state_message(self, position: int | None) -> OutboundMessage:
+        """
+        The session state as seen from a position, one message shared by every client there. Each position's message
+        is the cached encoding of the seated players with only its own `user_position` added.
+        """
+        if self._cached_version != self._version:
+            self._cached_version = self._version
+            self._positions = self._get_positions()
+            self._encoded_positions = pydantic_core.to_json(self._positions).decode()
+            self._messages = {}
+        if (message := self._messages.get(position)) is None:
+            response = models.SessionStateResponse.model_construct(
+                parameters=models.SessionStateResponseParameters.model_construct(
+                    player_positions=self._positions, user_position=position
+                )
+            )
+            user_position = "null" if position is None else position
+            message = OutboundMessage.with_json(
+                response,
+                f'{{"message_type":"{models.ResponseType.SESSION_STATE.value}","parameters":'
+                + f'{{"player_positions":{self._encoded_positions},"user_position":{user_position}}}}}',
+            )
+            self._messages[position] = message
+        return message
+
+    def get_session_state_message_for_client(self, client_id: str) -> OutboundMessage:
+        return self.get_session_state_message(self.get_client_position(client_id))
+
     def handle_function_call(
-        self, client_id: str, function_name: str, function_parameters: dict[str, Any]
+        self, client_id: str, function_name: str, function_parameters: models.FunctionParameters
     ) -> models.ErrorResponse | None:
         match function_name:
             case "set_player_name":
                 try:
-                    parsed_parameters = SetPlayerParameters.model_validate(function_parameters)
+                    parsed_parameters = models.parse_function_parameters(SetPlayerParameters, function_parameters)
                 except pydantic.ValidationError as error:
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(
@@ -62,7 +109,9 @@ class SessionManager:
                 logger.info(f"Client {client_id} player name is now {self._player_names[client_id]}.")
             case "set_player_position":
                 try:
-                    parsed_parameters = SetPlayerPositionParameters.model_validate(function_parameters)
+                    parsed_parameters = models.parse_function_parameters(
+                        SetPlayerPositionParameters, function_parameters
+                    )
                 except pydantic.ValidationError as error:
                     return models.ErrorResponse(
                         parameters=models.ErrorResponseParameters(
@@ -92,6 +141,8 @@ class SessionManager:
     def _set_client_name(self, client_id: str, name: str):
         self._check_client(client_id)
         self._player_names[client_id] = name
+        if self._player_to_position.get(client_id) is not None:
+            self._version += 1
 
     def _move_client_position(self, client_id: str, new_position: int):
         self._check_client(client_id)
@@ -102,6 +153,7 @@ class SessionManager:
         self._remove_client_from_position(client_id)
         self._position_to_player[new_position] = client_id
         self._player_to_position[client_id] = new_position
+        self._version += 1
 
     def _check_client(self, client_id: str):
         if client_id not in self._player_names:
@@ -111,4 +163,5 @@ class SessionManager:
         position = self._player_to_position.get(client_id)
         if position is not None:
             self._position_to_player[position] = None
+            self._version += 1
         self._player_to_position[client_id] = None
@@ -0,0 +1,80 @@
+from collections.abc import Hashable
+from typing import Self, final
+
+from games_backend import game_base, models
+from games_backend.manager.frames import OutboundMessage
+
+
+@final
+class GameStateView:
+    """
+    A snapshot of one view of the game state at a single state version, along with the delta from the snapshot of the
+    same view that came before it.
+    """
+
+    def __init__(self, game: game_base.GameBase, position: int | None, previous: Self | None):
+        self._game: game_base.GameBase = game
+        self._response: models.GameStateResponse = game.get_game_state_snapshot(position)
+        self._snapshot: OutboundMessage = OutboundMessage(self._response)
+        self._previous_response: models.GameStateResponse | None = None if previous is None else previous.response
+        # Deltas to this view, keyed by the state version they start from.
+        self._deltas: dict[int, OutboundMessage] = {}
+
+    @property
+    def version(self) -> int:
+        return self._response.state_version
+
+    @property
+    def previous_version(self) -> int | None:
+        if self._previous_response is None:
+            return None
+        return self._previous_response.state_version
+
+    @property
+    def response(self) -> models.GameStateResponse:
+        return self._response
+
+    @property
+    def snapshot(self) -> OutboundMessage:
+        return self._snapshot
+
+    @property
+    def delta(self) -> OutboundMessage | None:
+        """
+        The delta from the previous version of this view, built the first time it is asked for.
+        """
+        if self._previous_response is None:
+            return None
+        return self._get_delta(self._previous_response)
+
+    def delta_from(self, older: Self) -> OutboundMessage:
+        """
+        The delta from an older snapshot of this view, built the first time it is asked for.
+        """
+        return self._get_delta(older.response)
+
+    def _get_delta(self, previous_response: models.GameStateResponse) -> OutboundMessage:
+        if previous_response.state_version not in self._deltas:
+            self._deltas[previous_response.state_version] = OutboundMessage(
+                self._game.get_game_state_delta(previous_response, self._response)
+            )
+        return self._deltas[previous_response.state_version]
+
+
+@final
+class GameStateViews:
+    """
+    Builds each view of the game state at most once per state version.
+    """
+
+    def __init__(self, game: game_base.GameBase):
+        self._game: game_base.GameBase = game
+        self._views: dict[Hashable, GameStateView] = {}
+
+    def get_view(self, position: int | None) -> tuple[Hashable, GameStateView]:
+        view_key = self._game.get_view_key(position)
+        view = self._views.get(view_key)
+        if view is None or view.version != self._game.state_version:
+            view = GameStateView(self._game, position, previous=view)
+            self._views[view_key] = view
+        return view_key, view
@@ -0,0 +1,122 @@
+import asyncio
+import contextlib
+from collections.abc import Awaitable, Callable
+from typing import final
+
+from fastapi import WebSocket
+
+from games_backend import models
+from games_backend.app_logger import logger
+from games_backend.manager.frames import OutboundMessage
+
+
+@final
+class WebSocketTransport:
+    """
+    Sends pre-encoded frames to a websocket using the frame encoding negotiated when it connected. JSON frames go out
+    as text frames and binary frames as binary frames, neither is re-encoded on the way out.
+
+    Messages are put on a bounded queue and written by the transport's own writer task, so a slow client only ever
+    holds up its own messages.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        encoding: models.FrameEncoding = models.FrameEncoding.JSON,
+        features: frozenset[models.ClientFeature] = frozenset(),
+        settings: models.OutboundQueueSettings | None = None,
+    ):
+        self._websocket: WebSocket = websocket
+        self._encoding: models.FrameEncoding = encoding
+        self._features: frozenset[models.ClientFeature] = features
+        self._settings: models.OutboundQueueSettings = settings or models.OutboundQueueSettings()
+        self._queue: asyncio.Queue[OutboundMessage] = asyncio.Queue(maxsize=self._settings.max_size)
+        self._writer: asyncio.Task[None] | None = None
+        self._failed: bool = False
+        self._closed: bool = False
+
+    @property
+    def websocket(self) -> WebSocket:
+        return self._websocket
+
+    @property
+    def encoding(self) -> models.FrameEncoding:
+        return self._encoding
+
+    @property
+    def features(self) -> frozenset[models.ClientFeature]:
+        return self._features
+
+    @property
+    def overflow_policy(self) -> models.OverflowPolicy:
+        return self._settings.overflow_policy
+
+    @property
+    def capacity(self) -> int:
+        return self._settings.max_size
+
+    def start(self, on_failure: Callable[[], Awaitable[None]]) -> None:
+        """
+        Start the writer task, `on_failure` is awaited if a write to the websocket fails.
+        """
+        self._writer = asyncio.create_task(self._write(on_failure))
+
+    def enqueue(self, message: OutboundMessage) -> bool:
+        """
+        Queue a message to be written, returning False if the queue is full. Messages for a transport whose writer
+        has failed or that has been closed are dropped, as the client is already being disconnected.
+        """
+        if self._failed or self._closed:
+            return True
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def clear(self) -> None:
+        """
+        Drop every message that has not been written yet.
+        """
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+
+    async def drain(self) -> None:
+        """
+        Wait until every queued message has been written.
+        """
+        await self._queue.join()
+
+    async def send(self, message: OutboundMessage) -> None:
+        frame = message.encode(self._encoding)
+        if isinstance(frame, bytes):
+            await self._websocket.send_bytes(frame)
+        else:
+            await self._websocket.send_text(frame)
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._writer
+        self.clear()
+        await self._websocket.close()
+
+    async def _write(self, on_failure: Callable[[], Awaitable[None]]) -> None:
+        while True:
+            message = await self._queue.get()
+            try:
+                await self.send(message)
+            except Exception:
+                logger.warning(f"Failed to write to websocket {self._websocket}.")
+                self._failed = True
+                break
+            finally:
+                self._queue.task_done()
+        self.clear()
+        await on_failure()
@@ -0,0 +1,262 @@
+"""
+Minimal Prometheus metrics, served in the text exposition format by `/metrics`.
+
+Metrics are created once at import and the code being measured keeps the labelled child it records to, so recording
+is a lock and an addition. Rates such as messages per second are left to Prometheus, from the `_total` counters.
+"""
+
+import abc
+import bisect
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator
+from typing import final, override
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a fast handler call up to a slow solve or AI decision.
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric[Child](abc.ABC):
+    """
+    A metric family, its children hold the values for each combination of label values.
+    """
+
+    kind: str = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: tuple[str, ...] = labels
+        self._children: dict[tuple[str, ...], Child] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Child:
+        """
+        The child for these label values, created the first time it is asked for. Keep hold of it on hot paths.
+        """
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {values}.")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def clear(self):
+        with self._lock:
+            self._children = {}
+
+    @abc.abstractmethod
+    def _new_child(self) -> Child: ...
+
+    @abc.abstractmethod
+    def _sample_lines(self, values: tuple[str, ...], child: Child) -> Iterator[str]: ...
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, child in list(self._children.items()):
+            yield from self._sample_lines(values, child)
+
+
+@final
+class CounterChild:
+    def __init__(self):
+        self._value: float = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+
+@final
+class Counter(Metric[CounterChild]):
+    kind = "counter"
+
+    @override
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    @override
+    def _sample_lines(self, values: tuple[str, ...], child: CounterChild) -> Iterator[str]:
+        yield f"{self.name}{_format_labels(self.label_names, values)} {_format_number(child.value)}"
+
+
+@final
+class GaugeChild:
+    def __init__(self):
+        self.value: float = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+@final
+class Gauge(Metric[GaugeChild]):
+    kind = "gauge"
+
+    @override
+    def _new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+    @override
+    def _sample_lines(self, values: tuple[str, ...], child: GaugeChild) -> Iterator[str]:
+        yield f"{self.name}{_format_labels(self.label_names, values)} {_format_number(child.value)}"
+
+
+@final
+class HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]):
+        self._buckets: tuple[float, ...] = buckets
+        # Observations per bucket, the last one is for observations above every bucket.
+        self._counts: list[int] = [0] * (len(buckets) + 1)
+        self._sum: float = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self) -> "_Timer":
+        """
+        Observe the seconds spent in a `with` block.
+        """
+        return _Timer(self.observe)
+
+    def snapshot(self) -> tuple[list[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+@final
+class _Timer:
+    __slots__ = ("_observe", "_start")
+
+    def __init__(self, observe: Callable[[float], None]):
+        self._observe: Callable[[float], None] = observe
+        self._start: float = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *_: object) -> None:
+        self._observe(time.perf_counter() - self._start)
+
+
+@final
+class Histogram(Metric[HistogramChild]):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self._buckets: tuple[float, ...] = tuple(sorted(buckets))
+
+    @override
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self._buckets)
+
+    @override
+    def _sample_lines(self, values: tuple[str, ...], child: HistogramChild) -> Iterator[str]:
+        counts, total = child.snapshot()
+        cumulative = 0
+        for bound, count in zip([*self._buckets, math.inf], counts):
+            cumulative += count
+            labels = _format_labels(self.label_names, values, f'le="{_format_number(bound)}"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.label_names, values)
+        yield f"{self.name}_sum{labels} {_format_number(total)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+@final
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register[M: Metric](self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(f"{line}\n" for metric in self._metrics.values() for line in metric.render())
+
+
+REGISTRY = Registry()
+
+# Load, set from the resident games whenever the metrics are read (see `BookManager.update_metrics`).
+ACTIVE_GAMES = REGISTRY.register(Gauge("games_active", "Games resident on this worker.", ("game_type",)))
+CONNECTED_HUMANS = REGISTRY.register(Gauge("games_connected_humans", "Connected human clients.", ("game_type",)))
+CONNECTED_AIS = REGISTRY.register(Gauge("games_connected_ais", "AI players.", ("game_type",)))
+MAILBOX_DEPTH = REGISTRY.register(Gauge("games_mailbox_depth", "Actions waiting in game mailboxes.", ("game_type",)))
+
+# Traffic, recorded by the game manager.
+MESSAGES_IN = REGISTRY.register(Counter("games_messages_in_total", "Messages received from clients."))
+MESSAGES_OUT = REGISTRY.register(Counter("games_messages_out_total", "Frames queued for clients."))
+BROADCAST_SECONDS = REGISTRY.register(
+    Histogram("games_broadcast_seconds", "Time to fan a change out to a game's players or spectators.", ("audience",))
+)
+AI_THINK_SECONDS = REGISTRY.register(
+    Histogram("games_ai_think_seconds", "Time AI players take to decide on a move.", ("game_type",))
+)
+
+# Game logic, recorded by the games.
+FUNCTION_CALL_SECONDS = REGISTRY.register(
+    Histogram("games_function_call_seconds", "Time games take to handle a function call.", ("game_type",))
+)
+GAME_STATE_SECONDS = REGISTRY.register(
+    Histogram("games_game_state_seconds", "Time games take to build a game state response.", ("game_type",))
+)
+QUANTUM_SOLVER_SECONDS = REGISTRY.register(
+    Histogram("games_quantum_solver_seconds", "Time taken to solve the hands of a Quantum game.")
+)
+QUANTUM_MILP_SOLVES = REGISTRY.register(
+    Counter("games_quantum_milp_solves_total", "Integer programs solved for Quantum games.")
+)
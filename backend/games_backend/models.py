@@ -15,6 +15,97 @@ class ResponseType(enum.Enum):
     SESSION_STATE = "session_state"
     AI_PLAYERS = "ai_players"
     MODEL = "model"
+    GAME_STATE_DELTA = "game_state_delta"
+    BUNDLE = "bundle"
+    RESUME = "resume"
+
+
+class ClientFeature(enum.Enum):
+    """
+    Optional protocol features a websocket client can ask for when it connects.
+    """
+
+    # Receive game state deltas instead of full game states where possible.
+    DELTA = "delta"
+    # Receive all the messages caused by a single action as one bundle message.
+    BUNDLE = "bundle"
+    # Keep the client's seat for a while after its connection drops. Frames are numbered, so a client reconnecting with
+    # its resume token is only sent the frames it missed.
+    RESUME = "resume"
+
+
+class FrameEncoding(enum.Enum):
+    """
+    How responses are framed on a websocket, negotiated by each connection when it connects.
+    """
+
+    JSON = "json"
+    BINARY = "binary"
+
+
+class OverflowPolicy(enum.Enum):
+    """
+    What to do when a client falls so far behind that its outbound queue is full.
+    """
+
+    # Drop the queued messages and queue the latest state in their place.
+    KEEP_LATEST = "keep_latest"
+    # Disconnect the client.
+    DISCONNECT = "disconnect"
+
+
+class OutboundQueueSettings(pydantic.BaseModel):
+    """
+    Settings for the queue of messages waiting to be written to each websocket client.
+    """
+
+    # Large enough to always fit a full state update after the queue has been cleared.
+    max_size: int = pydantic.Field(default=64, ge=4)
+    overflow_policy: OverflowPolicy = OverflowPolicy.KEEP_LATEST
+
+
+class EvictionSettings(pydantic.BaseModel):
+    """
+    Limits on the games kept in memory. Games without connected players are saved to the database and evicted once
+    they have been idle for `idle_ttl` seconds, or sooner, least recently active first, while there are more than
+    `max_resident_games` games or the process uses more than `memory_budget_bytes`.
+    """
+
+    idle_ttl: float = pydantic.Field(default=600.0, ge=0)
+    max_resident_games: int | None = pydantic.Field(default=None, ge=1)
+    memory_budget_bytes: int | None = pydantic.Field(default=None, ge=1)
+
+
+class ShardMembership(pydantic.BaseModel):
+    """
+    The URLs of every worker sharing the games, sent to each worker when workers are added or removed.
+    """
+
+    workers: list[str] = pydantic.Field(min_length=1)
+
+
+class MailboxStats(pydantic.BaseModel):
+    """
+    Queue depth metrics for a game's action mailbox.
+    """
+
+    depth: int
+    max_depth: int
+    capacity: int
+    processed: int
+    rejected: int
+
+
+class GameAction(pydantic.BaseModel):
+    """
+    A successful game function call, as kept in a game's action log. `state_version` is the version of the game
+    state the call produced.
+    """
+
+    state_version: int
+    player_position: int
+    function_name: str
+    parameters: dict[str, Any]
 
 
 class ResponseParameters(pydantic.BaseModel):
@@ -54,9 +145,36 @@ class GameStateResponseParameters(ResponseParameters):
 
 class GameStateResponse(Response):
     message_type: ResponseType = pydantic.Field(default=ResponseType.GAME_STATE, init=False)
+    state_version: int = 0
     # Implementations should implement there own parameters.
 
 
+class JsonPatchOperation(pydantic.BaseModel):
+    """
+    A single JSON patch (RFC 6902) operation.
+    """
+
+    op: Literal["add", "remove", "replace"]
+    path: str
+    value: Any = None
+
+
+class GameStateDeltaResponseParameters(ResponseParameters):
+    from_version: int
+    to_version: int
+    patch: list[JsonPatchOperation]
+
+
+class GameStateDeltaResponse(Response):
+    """
+    The changes to the game state parameters between two state versions. Clients should only apply it if they hold
+    `from_version`, otherwise they should request a fresh snapshot with the `get_game_state` game function.
+    """
+
+    message_type: ResponseType = pydantic.Field(default=ResponseType.GAME_STATE_DELTA, init=False)
+    parameters: GameStateDeltaResponseParameters
+
+
 class SessionStateResponseParameters(ResponseParameters):
     player_positions: dict[int, str | None]
     user_position: int | None
@@ -76,6 +194,34 @@ class AIStateResponse(Response):
     parameters: AIStateResponseParameters
 
 
+class BundleResponseParameters(ResponseParameters):
+    messages: list[pydantic.SerializeAsAny[Response]]
+
+
+class BundleResponse(Response):
+    """
+    Several messages sent as a single frame, clients should handle them in order.
+    """
+
+    message_type: ResponseType = pydantic.Field(default=ResponseType.BUNDLE, init=False)
+    parameters: BundleResponseParameters
+
+
+class ResumeResponseParameters(ResponseParameters):
+    token: str
+    resumed: bool
+
+
+class ResumeResponse(Response):
+    """
+    Sent first to clients with the resume feature, unnumbered. Reconnecting with the `token` and the sequence number of
+    the last frame seen resumes the session, `resumed` tells whether the connection picked up an earlier session.
+    """
+
+    message_type: ResponseType = pydantic.Field(default=ResponseType.RESUME, init=False)
+    parameters: ResumeResponseParameters
+
+
 class GameParameters(pydantic.BaseModel):
     """
     Custom game specific information can be provided here.
@@ -115,7 +261,7 @@ class WizardGameParameters(GameParameters):
     can_see_old_rounds: bool = pydantic.Field(default=False, description="Whether the player can see old rounds.")
 
 
-class GameType(enum.Enum):
+class GameType(str, enum.Enum):
     """
     When adding a new game type, try to make it match the path name in the frontend.
     """
@@ -174,6 +320,15 @@ GameMetadataUnion = Annotated[
 ]
 
 
+class GameIndexEntry(pydantic.BaseModel):
+    """
+    What is known about a game without loading it, its metadata and the user friendly names of its AI models.
+    """
+
+    metadata: GameMetadataUnion
+    ai_models: dict[str, str]
+
+
 class ModelResponseParameters(ResponseParameters):
     models: dict[str, str]
 
@@ -188,16 +343,41 @@ class ModelResponse(Response):
 # -------------------------------------
 
 
-class WebSocketRequestType(enum.Enum):
+class WebSocketRequestType(str, enum.Enum):
     SESSION = "session"
     GAME = "game"
     AI = "ai"
 
 
+# Function parameters are either raw, as sent by AIs and kept in the action log, or already validated into the
+# function's parameters model by the request parser.
+FunctionParameters = dict[str, Any] | pydantic.SerializeAsAny[pydantic.BaseModel]
+
+
+class NoParameters(pydantic.BaseModel):
+    """
+    The parameters of functions that take none.
+    """
+
+
+def parse_function_parameters[T: pydantic.BaseModel](model: type[T], parameters: FunctionParameters) -> T:
+    """
+    The parameters as the function's parameters model, only validated if they have not been already. Raises
+    `pydantic.ValidationError` if they are invalid.
+    """
+    if isinstance(parameters, model):
+        return parameters
+    return model.model_validate(parameters)
+
+
+def function_parameters_as_dict(parameters: FunctionParameters) -> dict[str, Any]:
+    return parameters if isinstance(parameters, dict) else parameters.model_dump(mode="json")
+
+
 class WebSocketRequest(pydantic.BaseModel):
     request_type: WebSocketRequestType
     function_name: str
-    parameters: dict[str, Any]
+    parameters: FunctionParameters
 
 
 class TopologicalNewGameRequest(pydantic.BaseModel):
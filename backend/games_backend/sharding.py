@@ -0,0 +1,240 @@
+import asyncio
+import bisect
+import hashlib
+import re
+import secrets
+from collections.abc import Callable, Sequence
+from typing import final
+
+import httpx
+import websockets
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from games_backend.app_logger import logger
+
+DEFAULT_VIRTUAL_NODES = 64
+
+SHARD_TOKEN_HEADER = "x-shard-token"
+# Set on requests one worker proxies to another, so a request is never proxied twice.
+SHARD_HOP_HEADER = "x-shard-hop"
+
+_GAME_PATH = re.compile(r"^/game/([^/]+)/")
+# Headers describing the connection rather than the request, these are not forwarded. Bodies are forwarded decoded,
+# so their encoding and length are dropped as well.
+_HOP_BY_HOP_HEADERS = frozenset(
+    {
+        "connection",
+        "content-encoding",
+        "content-length",
+        "host",
+        "keep-alive",
+        "transfer-encoding",
+        "upgrade",
+        SHARD_HOP_HEADER,
+        SHARD_TOKEN_HEADER,
+    }
+)
+# Close code asking the client to reconnect later, used while a game is moving between workers.
+_TRY_AGAIN_LATER = 1013
+
+
+def _ring_position(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+@final
+class HashRing:
+    """
+    Consistent hash ring mapping game IDs to workers. Each worker is placed at several points on the ring, and a game
+    belongs to the first worker point after the game's own hash, so adding or removing a worker only moves the games
+    between it and its neighbours.
+    """
+
+    def __init__(self, workers: Sequence[str], virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        if not workers:
+            raise ValueError("A hash ring needs at least one worker.")
+        points = sorted(
+            (_ring_position(f"{worker}#{node}"), worker) for worker in workers for node in range(virtual_nodes)
+        )
+        self._positions: list[int] = [position for position, _ in points]
+        self._owners: list[str] = [worker for _, worker in points]
+        self._workers: tuple[str, ...] = tuple(workers)
+
+    @property
+    def workers(self) -> tuple[str, ...]:
+        return self._workers
+
+    def owner(self, game_id: str) -> str:
+        index = bisect.bisect(self._positions, _ring_position(game_id)) % len(self._positions)
+        return self._owners[index]
+
+
+@final
+class Shard:
+    """
+    One worker's view of the cluster: its own URL, the ring deciding which worker owns each game and the token workers
+    use to trust requests from each other.
+    """
+
+    def __init__(self, worker_url: str, workers: Sequence[str], token: str):
+        self._worker_url: str = worker_url
+        self._ring: HashRing = HashRing(workers)
+        self._token: str = token
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def worker_url(self) -> str:
+        return self._worker_url
+
+    @property
+    def workers(self) -> tuple[str, ...]:
+        return self._ring.workers
+
+    def set_workers(self, workers: Sequence[str]):
+        self._ring = HashRing(workers)
+        logger.info(f"Worker {self._worker_url} now shares games with {len(workers)} workers.")
+
+    def owner(self, game_id: str) -> str:
+        return self._ring.owner(game_id)
+
+    def owns(self, game_id: str) -> bool:
+        return self._ring.owner(game_id) == self._worker_url
+
+    def is_trusted(self, token: str | None) -> bool:
+        return token is not None and secrets.compare_digest(token, self._token)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        HTTP client shared by every request to the other workers.
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(headers={SHARD_TOKEN_HEADER: self._token}, timeout=30.0, trust_env=False)
+        return self._client
+
+    async def send_game(self, worker_url: str, game_id: str, snapshot: bytes):
+        """
+        Hand a game over to the worker that now owns it.
+        """
+        response = await self.client.put(f"{worker_url}/internal/game/{game_id}", content=snapshot)
+        response.raise_for_status()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+@final
+class ShardProxyMiddleware:
+    """
+    Routes requests for a game to the worker owning it. Requests for games this worker owns, and everything not about a
+    single game, are served here; the rest are proxied, websockets included, to the owner.
+    """
+
+    def __init__(self, app: ASGIApp, get_shard: Callable[[], Shard | None]):
+        self._app: ASGIApp = app
+        self._get_shard: Callable[[], Shard | None] = get_shard
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        shard = self._get_shard() if scope["type"] in ("http", "websocket") else None
+        match = _GAME_PATH.match(scope["path"]) if shard is not None else None
+        if shard is None or match is None or shard.owns(match.group(1)):
+            await self._app(scope, receive, send)
+            return
+        owner = shard.owner(match.group(1))
+        if any(name.decode("latin-1") == SHARD_HOP_HEADER for name, _ in scope["headers"]):
+            # The workers disagree on the owner while games are being rebalanced, the client should retry.
+            await self._reject(scope, receive, send)
+        elif scope["type"] == "http":
+            await self._proxy_http(shard, owner, scope, receive, send)
+        else:
+            await self._proxy_websocket(owner, scope, receive, send)
+
+    @staticmethod
+    def _target(owner: str, scope: Scope, scheme: str = "http") -> str:
+        url = f"{scheme}{owner.removeprefix('http')}{scope['path']}"
+        if query := scope["query_string"].decode("latin-1"):
+            url = f"{url}?{query}"
+        return url
+
+    @staticmethod
+    def _forwarded_headers(headers: Sequence[tuple[str, str]]) -> dict[str, str]:
+        forwarded = {
+            name: value
+            for name, value in headers
+            if name.lower() not in _HOP_BY_HOP_HEADERS and not name.lower().startswith("sec-websocket-")
+        }
+        forwarded[SHARD_HOP_HEADER] = "1"
+        return forwarded
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            await Response("Game is moving between workers, try again.", status_code=503)(scope, receive, send)
+        else:
+            await WebSocket(scope, receive, send).close(code=_TRY_AGAIN_LATER)
+
+    async def _proxy_http(self, shard: Shard, owner: str, scope: Scope, receive: Receive, send: Send):
+        request = Request(scope, receive)
+        try:
+            upstream = await shard.client.request(
+                request.method,
+                self._target(owner, scope),
+                headers=self._forwarded_headers(request.headers.items()),
+                content=await request.body(),
+            )
+        except httpx.HTTPError as error:
+            logger.error(f"Proxying {scope['path']} to {owner} failed: {error!r}")
+            await Response(status_code=502)(scope, receive, send)
+            return
+        headers = {name: value for name, value in upstream.headers.items() if name.lower() not in _HOP_BY_HOP_HEADERS}
+        await Response(upstream.content, status_code=upstream.status_code, headers=headers)(scope, receive, send)
+
+    async def _proxy_websocket(self, owner: str, scope: Scope, receive: Receive, send: Send):
+        client = WebSocket(scope, receive, send)
+        try:
+            upstream = await websockets.connect(
+                self._target(owner, scope, scheme="ws"),
+                additional_headers=self._forwarded_headers(client.headers.items()),
+                max_size=None,
+                proxy=None,
+            )
+        except (OSError, websockets.WebSocketException) as error:
+            logger.error(f"Proxying websocket {scope['path']} to {owner} failed: {error!r}")
+            await client.close(code=_TRY_AGAIN_LATER)
+            return
+        await client.accept()
+
+        async def client_to_upstream():
+            try:
+                while True:
+                    message = await client.receive()
+                    if message["type"] == "websocket.disconnect":
+                        return
+                    await upstream.send(message["text"] if message.get("text") is not None else message["bytes"])
+            except (WebSocketDisconnect, websockets.ConnectionClosed):
+                return
+
+        async def upstream_to_client():
+            try:
+                async for message in upstream:
+                    if isinstance(message, str):
+                        await client.send_text(message)
+                    else:
+                        await client.send_bytes(message)
+            except websockets.ConnectionClosed:
+                pass
+            # The owner closing the connection, for example when the game moves again, is passed on to the client.
+            await client.close(code=upstream.close_code or 1000)
+
+        pumps = [asyncio.ensure_future(client_to_upstream()), asyncio.ensure_future(upstream_to_client())]
+        try:
+            await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for pump in pumps:
+                pump.cancel()
+            await asyncio.gather(*pumps, return_exceptions=True)
+            await upstream.close()
@@ -0,0 +1,98 @@
+from typing import final
+
+
+class SnapshotError(ValueError):
+    """
+    Raised when a snapshot can not be decoded.
+    """
+
+
+@final
+class SnapshotWriter:
+    """
+    Builds the compact binary form of a game. Every integer is written as an unsigned LEB128 varint, so the small
+    numbers games are made of (positions, move numbers, cards) take a single byte each.
+    """
+
+    def __init__(self) -> None:
+        self._buffer: bytearray = bytearray()
+
+    def write_uint(self, value: int) -> None:
+        if value < 0:
+            raise SnapshotError(f"Can not write negative value {value} as an unsigned integer.")
+        while value >= 0x80:
+            self._buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self._buffer.append(value)
+
+    def write_optional_uint(self, value: int | None) -> None:
+        """
+        Write an unsigned integer that may be missing, None is stored as zero and every value shifted up by one.
+        """
+        self.write_uint(0 if value is None else value + 1)
+
+    def write_bool(self, value: bool) -> None:
+        self._buffer.append(1 if value else 0)
+
+    def write_string(self, value: str) -> None:
+        self.write_bytes(value.encode("utf-8"))
+
+    def write_bytes(self, value: bytes) -> None:
+        self.write_uint(len(value))
+        self._buffer.extend(value)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._buffer)
+
+
+@final
+class SnapshotReader:
+    """
+    Reads back the values written by a `SnapshotWriter`, in the same order.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self._data: memoryview = memoryview(data)
+        self._offset: int = 0
+
+    @property
+    def is_exhausted(self) -> bool:
+        return self._offset >= len(self._data)
+
+    def read_uint(self) -> int:
+        value = 0
+        shift = 0
+        while True:
+            byte = self._next_byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def read_optional_uint(self) -> int | None:
+        value = self.read_uint()
+        return None if value == 0 else value - 1
+
+    def read_bool(self) -> bool:
+        return self._next_byte() != 0
+
+    def read_string(self) -> str:
+        try:
+            return self.read_bytes().decode("utf-8")
+        except UnicodeDecodeError as error:
+            raise SnapshotError(f"Invalid string in snapshot: {error}") from error
+
+    def read_bytes(self) -> bytes:
+        length = self.read_uint()
+        if self._offset + length > len(self._data):
+            raise SnapshotError("Snapshot ended in the middle of a value.")
+        value = bytes(self._data[self._offset : self._offset + length])
+        self._offset += length
+        return value
+
+    def _next_byte(self) -> int:
+        if self._offset >= len(self._data):
+            raise SnapshotError("Snapshot ended in the middle of a value.")
+        byte = self._data[self._offset]
+        self._offset += 1
+        return byte
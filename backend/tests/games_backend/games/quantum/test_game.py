@@ -0,0 +1,75 @@
+import copy
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from games_backend.games.quantum.game import QuantumGame
+from games_backend.games.quantum.logic import QuantumLogic
+from games_backend.models import QuantumHintLevel
+
+
+def new_game() -> QuantumGame:
+    game = QuantumGame(number_of_players=3, max_hint_level=QuantumHintLevel.FULL)
+    for position, suit_name in enumerate(["Ducks", "Squids", "Bears"]):
+        assert game.perform_function_call(position, "set_suit_name", {"suit_name": suit_name}) is None
+    return game
+
+
+@pytest.mark.asyncio
+async def test_expensive_calls_run_off_the_event_loop():
+    game = new_game()
+    version = game.state_version
+    solver_threads: list[int] = []
+    original = QuantumLogic.target_player
+
+    def target_player(logic: QuantumLogic, *args: int):
+        solver_threads.append(threading.get_ident())
+        original(logic, *args)
+        # The call works on a copy, the game is only updated once it has finished.
+        assert logic is not game._logic
+        assert game.state_version == version
+
+    with patch.object(QuantumLogic, "target_player", target_player):
+        response = await game.perform_function_call_async(0, "target_player", {"targeted_player": 1, "suit": 0})
+
+    assert response is None
+    assert solver_threads and threading.get_ident() not in solver_threads
+    assert game.state_version == version + 1
+    expected = new_game()
+    assert expected.perform_function_call(0, "target_player", {"targeted_player": 1, "suit": 0}) is None
+    assert game.get_game_state_response(0) == expected.get_game_state_response(0)
+
+
+@pytest.mark.asyncio
+async def test_expensive_calls_only_replace_the_logic():
+    game = new_game()
+    game_log = game._game_log
+    logic = game._logic
+    copy_threads: list[int] = []
+    deepcopy = copy.deepcopy
+
+    def recording_deepcopy(value, *args):
+        copy_threads.append(threading.get_ident())
+        return deepcopy(value, *args)
+
+    with patch("games_backend.games.quantum.game.copy.deepcopy", recording_deepcopy):
+        response = await game.perform_function_call_async(0, "target_player", {"targeted_player": 1, "suit": 0})
+
+    assert response is None
+    assert copy_threads and threading.get_ident() not in copy_threads
+    assert game._logic is not logic
+    assert game._game_log is game_log
+    assert [entry.function_call for entry in game_log][-1] == "target_player"
+
+
+@pytest.mark.asyncio
+async def test_failed_expensive_calls_are_not_committed():
+    game = new_game()
+    version = game.state_version
+
+    response = await game.perform_function_call_async(1, "target_player", {"targeted_player": 0, "suit": 1})
+
+    assert response is not None
+    assert game.state_version == version
+    assert game.get_game_state_response(0) == new_game().get_game_state_response(0)
@@ -0,0 +1,104 @@
+import warnings
+from collections.abc import Callable
+
+import pytest
+
+from games_backend.game_base import GameBase
+from games_backend.games.quantum.game import QuantumGame
+from games_backend.games.tictactoe import TicTacToeGame
+from games_backend.games.topological_connect_four.game import TopologicalGame
+from games_backend.games.ultimate import UltimateGame
+from games_backend.games.wizard.game import WizardGame
+from games_backend.models import Geometry, GravitySetting, QuantumHintLevel
+
+# The moves made in each game, as (position, function name, parameters).
+Move = tuple[int, str, dict]
+
+
+def scripted(moves: list[Move]) -> Callable[[GameBase], Move]:
+    # Every move moves the state version on by one, so it counts the moves made so far.
+    return lambda game: moves[game.state_version]
+
+
+def next_wizard_move(game: WizardGame) -> Move:
+    player = game.get_game_state_response(None).parameters.current_player
+    state = game.get_game_state_response(player).parameters
+    if not state.valid_bids:
+        return player, "play_card", {"card": state.playable_cards[0]}
+    if state.trump_to_be_set:
+        return player, "make_bid", {"bid": state.valid_bids[0], "set_suit": 2}
+    return player, "make_bid", {"bid": state.valid_bids[0]}
+
+
+GAMES: list[tuple[Callable[[], GameBase], Callable[[GameBase], Move], int]] = [
+    (
+        TicTacToeGame,
+        scripted([(position % 2, "make_move", {"position": move}) for position, move in enumerate([4, 0, 8, 2, 1, 7])]),
+        2,
+    ),
+    (
+        UltimateGame,
+        scripted(
+            [(position % 2, "make_move", {"position": move}) for position, move in enumerate([40, 41, 45, 1, 13, 37])]
+        ),
+        2,
+    ),
+    (
+        lambda: TopologicalGame(max_players=3, gravity=GravitySetting.NONE, geometry=Geometry.KLEIN, board_size=8),
+        scripted(
+            [
+                (position % 3, "make_move", {"row": row, "column": column})
+                for position, (row, column) in enumerate([(0, 0), (7, 1), (3, 5), (3, 6), (1, 0), (6, 2)])
+            ]
+        ),
+        3,
+    ),
+    (lambda: WizardGame(number_of_players=4, can_see_old_rounds=True), next_wizard_move, 4),
+    (
+        lambda: QuantumGame(number_of_players=3, max_hint_level=QuantumHintLevel.FULL),
+        scripted(
+            [
+                *[
+                    (player, "set_suit_name", {"suit_name": name})
+                    for player, name in enumerate(["Hearts", "Spades", "Clubs"])
+                ],
+                (1, "set_hint_level", {"hint_level": QuantumHintLevel.FULL}),
+                (0, "target_player", {"targeted_player": 1, "suit": 0}),
+                (1, "respond_to_target", {"response": False}),
+            ]
+        ),
+        3,
+    ),
+]
+
+
+def play(game: GameBase, next_move: Callable[[GameBase], Move], moves: int) -> None:
+    for _ in range(moves):
+        assert game.perform_function_call(*next_move(game)) is None
+
+
+@pytest.mark.parametrize(("new_game", "next_move", "players"), GAMES)
+def test_game_state_response_matches_validated_response(new_game, next_move, players: int):
+    game = new_game()
+    play(game, next_move, 3)
+
+    for position in [None, *range(players)]:
+        response = game.get_game_state_response(position)
+        with warnings.catch_warnings():
+            # Pydantic warns when serialising values that do not match their field's type.
+            warnings.simplefilter("error")
+            dumped = response.model_dump(mode="json")
+        assert type(response).model_validate(response.model_dump()) == response
+        assert type(response).model_validate(dumped).model_dump(mode="json") == dumped
+
+
+@pytest.mark.parametrize(("new_game", "next_move", "players"), GAMES)
+def test_game_state_response_is_not_changed_by_later_moves(new_game, next_move, players: int):
+    game = new_game()
+    play(game, next_move, 3)
+    responses = [game.get_game_state_response(position) for position in [None, *range(players)]]
+    dumped = [response.model_dump(mode="json") for response in responses]
+
+    play(game, next_move, 3)
+
+    assert [response.model_dump(mode="json") for response in responses] == dumped
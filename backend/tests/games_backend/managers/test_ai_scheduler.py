@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import pytest
+
+from games_backend.manager.ai_scheduler import AIScheduler
+
+
+async def run_jobs(scheduler: AIScheduler, jobs: list[tuple[str, str, bool]]) -> list[str]:
+    """
+    Submit every job while the only worker is busy, then return the order the jobs ran in.
+    """
+    order: list[str] = []
+    release = threading.Event()
+    done = asyncio.Event()
+
+    def on_done(name: str):
+        order.append(name)
+        if len(order) == len(jobs):
+            done.set()
+
+    scheduler.submit("blocker", release.wait, lambda _: None)
+    for game_id, name, human_facing in jobs:
+        scheduler.submit(game_id, lambda name=name: name, on_done, human_facing=human_facing)
+    release.set()
+    await asyncio.wait_for(done.wait(), timeout=5)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_shared_fairly_between_games():
+    scheduler = AIScheduler(max_workers=1)
+    order = await run_jobs(
+        scheduler,
+        [("busy", "busy-1", False), ("busy", "busy-2", False), ("busy", "busy-3", False), ("quiet", "quiet-1", False)],
+    )
+    assert order == ["busy-1", "quiet-1", "busy-2", "busy-3"]
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_games_with_humans_go_first():
+    scheduler = AIScheduler(max_workers=1)
+    order = await run_jobs(
+        scheduler, [("bots", "bots-1", False), ("bots", "bots-2", False), ("people", "people-1", True)]
+    )
+    assert order == ["people-1", "bots-1", "bots-2"]
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_queues_are_capped_to_one_running_job():
+    scheduler = AIScheduler(max_workers=4)
+    running = 0
+    most_running = 0
+    lock = threading.Lock()
+    done = asyncio.Event()
+    finished: list[int] = []
+
+    def think():
+        nonlocal running, most_running
+        with lock:
+            running += 1
+            most_running = max(most_running, running)
+        threading.Event().wait(0.01)
+        with lock:
+            running -= 1
+
+    def on_done(_: None):
+        finished.append(1)
+        if len(finished) == 5:
+            done.set()
+
+    for _ in range(5):
+        scheduler.submit("game", think, on_done)
+    await asyncio.wait_for(done.wait(), timeout=5)
+
+    assert most_running == 1
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_a_future_done_once_the_job_finishes():
+    scheduler = AIScheduler(max_workers=4)
+    release = threading.Event()
+
+    def fail():
+        raise RuntimeError("Bad move.")
+
+    thinking = scheduler.submit("ai", lambda: release.wait(5), lambda _: None)
+    failing = scheduler.submit("other", fail, lambda _: None)
+    await asyncio.wait_for(failing, timeout=5)
+    assert not thinking.done()
+
+    release.set()
+    await asyncio.wait_for(thinking, timeout=5)
+    scheduler.shutdown()
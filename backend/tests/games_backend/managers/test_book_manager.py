@@ -1,9 +1,19 @@
-from unittest.mock import AsyncMock, MagicMock
+import asyncio
+import heapq
+import time
+from pathlib import Path
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from games_backend import metrics, models
+from games_backend.games.tictactoe import TicTacToeGame
+from games_backend.games.wizard.game import WizardGame
 from games_backend.manager.book_manager import BookManager
-from games_backend.manager.db_manager import InMemoryDBManager
+from games_backend.manager.db_manager import InMemoryDBManager, SQLiteDBManager
+from games_backend.manager.game_manager import GameManager
+from games_backend.sharding import Shard
 
 
 @pytest.fixture
@@ -16,6 +26,7 @@ def book_manager():
 def mock_game_manager() -> MagicMock:
     game_manager = MagicMock()
     game_manager.close_game = AsyncMock()
+    game_manager.last_activity = 0.0
     return game_manager
 
 
@@ -55,3 +66,298 @@ async def test_get_all_game_ids(book_manager: BookManager, mock_game_manager: Ma
     for game_id in ids:
         book_manager.add_game(game_id, mock_game_manager)
     assert await book_manager.get_all_game_ids() == ids
+
+
+def play(game_manager: GameManager, position: int, function_name: str, parameters: dict[str, Any]):
+    """
+    Make a move the way the game manager's mailbox consumer does, telling the action recorder about it.
+    """
+    game = game_manager.get_game()
+    assert game.perform_function_call(position, function_name, parameters) is None
+    assert game_manager._action_recorder is not None
+    game_manager._action_recorder(
+        models.GameAction(
+            state_version=game.state_version,
+            player_position=position,
+            function_name=function_name,
+            parameters=parameters,
+        )
+    )
+
+
+def play_wizard(game_manager: GameManager, actions: int):
+    game = game_manager.get_game()
+    for _ in range(actions):
+        player = game.get_game_state_response(None).parameters.current_player
+        state = game.get_game_state_response(player).parameters
+        if state.valid_bids:
+            parameters: dict[str, Any] = {"bid": state.valid_bids[0]}
+            if state.trump_to_be_set:
+                parameters["set_suit"] = 1
+            play(game_manager, player, "make_bid", parameters)
+        else:
+            play(game_manager, player, "play_card", {"card": state.playable_cards[0]})
+
+
+@pytest.mark.asyncio
+async def test_actions_are_logged_between_snapshots():
+    db = InMemoryDBManager()
+    book_manager = BookManager(db_manager=db, snapshot_interval=3)
+    game_manager = GameManager.from_game_and_id("ABCDE", TicTacToeGame())
+    book_manager.add_game("ABCDE", game_manager)
+
+    with (
+        patch.object(db, "save_game", wraps=db.save_game) as save_game,
+        patch.object(db, "append_action", wraps=db.append_action) as append_action,
+    ):
+        for position, move in enumerate([4, 0, 8, 2, 1, 7]):
+            play(game_manager, position % 2, "make_move", {"position": move})
+            await book_manager.flush()
+
+    # The first action stores the snapshot the log builds on, then every third version is a snapshot.
+    assert save_game.await_count == 3
+    assert [call.args[1].state_version for call in append_action.await_args_list] == [2, 4, 5]
+    assert [action.state_version for action in await db.get_actions("ABCDE", after_version=0)] == []
+
+
+@pytest.mark.asyncio
+async def test_moves_between_writes_are_coalesced():
+    db = InMemoryDBManager()
+    book_manager = BookManager(db_manager=db, write_behind_delay=0.01)
+    game_managers = {game_id: GameManager.from_game_and_id(game_id, TicTacToeGame()) for game_id in ["ABCDE", "FGHIJ"]}
+    for game_id, game_manager in game_managers.items():
+        book_manager.add_game(game_id, game_manager)
+        play(game_manager, 0, "make_move", {"position": 4})
+    await book_manager.flush()
+
+    with (
+        patch.object(db, "save_games", wraps=db.save_games) as save_games,
+        patch.object(db, "append_actions", wraps=db.append_actions) as append_actions,
+    ):
+        for position, move in enumerate([0, 8, 2]):
+            for game_manager in game_managers.values():
+                play(game_manager, (position + 1) % 2, "make_move", {"position": move})
+        await asyncio.sleep(0.05)
+
+    # One batch for both games, however many moves they had.
+    append_actions.assert_awaited_once()
+    assert {game_id: len(actions) for game_id, actions in append_actions.await_args.args[0].items()} == {
+        "ABCDE": 3,
+        "FGHIJ": 3,
+    }
+    assert save_games.await_args_list[0].args[0] == {}
+
+
+@pytest.mark.asyncio
+async def test_eviction_only_writes_unsaved_changes():
+    db = InMemoryDBManager()
+    book_manager = BookManager(db_manager=db, eviction=models.EvictionSettings(idle_ttl=0))
+    managers = add_games_active_at(book_manager, {"SAVED": 10, "NEW": 10})
+    play(managers["SAVED"], 0, "make_move", {"position": 4})
+    await book_manager.flush()
+
+    with patch.object(db, "save_games", wraps=db.save_games) as save_games:
+        await book_manager.audit_games()
+
+    assert set(save_games.await_args.args[0]) == {"NEW"}
+    assert await db.get_all_game_ids() == {"SAVED", "NEW"}
+
+
+@pytest.mark.asyncio
+async def test_games_are_restored_from_snapshot_and_log(tmp_path: Path):
+    path = str(tmp_path / "games.db")
+    db = SQLiteDBManager(path)
+    book_manager = BookManager(db_manager=db)
+    game_manager = GameManager.from_game_and_id("ABCDE", TicTacToeGame())
+    book_manager.add_game("ABCDE", game_manager)
+    for position, move in enumerate([4, 0, 8, 2]):
+        play(game_manager, position % 2, "make_move", {"position": move})
+        await book_manager.flush()
+    # Stop without a graceful close, only what was written as the moves happened survives.
+    await db.close()
+
+    db = SQLiteDBManager(path)
+    assert [action.state_version for action in await db.get_actions("ABCDE", after_version=1)] == [2, 3, 4]
+    restored = await BookManager(db_manager=db).get_game("ABCDE")
+    await db.close()
+
+    assert restored.get_game().state_version == 4
+    assert restored.get_game().get_game_state_response(None) == game_manager.get_game().get_game_state_response(None)
+
+
+@pytest.mark.asyncio
+async def test_random_deals_are_snapshotted_not_replayed(tmp_path: Path):
+    path = str(tmp_path / "games.db")
+    db = SQLiteDBManager(path)
+    book_manager = BookManager(db_manager=db)
+    game_manager = GameManager.from_game_and_id("ABCDE", WizardGame(number_of_players=3))
+    book_manager.add_game("ABCDE", game_manager)
+    # Bidding in round one plays the round out and deals round two, then bid and play into round two.
+    for _ in range(6):
+        play_wizard(game_manager, 1)
+        await book_manager.flush()
+    await db.close()
+
+    db = SQLiteDBManager(path)
+    restored = (await BookManager(db_manager=db).get_game("ABCDE")).get_game()
+    await db.close()
+
+    game = game_manager.get_game()
+    assert restored.state_version == game.state_version
+    for position in [None, 0, 1, 2]:
+        assert restored.get_game_state_response(position) == game.get_game_state_response(position)
+
+
+def add_games_active_at(book_manager: BookManager, ages: dict[str, float]) -> dict[str, GameManager]:
+    now = time.monotonic()
+    managers: dict[str, GameManager] = {}
+    for game_id, age in ages.items():
+        managers[game_id] = GameManager.from_game_and_id(game_id, TicTacToeGame())
+        managers[game_id]._last_activity = now - age
+        book_manager.add_game(game_id, managers[game_id])
+    return managers
+
+
+@pytest.mark.asyncio
+async def test_audit_evicts_games_idle_past_the_ttl():
+    db = InMemoryDBManager()
+    book_manager = BookManager(db_manager=db, eviction=models.EvictionSettings(idle_ttl=300))
+    managers = add_games_active_at(book_manager, {"OLD": 1000, "OLDER": 2000, "PLAYED": 3000, "FRESH": 10})
+    await managers["PLAYED"]._connect_ai(MagicMock())
+
+    with patch.object(heapq, "heappop", wraps=heapq.heappop) as heappop:
+        await book_manager.audit_games()
+
+    # Only the idle entries are looked at, the fresh game is never touched.
+    assert heappop.call_count == 3
+    assert set(book_manager._game_cache) == {"PLAYED", "FRESH"}
+    assert await db.get_all_game_ids() == {"OLD", "OLDER"}
+    assert managers["OLD"].is_closed
+    assert await book_manager.get_all_game_ids() == {"OLD", "OLDER", "PLAYED", "FRESH"}
+
+
+@pytest.mark.asyncio
+async def test_games_over_the_resident_limit_are_evicted_least_recently_active_first():
+    book_manager = BookManager(db_manager=InMemoryDBManager(), eviction=models.EvictionSettings(max_resident_games=2))
+    managers = add_games_active_at(book_manager, {"A": 40, "B": 10, "C": 30, "D": 20})
+    # A game that has been active since it was indexed is pushed back rather than evicted.
+    managers["A"]._last_activity = time.monotonic()
+
+    assert book_manager._eviction_task is not None
+    await book_manager._eviction_task
+
+    assert set(book_manager._game_cache) == {"A", "B"}
+    reloaded = await book_manager.get_game("C")
+    assert reloaded is not managers["C"]
+    assert reloaded.get_game().to_snapshot() == managers["C"].get_game().to_snapshot()
+
+
+def sharded_book_managers(workers: list[str]) -> dict[str, BookManager]:
+    """
+    A book manager per worker, handing games straight to each other rather than over HTTP.
+    """
+    book_managers = {
+        worker: BookManager(db_manager=InMemoryDBManager(), shard=Shard(worker, workers, "token")) for worker in workers
+    }
+
+    async def send_game(worker: str, game_id: str, snapshot: bytes):
+        await book_managers[worker].receive_game(game_id, snapshot)
+
+    for book_manager in book_managers.values():
+        assert book_manager._shard is not None
+        book_manager._shard.send_game = send_game  # type: ignore[method-assign]
+    return book_managers
+
+
+@pytest.mark.asyncio
+async def test_rebalance_hands_games_to_their_new_owner():
+    book_managers = sharded_book_managers(["http://a", "http://b"])
+    first = book_managers["http://a"]
+    game_ids = [await first.get_free_game_id() for _ in range(20)]
+    for game_id in game_ids:
+        first.add_game(game_id, GameManager.from_game_and_id(game_id, TicTacToeGame()))
+    play(await first.get_game(game_ids[0]), 0, "make_move", {"position": 4})
+    # Evicted games are handed over too, as the in memory database is not shared with the other workers.
+    first._eviction = models.EvictionSettings(max_resident_games=10)
+    await first.audit_games()
+
+    moved = await first.rebalance(["http://b"])
+
+    assert sorted(moved) == sorted(game_ids)
+    assert await first.get_all_game_ids() == set()
+    second = book_managers["http://b"]
+    assert await second.get_all_game_ids() == set(game_ids)
+    assert (await second.get_game(game_ids[0])).get_game().state_version == 1
+
+
+@pytest.mark.asyncio
+async def test_receive_game_keeps_a_newer_copy():
+    book_manager = sharded_book_managers(["http://a"])["http://a"]
+    game = TicTacToeGame()
+    snapshot = game.to_snapshot()
+    book_manager.add_game("ABCDE", GameManager.from_game_and_id("ABCDE", game))
+    play(await book_manager.get_game("ABCDE"), 0, "make_move", {"position": 4})
+
+    await book_manager.receive_game("ABCDE", snapshot)
+
+    assert (await book_manager.get_game("ABCDE")).get_game().state_version == 1
+
+
+@pytest.mark.asyncio
+async def test_received_game_id_is_not_handed_out_again(book_manager: BookManager):
+    await book_manager.receive_game("ABCDE", TicTacToeGame().to_snapshot())
+
+    with patch.object(book_manager._id_allocator, "next_candidate", side_effect=["ABCDE", "FGHIJ"]):
+        assert await book_manager.get_free_game_id() == "FGHIJ"
+
+
+@pytest.mark.asyncio
+async def test_graceful_close_saves_everything_within_one_deadline():
+    db = InMemoryDBManager()
+    book_manager = BookManager(db_manager=db)
+    managers = add_games_active_at(book_manager, {f"GAME{index}": 0 for index in range(600)})
+
+    async def hang():
+        await asyncio.sleep(60)
+
+    for manager in list(managers.values())[:3]:
+        manager.close_game = hang  # type: ignore[method-assign]
+
+    started = time.monotonic()
+    await book_manager.graceful_close(timeout=0.5)
+
+    # Every game is closed at the same time, so games that hang only cost the one deadline.
+    assert time.monotonic() - started < 2
+    assert await db.get_all_game_ids() == set(managers)
+    assert all(manager.is_closed for manager in list(managers.values())[3:])
+    assert book_manager.is_closed
+
+
+@pytest.mark.asyncio
+async def test_metadata_of_evicted_games_is_read_from_the_index():
+    db = InMemoryDBManager()
+    book_manager = BookManager(db_manager=db, eviction=models.EvictionSettings(idle_ttl=0))
+    game = WizardGame(number_of_players=5, can_see_old_rounds=True)
+    book_manager.add_game("ABCDE", GameManager.from_game_and_id("ABCDE", game))
+    await book_manager.audit_games()
+
+    with patch.object(db, "get_game", wraps=db.get_game) as get_game:
+        metadata = await book_manager.get_game_metadata("ABCDE")
+        ai_models = await book_manager.get_game_models("ABCDE")
+
+    assert metadata == game.get_metadata()
+    assert ai_models == game.get_game_ai_named()
+    get_game.assert_not_awaited()
+    assert "ABCDE" not in book_manager._game_cache
+
+
+def test_update_metrics_counts_resident_games_per_type(book_manager: BookManager):
+    book_manager.add_game("game1", GameManager.from_game_and_id("game1", TicTacToeGame()))
+    book_manager.add_game("game2", GameManager.from_game_and_id("game2", TicTacToeGame()))
+
+    book_manager.update_metrics()
+
+    assert metrics.ACTIVE_GAMES.labels("tictactoe").value == 2
+    assert metrics.ACTIVE_GAMES.labels("wizard").value == 0
+    assert metrics.CONNECTED_HUMANS.labels("tictactoe").value == 0
+    assert metrics.MAILBOX_DEPTH.labels("tictactoe").value == 0
@@ -0,0 +1,312 @@
+import asyncio
+import sqlite3
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any, Self
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+
+from games_backend.game_base import GameBase
+from games_backend.games.quantum.game import QuantumGame
+from games_backend.games.tictactoe import TicTacToeGame
+from games_backend.games.topological_connect_four.game import TopologicalGame
+from games_backend.games.ultimate import UltimateGame
+from games_backend.games.wizard.game import WizardGame
+from games_backend.manager.book_manager import BookManager
+from games_backend.manager.db_manager import RedisDBManager, SQLiteDBManager, deserialise_game, serialise_game
+from games_backend.manager.game_manager import GameManager
+from games_backend.models import GameAction, Geometry, GravitySetting, QuantumHintLevel
+
+
+class InProcessRedis:
+    """
+    Stand-in for the subset of the async redis client the Redis DB manager uses, counting round trips.
+    """
+
+    def __init__(self):
+        self.values: dict[str, bytes] = {}
+        self.sets: dict[str, set[bytes]] = {}
+        self.sorted_sets: dict[str, dict[bytes, float]] = {}
+        self.hashes: dict[str, dict[str, bytes]] = {}
+        self.round_trips = 0
+        self.closed = False
+
+    def pipeline(self, transaction: bool = True) -> "InProcessPipeline":
+        return InProcessPipeline(self)
+
+    async def get(self, key: str) -> bytes | None:
+        self.round_trips += 1
+        return self.values.get(key)
+
+    async def hget(self, key: str, field: str) -> bytes | None:
+        self.round_trips += 1
+        return self.hashes.get(key, {}).get(field)
+
+    async def smembers(self, key: str) -> set[bytes]:
+        self.round_trips += 1
+        return set(self.sets.get(key, set()))
+
+    async def sadd(self, key: str, *members: str) -> int:
+        self.round_trips += 1
+        stored = self.sets.setdefault(key, set())
+        added = {member.encode() for member in members} - stored
+        stored.update(added)
+        return len(added)
+
+    async def zadd(self, key: str, mapping: dict[str, float]):
+        self.round_trips += 1
+        self.sorted_sets.setdefault(key, {}).update((member.encode(), score) for member, score in mapping.items())
+
+    async def zrangebyscore(self, key: str, min: str, max: str) -> list[bytes]:
+        self.round_trips += 1
+        assert min.startswith("(") and max == "+inf"
+        members = self.sorted_sets.get(key, {})
+        return sorted((member for member, score in members.items() if score > int(min[1:])), key=members.__getitem__)
+
+    async def aclose(self):
+        self.closed = True
+
+
+class InProcessPipeline:
+    def __init__(self, redis: InProcessRedis):
+        self._redis = redis
+        self._commands: list[tuple[str, tuple[Any, ...]]] = []
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *_: Any):
+        self._commands = []
+
+    def set(self, key: str, value: bytes, nx: bool = False) -> Self:
+        self._commands.append(("set_nx" if nx else "set", (key, value)))
+        return self
+
+    def sismember(self, key: str, member: str) -> Self:
+        self._commands.append(("sismember", (key, member)))
+        return self
+
+    def delete(self, *keys: str) -> Self:
+        for key in keys:
+            self._commands.append(("delete", (key,)))
+        return self
+
+    def zadd(self, key: str, mapping: dict[str, float]) -> Self:
+        self._commands.append(("zadd", (key, mapping)))
+        return self
+
+    def zremrangebyscore(self, key: str, min: str, max: int) -> Self:
+        self._commands.append(("zremrangebyscore", (key, max)))
+        return self
+
+    def hset(self, key: str, mapping: dict[str, bytes]) -> Self:
+        self._commands.append(("hset", (key, mapping)))
+        return self
+
+    def hdel(self, key: str, *fields: str) -> Self:
+        self._commands.append(("hdel", (key, *fields)))
+        return self
+
+    def sadd(self, key: str, *members: str) -> Self:
+        self._commands.append(("sadd", (key, *members)))
+        return self
+
+    def srem(self, key: str, *members: str) -> Self:
+        self._commands.append(("srem", (key, *members)))
+        return self
+
+    async def execute(self) -> list[Any]:
+        self._redis.round_trips += 1
+        results: list[Any] = []
+        for command, (key, *args) in self._commands:
+            match command:
+                case "set":
+                    self._redis.values[key] = args[0]
+                case "set_nx":
+                    results.append(key not in self._redis.values or None)
+                    self._redis.values.setdefault(key, args[0])
+                case "sismember":
+                    results.append(args[0].encode() in self._redis.sets.get(key, set()))
+                case "delete":
+                    self._redis.values.pop(key, None)
+                    self._redis.sorted_sets.pop(key, None)
+                case "zadd":
+                    self._redis.sorted_sets.setdefault(key, {}).update(
+                        (member.encode(), score) for member, score in args[0].items()
+                    )
+                case "zremrangebyscore":
+                    members = self._redis.sorted_sets.get(key, {})
+                    for member in [member for member, score in members.items() if score <= args[0]]:
+                        del members[member]
+                case "hset":
+                    self._redis.hashes.setdefault(key, {}).update(args[0])
+                case "hdel":
+                    for field in args:
+                        self._redis.hashes.get(key, {}).pop(field, None)
+                case "sadd":
+                    self._redis.sets.setdefault(key, set()).update(member.encode() for member in args)
+                case "srem":
+                    self._redis.sets.get(key, set()).difference_update(member.encode() for member in args)
+        self._commands = []
+        return results
+
+
+def all_games() -> list[GameBase]:
+    return [
+        TicTacToeGame(),
+        UltimateGame(),
+        TopologicalGame(max_players=2, gravity=GravitySetting.NONE, geometry=Geometry.TORUS, board_size=6),
+        WizardGame(number_of_players=4, can_see_old_rounds=False),
+        QuantumGame(number_of_players=3, max_hint_level=QuantumHintLevel.FULL),
+    ]
+
+
+@pytest.mark.parametrize("game", all_games(), ids=lambda game: type(game).__name__)
+def test_serialised_games_roundtrip(game: GameBase):
+    restored = deserialise_game(serialise_game(game))
+    assert type(restored) is type(game)
+    assert restored.get_game_state_response(0) == game.get_game_state_response(0)
+
+
+@pytest.mark.asyncio
+async def test_redis_db_manager_saves_and_loads_games():
+    redis = InProcessRedis()
+    db = RedisDBManager(redis)  # type: ignore[arg-type]
+    game = TicTacToeGame()
+    game.perform_function_call(0, "make_move", {"position": 4})
+
+    await db.save_game("ABCDE", game)
+
+    assert await db.get_all_game_ids() == {"ABCDE"}
+    loaded = await db.get_game("ABCDE")
+    assert loaded.get_game_state_response(None) == game.get_game_state_response(None)
+    assert await db.get_index_entry("ABCDE") == game.get_index_entry()
+    await db.delete_game("ABCDE")
+    assert await db.get_all_game_ids() == set()
+    with pytest.raises(KeyError, match="ABCDE"):
+        await db.get_game("ABCDE")
+    with pytest.raises(KeyError, match="ABCDE"):
+        await db.get_index_entry("ABCDE")
+
+
+@pytest.mark.asyncio
+async def test_redis_db_manager_logs_actions_until_the_next_snapshot():
+    redis = InProcessRedis()
+    db = RedisDBManager(redis)  # type: ignore[arg-type]
+    for version in range(1, 5):
+        action = GameAction(state_version=version, player_position=0, function_name="make_move", parameters={})
+        await db.append_action("ABCDE", action)
+    assert [action.state_version for action in await db.get_actions("ABCDE", after_version=1)] == [2, 3, 4]
+
+    game = TicTacToeGame()
+    for position, move in enumerate([4, 0, 8]):
+        game.perform_function_call(position % 2, "make_move", {"position": move})
+    await db.save_game("ABCDE", game)
+
+    assert [action.state_version for action in await db.get_actions("ABCDE", after_version=0)] == [4]
+    await db.delete_game("ABCDE")
+    assert redis.sorted_sets == {}
+
+
+@pytest.mark.asyncio
+async def test_redis_db_manager_reserves_each_game_id_once():
+    db = RedisDBManager(InProcessRedis())  # type: ignore[arg-type]
+    await db.save_game("SAVED", TicTacToeGame())
+
+    assert await asyncio.gather(*(db.reserve_game_id("ABCDE") for _ in range(3))) == [True, False, False]
+    assert not await db.reserve_game_id("SAVED")
+    await db.delete_game("ABCDE")
+    assert await db.reserve_game_id("ABCDE")
+
+
+@pytest.mark.asyncio
+async def test_redis_db_manager_only_lists_saved_games():
+    db = RedisDBManager(InProcessRedis())  # type: ignore[arg-type]
+    await db.save_game("SAVED", TicTacToeGame())
+
+    assert await db.reserve_game_id("ABCDE")
+
+    assert await db.get_all_game_ids() == {"SAVED"}
+
+
+@pytest.mark.asyncio
+async def test_book_manager_saves_games_in_one_round_trip():
+    redis = InProcessRedis()
+    book_manager = BookManager(db_manager=RedisDBManager(redis))  # type: ignore[arg-type]
+    games = {f"GAME{index}": game for index, game in enumerate(all_games())}
+    for game_id, game in games.items():
+        book_manager.add_game(game_id, GameManager.from_game_and_id(game_id, game))
+
+    await book_manager.graceful_close()
+
+    assert redis.round_trips == 1
+    assert redis.closed
+    assert await RedisDBManager(redis).get_all_game_ids() == set(games)  # type: ignore[arg-type]
+
+
+@pytest_asyncio.fixture
+async def sqlite_db(tmp_path: Path) -> AsyncIterator[SQLiteDBManager]:
+    db = SQLiteDBManager(str(tmp_path / "games.db"))
+    yield db
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_db_manager_saves_and_loads_games(sqlite_db: SQLiteDBManager):
+    game = TicTacToeGame()
+    game.perform_function_call(0, "make_move", {"position": 4})
+
+    await sqlite_db.save_game("ABCDE", game)
+
+    assert await sqlite_db.get_all_game_ids() == {"ABCDE"}
+    loaded = await sqlite_db.get_game("ABCDE")
+    assert loaded.get_game_state_response(None) == game.get_game_state_response(None)
+    assert await sqlite_db.get_index_entry("ABCDE") == game.get_index_entry()
+    await sqlite_db.delete_game("ABCDE")
+    assert await sqlite_db.get_all_game_ids() == set()
+    with pytest.raises(KeyError, match="ABCDE"):
+        await sqlite_db.get_game("ABCDE")
+    with pytest.raises(KeyError, match="ABCDE"):
+        await sqlite_db.get_index_entry("ABCDE")
+
+
+@pytest.mark.asyncio
+async def test_sqlite_db_manager_groups_concurrent_saves(sqlite_db: SQLiteDBManager):
+    games = {f"GAME{index}": game for index, game in enumerate(all_games())}
+
+    with patch.object(sqlite_db, "_write", wraps=sqlite_db._write) as write:
+        await asyncio.gather(*(sqlite_db.save_game(game_id, game) for game_id, game in games.items()))
+
+    assert write.call_count == 1
+    assert await sqlite_db.get_all_game_ids() == set(games)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_db_manager_reserves_each_game_id_once(sqlite_db: SQLiteDBManager):
+    await sqlite_db.save_game("SAVED", TicTacToeGame())
+
+    assert await asyncio.gather(*(sqlite_db.reserve_game_id("ABCDE") for _ in range(3))) == [True, False, False]
+    assert not await sqlite_db.reserve_game_id("SAVED")
+    await sqlite_db.delete_game("ABCDE")
+    assert await sqlite_db.reserve_game_id("ABCDE")
+
+
+@pytest.mark.asyncio
+async def test_sqlite_db_manager_survives_restarts(tmp_path: Path):
+    path = str(tmp_path / "games.db")
+    db = SQLiteDBManager(path)
+    await db.save_game("ABCDE", TicTacToeGame())
+    await db.close()
+
+    db = SQLiteDBManager(path)
+    assert await db.get_all_game_ids() == {"ABCDE"}
+    assert isinstance(await db.get_game("ABCDE"), TicTacToeGame)
+    await db.close()
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    plan = connection.execute("EXPLAIN QUERY PLAN SELECT game_id FROM games").fetchall()
+    assert "COVERING INDEX" in plan[0][-1]
+    connection.close()
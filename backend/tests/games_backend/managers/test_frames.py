@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from games_backend import models
+from games_backend.manager.frames import (
+    FLAG_COMPRESSED,
+    RESPONSE_TYPE_CODES,
+    OutboundMessage,
+    decode_binary_frame,
+    encode_binary_frame,
+)
+
+
+def test_every_response_type_has_a_code():
+    assert set(RESPONSE_TYPE_CODES) == set(models.ResponseType)
+    assert len(set(RESPONSE_TYPE_CODES.values())) == len(RESPONSE_TYPE_CODES)
+
+
+@pytest.mark.parametrize("message_length", [10, 10_000])
+def test_binary_frame_roundtrip(message_length: int):
+    message = models.SimpleResponse(parameters=models.SimpleResponseParameters(message="a" * message_length))
+    frame = encode_binary_frame(message)
+    assert bool(frame[2] & FLAG_COMPRESSED) == (message_length > 1000)
+    assert decode_binary_frame(frame) == (
+        models.ResponseType.SIMPLE,
+        {"parameters": {"message": "a" * message_length}},
+    )
+
+
+def test_binary_frame_is_smaller_than_json():
+    message = models.SessionStateResponse(
+        parameters=models.SessionStateResponseParameters(
+            player_positions={i: f"Player {i}" for i in range(8)}, user_position=1
+        )
+    )
+    assert len(encode_binary_frame(message)) < len(message.model_dump_json())
+
+
+def test_outbound_message_encodes_once():
+    message = OutboundMessage(models.ErrorResponse(parameters=models.ErrorResponseParameters(error_message="oops")))
+    encoded = message.encode(models.FrameEncoding.JSON)
+    assert json.loads(encoded) == {"message_type": "error", "parameters": {"error_message": "oops"}}
+    assert message.encode(models.FrameEncoding.JSON) is encoded
+    assert message.encode(models.FrameEncoding.BINARY) is message.encode(models.FrameEncoding.BINARY)
+
+
+def test_sequenced_message_adds_its_number_to_the_shared_encoding():
+    message = OutboundMessage(models.SimpleResponse(parameters=models.SimpleResponseParameters(message="hi")))
+    sequenced = OutboundMessage.sequenced(message, 7)
+
+    assert json.loads(sequenced.encode(models.FrameEncoding.JSON)) == {
+        "sequence": 7,
+        "message_type": "simple",
+        "parameters": {"message": "hi"},
+    }
+    assert decode_binary_frame(sequenced.encode(models.FrameEncoding.BINARY)) == (  # type: ignore[arg-type]
+        models.ResponseType.SIMPLE,
+        {"parameters": {"message": "hi"}, "sequence": 7},
+    )
@@ -0,0 +1,648 @@
+import asyncio
+import json
+import threading
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import pytest_asyncio
+from fastapi import WebSocket
+
+from games_backend.game_base import GameBase
+from games_backend.games.quantum.game import QuantumGame
+from games_backend.games.tictactoe import TicTacToeGame, TicTacToeRandomAI
+from games_backend.json_patch import apply_json_patch
+from games_backend.manager.ai_manager import AIManager
+from games_backend.manager.ai_scheduler import AIScheduler
+from games_backend.manager.frames import OutboundMessage, decode_binary_frame
+from games_backend.manager.game_manager import Channel, GameManager
+from games_backend.manager.session_manager import SessionManager
+from games_backend.manager.transport import WebSocketTransport
+from games_backend.models import (
+    ClientFeature,
+    FrameEncoding,
+    GameAction,
+    JsonPatchOperation,
+    OutboundQueueSettings,
+    OverflowPolicy,
+    QuantumHintLevel,
+    ResponseType,
+    WebSocketRequest,
+    WebSocketRequestType,
+)
+
+
+def mock_websocket() -> MagicMock:
+    websocket = MagicMock(spec=WebSocket)
+    websocket.accept = AsyncMock()
+    websocket.send_text = AsyncMock()
+    websocket.send_bytes = AsyncMock()
+    websocket.close = AsyncMock()
+    return websocket
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def stop_writers():
+    yield
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+
+
+async def flush(manager: GameManager):
+    await manager._spectators_idle.wait()
+    await flush_transports(manager)
+
+
+async def flush_transports(manager: GameManager):
+    for client in list(manager._id_to_player.values()):
+        if isinstance(client, WebSocketTransport):
+            await client.drain()
+
+
+def make_manager(game: GameBase, **kwargs: Any) -> GameManager:
+    manager = GameManager("ABCDE", game, SessionManager(game.get_max_players()), **kwargs)
+    manager._set_ai_manager(
+        AIManager(
+            game_models=game.get_game_ai(),
+            add_ai=manager._connect_ai,
+            act_as_ai=manager._act_as_ai,
+            remove_ai=manager._disconnect,
+        )
+    )
+    return manager
+
+
+def sent_messages(websocket: MagicMock) -> list[str]:
+    return [call.args[0] for call in websocket.send_text.await_args_list]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_game_state_builds_shared_view_once():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    websockets = [mock_websocket() for _ in range(3)]
+    for websocket in websockets:
+        await manager._connect_human(websocket)
+
+    with patch.object(game, "get_game_state_response", wraps=game.get_game_state_response) as get_state:
+        manager._mark_dirty(Channel.GAME)
+        await manager._broadcast_changes()
+        await flush(manager)
+
+    assert get_state.call_count == 1
+    messages = [sent_messages(websocket)[-1] for websocket in websockets]
+    assert messages[0] is messages[1] is messages[2]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_game_state_builds_each_view():
+    game = QuantumGame(number_of_players=3, max_hint_level=QuantumHintLevel.FULL)
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    client_ids = [await manager._connect_human(mock_websocket()) for _ in range(4)]
+    for position, client_id in enumerate(client_ids[:3]):
+        manager._session.handle_function_call(client_id, "set_player_position", {"new_position": position})
+    game.handle_function_call(0, "set_suit_name", {"suit_name": "Ducks"})
+    game.handle_function_call(0, "set_hint_level", {"hint_level": QuantumHintLevel.FULL.value})
+
+    with patch.object(game, "get_game_state_response", wraps=game.get_game_state_response) as get_state:
+        manager._mark_dirty(Channel.GAME)
+        await manager._broadcast_changes()
+        await flush(manager)
+
+    # Position 0 has the full hint level, everyone else (including the spectator) shares the default view.
+    assert get_state.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_clients_receive_frames_in_negotiated_encoding():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    json_websocket = mock_websocket()
+    binary_websocket = mock_websocket()
+    await manager._connect_human(json_websocket, FrameEncoding.JSON)
+    await manager._connect_human(binary_websocket, FrameEncoding.BINARY)
+
+    manager._mark_dirty(Channel.GAME)
+    await manager._broadcast_changes()
+    await flush(manager)
+
+    json_frame = json_websocket.send_text.await_args.args[0]
+    assert json_frame == game.get_game_state_response(None).model_dump_json()
+    binary_websocket.send_text.assert_not_awaited()
+    message_type, body = decode_binary_frame(binary_websocket.send_bytes.await_args.args[0])
+    assert message_type == ResponseType.GAME_STATE
+    assert body["parameters"] == game.get_game_state_response(None).parameters.model_dump(mode="json")
+
+
+@pytest.mark.asyncio
+async def test_delta_clients_receive_deltas_and_can_resync():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    player_websocket = mock_websocket()
+    player_id = await manager._connect_human(player_websocket)
+    manager._session.handle_function_call(player_id, "set_player_position", {"new_position": 0})
+    delta_websocket = mock_websocket()
+    delta_id = await manager._connect_human(delta_websocket, features=frozenset({ClientFeature.DELTA}))
+    await manager._send_game_state_snapshot(delta_id)
+    await flush(manager)
+    snapshot = json.loads(sent_messages(delta_websocket)[-1])
+    assert snapshot["state_version"] == 0
+
+    await manager._action_message(
+        player_id,
+        WebSocketRequest(request_type=WebSocketRequestType.GAME, function_name="make_move", parameters={"position": 4}),
+    )
+    await flush(manager)
+
+    game_messages = [
+        message
+        for message in map(json.loads, sent_messages(delta_websocket))
+        if message["message_type"] in ("game_state", "game_state_delta")
+    ]
+    delta = game_messages[-1]
+    assert delta["message_type"] == "game_state_delta"
+    assert (delta["parameters"]["from_version"], delta["parameters"]["to_version"]) == (0, 1)
+    patched = apply_json_patch(
+        snapshot["parameters"], [JsonPatchOperation.model_validate(op) for op in delta["parameters"]["patch"]]
+    )
+    assert patched == game.get_game_state_response(None).parameters.model_dump(mode="json")
+    # Players without the feature still get full game states, and nothing else changed.
+    assert json.loads(sent_messages(player_websocket)[-1])["message_type"] == "game_state"
+
+    await manager._action_message(
+        delta_id,
+        WebSocketRequest(request_type=WebSocketRequestType.GAME, function_name="get_game_state", parameters={}),
+    )
+    await flush(manager)
+    resync = json.loads(sent_messages(delta_websocket)[-1])
+    assert resync["message_type"] == "game_state"
+    assert resync["state_version"] == 1
+
+
+@pytest.mark.asyncio
+async def test_broadcast_only_sends_dirty_channels():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    websocket = mock_websocket()
+    client_id = await manager._connect_human(websocket)
+    await manager._update_client_state(client_id)
+    await flush(manager)
+    manager._session.handle_function_call(client_id, "set_player_position", {"new_position": 0})
+    websocket.send_text.reset_mock()
+
+    await manager._action_message(
+        client_id,
+        WebSocketRequest(request_type=WebSocketRequestType.GAME, function_name="make_move", parameters={"position": 4}),
+    )
+    await flush(manager)
+
+    assert [json.loads(message)["message_type"] for message in sent_messages(websocket)] == ["game_state"]
+
+
+@pytest.mark.asyncio
+async def test_bundle_clients_receive_one_frame_per_broadcast():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    bundle_websocket = mock_websocket()
+    legacy_websocket = mock_websocket()
+    bundle_id = await manager._connect_human(bundle_websocket, features=frozenset({ClientFeature.BUNDLE}))
+    await manager._connect_human(legacy_websocket)
+
+    await manager._update_client_state(bundle_id)
+    await flush(manager)
+    connected = json.loads(sent_messages(bundle_websocket)[-1])
+    assert bundle_websocket.send_text.await_count == 1
+    assert connected["message_type"] == "bundle"
+    assert [message["message_type"] for message in connected["parameters"]["messages"]] == [
+        "simple",
+        "session_state",
+        "game_state",
+        "ai_players",
+    ]
+
+    manager._mark_dirty(Channel.SESSION, Channel.GAME, Channel.AI)
+    await manager._broadcast_changes()
+    await flush(manager)
+    assert bundle_websocket.send_text.await_count == 2
+    assert legacy_websocket.send_text.await_count == 3
+    bundle = json.loads(sent_messages(bundle_websocket)[-1])
+    assert [message["message_type"] for message in bundle["parameters"]["messages"]] == [
+        "session_state",
+        "game_state",
+        "ai_players",
+    ]
+    assert bundle["parameters"]["messages"][1] == json.loads(sent_messages(legacy_websocket)[1])
+
+
+def stalled_websocket() -> MagicMock:
+    async def never_send(_: str):
+        await asyncio.Event().wait()
+
+    websocket = mock_websocket()
+    websocket.send_text = AsyncMock(side_effect=never_send)
+    return websocket
+
+
+@pytest.mark.asyncio
+async def test_stalled_client_does_not_block_other_clients():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    stalled_id = await manager._connect_human(stalled_websocket())
+    websocket = mock_websocket()
+    client_id = await manager._connect_human(websocket)
+    for position, player_id in enumerate([stalled_id, client_id]):
+        manager._session.handle_function_call(player_id, "set_player_position", {"new_position": position})
+
+    for _ in range(10):
+        manager._mark_dirty(Channel.SESSION)
+        await asyncio.wait_for(manager._broadcast_changes(), timeout=1)
+    await asyncio.wait_for(manager._id_to_player[client_id].drain(), timeout=1)
+
+    message_types = [json.loads(message)["message_type"] for message in sent_messages(websocket)]
+    assert message_types.count("session_state") == 10
+
+
+@pytest.mark.asyncio
+async def test_overflowing_client_is_sent_the_latest_state():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    client_id = await manager._connect_human(stalled_websocket(), settings=OutboundQueueSettings(max_size=4))
+    manager._session.handle_function_call(client_id, "set_player_position", {"new_position": 0})
+    client = manager._id_to_player[client_id]
+    assert isinstance(client, WebSocketTransport)
+
+    for _ in range(10):
+        manager._mark_dirty(Channel.SESSION)
+        await manager._broadcast_changes()
+
+    assert client_id in manager._id_to_player
+    # The first message is stuck being written, the queue holds a full state update.
+    assert [message.message.message_type for message in client._queue._queue] == [  # type: ignore[attr-defined]
+        ResponseType.SESSION_STATE,
+        ResponseType.GAME_STATE,
+        ResponseType.AI_PLAYERS,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_overflowing_client_is_disconnected():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    settings = OutboundQueueSettings(max_size=4, overflow_policy=OverflowPolicy.DISCONNECT)
+    client_id = await manager._connect_human(stalled_websocket(), settings=settings)
+    manager._session.handle_function_call(client_id, "set_player_position", {"new_position": 0})
+
+    for _ in range(10):
+        manager._mark_dirty(Channel.SESSION)
+        await manager._broadcast_changes()
+
+    assert client_id not in manager._id_to_player
+
+
+def make_move_message(position: int) -> str:
+    return WebSocketRequest(
+        request_type=WebSocketRequestType.GAME, function_name="make_move", parameters={"position": position}
+    ).model_dump_json()
+
+
+@pytest.mark.asyncio
+async def test_mailbox_processes_actions_in_order():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    client_ids = [await manager._connect_human(mock_websocket()) for _ in range(2)]
+    for position, client_id in enumerate(client_ids):
+        manager._session.handle_function_call(client_id, "set_player_position", {"new_position": position})
+
+    for move in range(5):
+        await manager._handle_message(client_ids[move % 2], make_move_message(move))
+    await manager._mailbox.join()
+
+    assert game._history[-1][:5] == [0, 1, 0, 1, 0]
+    stats = manager.get_mailbox_stats()
+    assert (stats.depth, stats.max_depth, stats.processed, stats.rejected) == (0, 5, 5, 0)
+
+
+@pytest.mark.asyncio
+async def test_successful_game_actions_are_recorded():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    recorded: list[GameAction] = []
+    manager.set_action_recorder(recorded.append)
+    client_id = await manager._connect_human(mock_websocket())
+    manager._session.handle_function_call(client_id, "set_player_position", {"new_position": 0})
+
+    await manager._handle_message(client_id, make_move_message(4))
+    # Out of turn, so rejected by the game and not recorded.
+    await manager._handle_message(client_id, make_move_message(0))
+    await manager._mailbox.join()
+
+    assert recorded == [
+        GameAction(state_version=1, player_position=0, function_name="make_move", parameters={"position": 4})
+    ]
+
+
+@pytest.mark.asyncio
+async def test_full_mailbox_rejects_actions():
+    game = TicTacToeGame()
+    manager = make_manager(game, mailbox_size=2)
+    websocket = mock_websocket()
+    client_id = await manager._connect_human(websocket)
+    manager._session.handle_function_call(client_id, "set_player_position", {"new_position": 0})
+
+    for move in range(3):
+        await manager._handle_message(client_id, make_move_message(move))
+    await flush(manager)
+
+    error = json.loads(sent_messages(websocket)[-1])
+    assert error["message_type"] == "error"
+    assert "busy" in error["parameters"]["error_message"]
+    assert manager.get_mailbox_stats().rejected == 1
+
+
+@pytest.mark.asyncio
+async def test_ai_moves_are_computed_off_the_event_loop():
+    game = TicTacToeGame()
+    scheduler = AIScheduler(max_workers=1)
+    manager = make_manager(game, ai_scheduler=scheduler)
+    client_id = await manager._connect_human(mock_websocket())
+    manager._session.handle_function_call(client_id, "set_player_position", {"new_position": 0})
+    await manager._action_message(
+        client_id,
+        WebSocketRequest(
+            request_type=WebSocketRequestType.AI,
+            function_name="add_ai",
+            parameters={"ai_model": TicTacToeRandomAI.get_ai_type(), "position": 1},
+        ),
+    )
+    main_thread = threading.get_ident()
+    think_threads: list[int] = []
+    with patch.object(
+        TicTacToeRandomAI,
+        "make_move",
+        autospec=True,
+        side_effect=lambda ai: think_threads.append(threading.get_ident()) or ai.available_moves[0],
+    ):
+        await manager._handle_message(client_id, make_move_message(4))
+        for _ in range(100):
+            if game._move_number == 2:
+                break
+            await asyncio.sleep(0.01)
+
+    assert game._move_number == 2
+    assert think_threads and main_thread not in think_threads
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_ai_messages_wait_for_the_ai_to_finish_thinking():
+    game = TicTacToeGame()
+    scheduler = AIScheduler(max_workers=2)
+    manager = make_manager(game, ai_scheduler=scheduler)
+    ai = TicTacToeRandomAI(position=0, name="Easy")
+    client_id = await manager._connect_ai(ai)
+    handled: list[tuple[str, ResponseType]] = []
+    thinking = threading.Event()
+    release = threading.Event()
+    handle_message = ai.handle_message
+
+    def blocking_handle_message(message):
+        handled.append(("start", message.message_type))
+        if message.message_type == ResponseType.GAME_STATE:
+            thinking.set()
+            release.wait(timeout=5)
+        handled.append(("end", message.message_type))
+        return handle_message(message)
+
+    with patch.object(ai, "handle_message", side_effect=blocking_handle_message):
+        manager._message_ai(client_id, ai, game.get_game_state_response(0))
+        assert await asyncio.to_thread(thinking.wait, 5)
+        manager._message_ai(client_id, ai, manager._session.get_session_state_response_for_client(client_id))
+        await asyncio.sleep(0.05)
+        assert handled == [("start", ResponseType.GAME_STATE)]
+
+        release.set()
+        for _ in range(100):
+            if len(handled) == 4:
+                break
+            await asyncio.sleep(0.01)
+
+    assert handled == [
+        ("start", ResponseType.GAME_STATE),
+        ("end", ResponseType.GAME_STATE),
+        ("start", ResponseType.SESSION_STATE),
+        ("end", ResponseType.SESSION_STATE),
+    ]
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_acting_as_an_ai_does_not_wait_for_other_ais_to_think():
+    game = TicTacToeGame()
+    scheduler = AIScheduler(max_workers=2)
+    manager = make_manager(game, ai_scheduler=scheduler)
+    thinker = TicTacToeRandomAI(position=0, name="Easy")
+    thinker_id = await manager._connect_ai(thinker)
+    seated_id = await manager._connect_ai(TicTacToeRandomAI(position=1, name="Medium"))
+    thinking = threading.Event()
+    release = threading.Event()
+
+    def blocking_handle_message(message):
+        thinking.set()
+        release.wait(timeout=5)
+
+    with patch.object(thinker, "handle_message", side_effect=blocking_handle_message):
+        manager._message_ai(thinker_id, thinker, game.get_game_state_response(0))
+        assert await asyncio.to_thread(thinking.wait, 5)
+
+        await asyncio.wait_for(
+            manager._act_as_ai(
+                seated_id,
+                WebSocketRequest(
+                    request_type=WebSocketRequestType.SESSION,
+                    function_name="set_player_name",
+                    parameters={"player_name": "Medium"},
+                ),
+            ),
+            timeout=1,
+        )
+        assert not release.is_set()
+        release.set()
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_spectators_share_one_encoded_frame():
+    game = TicTacToeGame()
+    manager = GameManager.from_game_and_id("ABCDE", game)
+    player_id = await manager._connect_human(mock_websocket())
+    manager._session.handle_function_call(player_id, "set_player_position", {"new_position": 0})
+    spectators = [mock_websocket() for _ in range(5)]
+    for websocket in spectators:
+        await manager._connect_human(websocket)
+
+    with patch.object(OutboundMessage, "encode", autospec=True, side_effect=OutboundMessage.encode) as encode:
+        await manager._action_message(
+            player_id,
+            WebSocketRequest(
+                request_type=WebSocketRequestType.GAME, function_name="make_move", parameters={"position": 4}
+            ),
+        )
+        await flush(manager)
+
+    frames = [sent_messages(websocket)[-1] for websocket in spectators]
+    assert all(frame is frames[0] for frame in frames)
+    assert json.loads(frames[0])["message_type"] == "game_state"
+    assert sum(isinstance(call.args[0], OutboundMessage) for call in encode.call_args_list) == 6
+
+
+@pytest.mark.asyncio
+async def test_spectator_updates_are_throttled():
+    game = TicTacToeGame()
+    manager = make_manager(game, spectator_interval=0.2)
+    client_ids = [await manager._connect_human(mock_websocket()) for _ in range(2)]
+    for position, client_id in enumerate(client_ids):
+        manager._session.handle_function_call(client_id, "set_player_position", {"new_position": position})
+    spectator = mock_websocket()
+    spectator_id = await manager._connect_human(spectator, features=frozenset({ClientFeature.DELTA}))
+    await manager._update_client_state(spectator_id)
+    await flush(manager)
+    spectator.send_text.reset_mock()
+
+    for move in range(3):
+        await manager._action_message(
+            client_ids[move % 2],
+            WebSocketRequest(
+                request_type=WebSocketRequestType.GAME, function_name="make_move", parameters={"position": move}
+            ),
+        )
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    await flush_transports(manager)
+
+    # The first move is pushed straight away, the next two are held back and coalesced into one delta.
+    game_messages = [
+        message
+        for message in map(json.loads, sent_messages(spectator))
+        if message["message_type"] in ("game_state", "game_state_delta")
+    ]
+    assert [message["message_type"] for message in game_messages] == ["game_state_delta"]
+    assert manager._spectator_dirty_channels == {Channel.GAME}
+    await asyncio.wait_for(flush(manager), timeout=1)
+    game_messages = [
+        message
+        for message in map(json.loads, sent_messages(spectator))
+        if message["message_type"] in ("game_state", "game_state_delta")
+    ]
+    assert [
+        (message["parameters"]["from_version"], message["parameters"]["to_version"]) for message in game_messages
+    ] == [
+        (0, 1),
+        (1, 3),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_close_game_disconnects_every_client():
+    manager = GameManager.from_game_and_id("ABCDE", TicTacToeGame())
+    websockets = [mock_websocket() for _ in range(3)]
+    for websocket in websockets:
+        await manager._connect_human(websocket)
+    await manager._connect_ai(MagicMock())
+
+    await asyncio.wait_for(manager.close_game(), timeout=1)
+
+    assert manager.is_closed
+    assert not manager.is_active
+    for websocket in websockets:
+        websocket.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_overlapping_disconnects_remove_the_client_once():
+    manager = GameManager.from_game_and_id("ABCDE", TicTacToeGame())
+    websocket = mock_websocket()
+    client_id = await manager._connect_human(websocket)
+
+    # Both look the client up before either of them gets the lock.
+    async with manager._player_lock:
+        disconnects = asyncio.gather(
+            manager._connection_lost(client_id, websocket),
+            manager._connection_lost(client_id, websocket),
+            return_exceptions=True,
+        )
+        await asyncio.sleep(0)
+    results = await asyncio.wait_for(disconnects, timeout=1)
+
+    assert results == [None, None]
+    assert client_id not in manager._id_to_player
+    websocket.close.assert_awaited_once()
+
+
+async def drop_connection(manager: GameManager, client_id: str):
+    client = manager._id_to_player[client_id]
+    assert isinstance(client, WebSocketTransport)
+    await client.drain()
+    await manager._connection_lost(client_id, client.websocket)
+
+
+@pytest.mark.asyncio
+async def test_resumed_client_keeps_its_seat_and_is_sent_only_missed_frames():
+    manager = make_manager(TicTacToeGame())
+    websocket = mock_websocket()
+    resume = frozenset({ClientFeature.RESUME})
+    client_id = await manager._connect_human(websocket, features=resume)
+    await manager._update_client_state(client_id)
+    manager._session.handle_function_call(client_id, "set_player_position", {"new_position": 0})
+    await flush_transports(manager)
+    first, *frames = map(json.loads, sent_messages(websocket))
+    assert first["message_type"] == "resume"
+    assert [frame["sequence"] for frame in frames] == [1, 2, 3, 4]
+
+    await drop_connection(manager, client_id)
+    manager._mark_dirty(Channel.SESSION)
+    await manager._broadcast_changes()
+    assert client_id in manager._suspended
+    assert manager._session.get_client_position(client_id) == 0
+
+    new_websocket = mock_websocket()
+    token = first["parameters"]["token"]
+    assert await manager._resume_human(new_websocket, token, 4, FrameEncoding.JSON, resume, None) == client_id
+    await flush_transports(manager)
+
+    resumed, *missed = map(json.loads, sent_messages(new_websocket))
+    assert resumed["parameters"] == {"token": token, "resumed": True}
+    assert [(frame["sequence"], frame["message_type"]) for frame in missed] == [(5, "session_state")]
+    assert client_id not in manager._suspended
+    assert manager._session.get_client_position(client_id) == 0
+
+
+@pytest.mark.asyncio
+async def test_suspended_client_is_disconnected_after_the_grace_period():
+    manager = make_manager(TicTacToeGame(), resume_grace=0)
+    resume = frozenset({ClientFeature.RESUME})
+    client_id = await manager._connect_human(mock_websocket(), features=resume)
+    token = manager._resume_tokens[client_id]
+
+    await drop_connection(manager, client_id)
+    await asyncio.wait_for(asyncio.gather(*manager._suspended.values()), timeout=1)
+
+    assert client_id not in manager._id_to_player
+    assert await manager._resume_human(mock_websocket(), token, 0, FrameEncoding.JSON, resume, None) is None
+
+
+@pytest.mark.asyncio
+async def test_out_of_turn_move_is_rejected_before_reaching_the_mailbox():
+    game = TicTacToeGame()
+    manager = make_manager(game)
+    websocket = mock_websocket()
+    client_id = await manager._connect_human(websocket)
+    manager._session.handle_function_call(client_id, "set_player_position", {"new_position": 1})
+
+    await manager._handle_message(client_id, make_move_message(4))
+    await flush(manager)
+
+    error = json.loads(sent_messages(websocket)[-1])
+    assert error["parameters"]["error_message"] == "Player 1 is not the current player."
+    assert manager._mailbox.qsize() == 0
+    assert manager.get_mailbox_stats().processed == 0
@@ -0,0 +1,51 @@
+import asyncio
+import random
+
+import pytest
+
+from games_backend.manager.db_manager import InMemoryDBManager
+from games_backend.manager.id_allocator import ID_SPACE, GameIdAllocator, game_id_from_index
+from games_backend.utils import is_game_id_valid
+
+
+def test_game_id_from_index():
+    assert game_id_from_index(0) == "AAAAA"
+    assert game_id_from_index(27) == "AAABB"
+    assert game_id_from_index(ID_SPACE - 1) == "ZZZZZ"
+
+
+def test_candidates_never_repeat():
+    allocator = GameIdAllocator(InMemoryDBManager(), rng=random.Random(0))
+
+    candidates = [allocator.next_candidate() for _ in range(10_000)]
+
+    assert len(set(candidates)) == len(candidates)
+    assert all(is_game_id_valid(candidate) for candidate in candidates)
+
+
+@pytest.mark.asyncio
+async def test_allocate_skips_taken_ids():
+    db_manager = InMemoryDBManager()
+    taken = GameIdAllocator(db_manager, rng=random.Random(0)).next_candidate()
+    assert await db_manager.reserve_game_id(taken)
+
+    assert await GameIdAllocator(db_manager, rng=random.Random(0)).allocate() != taken
+
+
+@pytest.mark.asyncio
+async def test_concurrent_allocations_are_distinct():
+    db_manager = InMemoryDBManager()
+    allocators = [GameIdAllocator(db_manager, rng=random.Random(0)) for _ in range(2)]
+
+    game_ids = await asyncio.gather(*(allocator.allocate() for allocator in allocators for _ in range(50)))
+
+    assert len(set(game_ids)) == 100
+
+
+@pytest.mark.asyncio
+async def test_allocate_only_hands_out_accepted_ids():
+    allocator = GameIdAllocator(InMemoryDBManager(), accepts=lambda game_id: game_id.startswith("A"))
+
+    game_ids = [await allocator.allocate() for _ in range(20)]
+
+    assert all(game_id.startswith("A") for game_id in game_ids)
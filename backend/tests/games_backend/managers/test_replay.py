@@ -0,0 +1,33 @@
+from games_backend import models
+from games_backend.manager.frames import OutboundMessage
+from games_backend.manager.replay import ReplayBuffer
+
+
+def make_message(text: str) -> OutboundMessage:
+    return OutboundMessage(models.SimpleResponse(parameters=models.SimpleResponseParameters(message=text)))
+
+
+def test_replay_returns_the_frames_a_client_missed():
+    replay = ReplayBuffer(size=8)
+    replay.track("a")
+    replay.track("b")
+    frames = [replay.record(client_id, make_message(str(i))) for i, client_id in enumerate("abab")]
+
+    assert [frame.sequence for frame in frames] == [1, 2, 3, 4]
+    assert replay.replay("a", last_seen=1) == [frames[2]]
+    assert replay.replay("b", last_seen=0) == [frames[1], frames[3]]
+    assert replay.replay("b", last_seen=4) == []
+
+
+def test_replay_gives_up_once_missed_frames_are_dropped():
+    replay = ReplayBuffer(size=2)
+    replay.track("a")
+    replay.track("b")
+    replay.record("a", make_message("1"))
+    replay.record("b", make_message("2"))
+    replay.record("b", make_message("3"))
+
+    assert replay.replay("a", last_seen=0) is None
+    assert replay.replay("a", last_seen=1) == []
+    assert replay.replay("b", last_seen=0) is not None
+    assert replay.replay("untracked", last_seen=0) is None
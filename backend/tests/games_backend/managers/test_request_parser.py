@@ -0,0 +1,56 @@
+import json
+
+import pydantic
+import pytest
+
+from games_backend import models
+from games_backend.games.quantum.game import QuantumGame, TargetPlayerParameters
+from games_backend.games.tictactoe import MakeMoveParameters, TicTacToeGame
+from games_backend.manager.request_parser import get_request_parser, rejection_reason
+from games_backend.manager.session_manager import SetPlayerPositionParameters
+
+
+def make_message(request_type: str, function_name: str, **parameters: object) -> str:
+    return json.dumps({"request_type": request_type, "function_name": function_name, "parameters": parameters})
+
+
+def test_requests_are_parsed_into_their_functions_parameters():
+    parser = get_request_parser(QuantumGame)
+
+    move = parser.parse(make_message("game", "target_player", targeted_player=1, suit=2))
+    seat = parser.parse(make_message("session", "set_player_position", new_position=0))
+
+    assert move.request_type == models.WebSocketRequestType.GAME
+    assert move.parameters == TargetPlayerParameters(targeted_player=1, suit=2)
+    assert seat.parameters == SetPlayerPositionParameters(new_position=0)
+    assert get_request_parser(QuantumGame) is parser
+
+
+def test_unknown_functions_and_invalid_parameters_are_rejected():
+    parser = get_request_parser(TicTacToeGame)
+
+    with pytest.raises(pydantic.ValidationError, match="does not match any of the expected tags"):
+        parser.parse(make_message("game", "target_player", targeted_player=1, suit=2))
+    with pytest.raises(pydantic.ValidationError, match="position"):
+        parser.parse(make_message("game", "make_move", position="centre"))
+
+
+def test_requests_rejected_by_the_check_give_its_reason():
+    parser = get_request_parser(TicTacToeGame)
+    checked: list[tuple[models.WebSocketRequestType, str]] = []
+
+    def check(request_type: models.WebSocketRequestType, function_name: str) -> str | None:
+        checked.append((request_type, function_name))
+        return "Not your turn."
+
+    with pytest.raises(pydantic.ValidationError) as error:
+        parser.parse(make_message("game", "make_move", position="centre"), check)
+
+    assert rejection_reason(error.value) == "Not your turn."
+    assert checked == [(models.WebSocketRequestType.GAME, "make_move")]
+    parser.parse(make_message("game", "get_game_state"), check)
+    parser.parse(make_message("session", "leave_player_position"), check)
+    assert len(checked) == 1
+    assert parser.parse(make_message("game", "make_move", position=4), lambda *_: None).parameters == (
+        MakeMoveParameters(position=4)
+    )
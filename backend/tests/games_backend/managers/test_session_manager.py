@@ -154,3 +154,26 @@ def test_unknown_function_name(session: SessionManager):
     response = session.handle_function_call(client_id, "do_nothing", {})
     assert isinstance(response, models.ErrorResponse)
     assert "not supported" in response.parameters.error_message
+
+
+def test_session_state_messages_are_shared_until_the_seats_change(session: SessionManager):
+    for client_id, name in [("c1", "Alice"), ("c2", "Bob"), ("c3", "Carol")]:
+        session.add_client(client_id, name)
+    session._move_client_position("c1", 0)
+
+    message = session.get_session_state_message_for_client("c2")
+    assert session.get_session_state_message_for_client("c3") is message
+    for client_id in ["c1", "c2"]:
+        expected = session.get_session_state_response_for_client(client_id)
+        assert session.get_session_state_message_for_client(client_id).encode(models.FrameEncoding.JSON) == (
+            expected.model_dump_json()
+        )
+
+    version = session.version
+    session.add_client("c4", "Dave")
+    session._set_client_name("c3", "Caroline")
+    assert session.version == version
+    session._set_client_name("c1", "Alicia")
+    assert session.version == version + 1
+    assert session.get_session_state_message_for_client("c2") is not message
+    assert session.get_session_state_message(None).message.parameters.player_positions[0] == "Alicia"
@@ -0,0 +1,67 @@
+import logging
+import threading
+
+from games_backend.app_logger import Event, QueueLogging, SampleFilter
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages: list[str] = []
+        self.threads: set[str] = set()
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(record.getMessage())
+        self.threads.add(threading.current_thread().name)
+
+
+def test_event_is_formatted_as_key_values():
+    event = Event("invalid_move", player=1, move=None, error="Position 4 is already taken.")
+
+    assert str(event) == 'invalid_move player=1 move=None error="Position 4 is already taken."'
+
+
+def test_event_is_only_formatted_when_written():
+    formatted: list[str] = []
+
+    class Counted:
+        def __str__(self) -> str:
+            formatted.append("formatted")
+            return "value"
+
+    test_logger = logging.getLogger("tests.app_logger.lazy")
+    test_logger.setLevel(logging.INFO)
+    test_logger.debug(Event("hidden", value=Counted()))
+
+    assert formatted == []
+
+
+def test_sample_filter_keeps_warnings():
+    test_logger = logging.getLogger("tests.app_logger.sampled")
+    test_logger.setLevel(logging.INFO)
+    test_logger.propagate = False
+    handler = RecordingHandler()
+    test_logger.addHandler(handler)
+    test_logger.addFilter(SampleFilter(0.0))
+
+    test_logger.info(Event("dropped"))
+    test_logger.warning(Event("kept"))
+
+    assert handler.messages == ["kept"]
+
+
+def test_queue_logging_writes_from_a_background_thread():
+    test_logger = logging.getLogger("tests.app_logger.queued")
+    test_logger.setLevel(logging.INFO)
+    test_logger.propagate = False
+    handler = RecordingHandler()
+    test_logger.addHandler(handler)
+
+    queue_logging = QueueLogging(("tests.app_logger.queued",))
+    assert handler not in test_logger.handlers
+    test_logger.info(Event("queued", number=1))
+    queue_logging.stop()
+
+    assert handler.messages == ["queued number=1"]
+    assert threading.current_thread().name not in handler.threads
+    assert test_logger.handlers == [handler]
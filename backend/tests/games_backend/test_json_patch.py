@@ -0,0 +1,96 @@
+import copy
+from typing import Any
+
+import pytest
+
+from games_backend.games.quantum.game import QuantumGame
+from games_backend.games.tictactoe import TicTacToeGame
+from games_backend.games.ultimate import UltimateGame
+from games_backend.json_patch import apply_json_patch, make_json_patch
+from games_backend.models import QuantumHintLevel
+
+
+@pytest.mark.parametrize(
+    "old,new",
+    [
+        ({"a": 1}, {"a": 1}),
+        ({"a": 1}, {"a": 2}),
+        ({"a": 1}, {"b": 1}),
+        ({"a": {"b": [1, 2]}}, {"a": {"b": [1, 2, 3, 4]}}),
+        ({"a": [1, 2, 3]}, {"a": [1, 5, 3]}),
+        ({"a": [1, 2, 3]}, {"a": [3]}),
+        ({"a": [True, False]}, {"a": [1, 0]}),
+        ({"a/b": 1, "c~d": 2}, {"a/b": 2, "c~d": 3}),
+        ([1, 2], {"a": 1}),
+        ({"a": [1, 2]}, {"a": [0, 2, 3]}),
+        ({"a": 1}, {"a": 1.0}),
+    ],
+)
+def test_patch_roundtrip(old: Any, new: Any):
+    assert apply_json_patch(old, make_json_patch(old, new)) == new
+
+
+def test_bool_and_int_are_different_values():
+    patch = make_json_patch({"a": [True, False]}, {"a": [1, 0]})
+    assert [operation.path for operation in patch] == ["/a/0", "/a/1"]
+    assert type(apply_json_patch({"a": [True, False]}, patch)["a"][0]) is int
+
+
+def test_appending_to_a_list_only_sends_new_items():
+    patch = make_json_patch({"log": list(range(100))}, {"log": list(range(102))})
+    assert [(operation.op, operation.path, operation.value) for operation in patch] == [
+        ("add", "/log/-", 100),
+        ("add", "/log/-", 101),
+    ]
+
+
+def test_list_that_grew_and_changed_is_replaced():
+    patch = make_json_patch({"log": [1, 2]}, {"log": [0, 2, 3]})
+    assert [(operation.op, operation.path, operation.value) for operation in patch] == [("replace", "/log", [0, 2, 3])]
+
+
+def test_equal_documents_have_an_empty_patch():
+    document = {"board": [[None, 1], [2, None]], "log": [{"player": 0, "move": 4}], "score": 1.5}
+    assert make_json_patch(document, copy.deepcopy(document)) == []
+
+
+def test_tic_tac_toe_delta_is_one_board():
+    game = TicTacToeGame()
+    for move in range(3):
+        game.perform_function_call(move % 2, "make_move", {"position": move})
+    previous = game.get_game_state_snapshot(None)
+    game.perform_function_call(1, "make_move", {"position": 4})
+    current = game.get_game_state_snapshot(None)
+
+    delta = game.get_game_state_delta(previous, current)
+
+    assert delta.parameters.from_version == 3
+    assert delta.parameters.to_version == 4
+    assert [(operation.op, operation.path) for operation in delta.parameters.patch] == [("add", "/history/-")]
+
+
+@pytest.mark.parametrize(
+    "game,moves",
+    [
+        (UltimateGame(), [(0, "make_move", {"position": 40}), (1, "make_move", {"position": 41})]),
+        (
+            QuantumGame(number_of_players=3, max_hint_level=QuantumHintLevel.FULL),
+            [
+                (0, "set_suit_name", {"suit_name": "Ducks"}),
+                (0, "set_hint_level", {"hint_level": 2}),
+                (0, "target_player", {"targeted_player": 1, "suit": 0}),
+                (1, "set_suit_name", {"suit_name": "Squids"}),
+            ],
+        ),
+    ],
+    ids=["ultimate", "quantum"],
+)
+def test_game_state_deltas_rebuild_the_next_state(game, moves: list[tuple[int, str, dict[str, Any]]]):
+    for position, function_name, parameters in moves:
+        previous = game.get_game_state_snapshot(0)
+        assert game.perform_function_call(position, function_name, parameters) is None
+        current = game.get_game_state_snapshot(0)
+        delta = game.get_game_state_delta(previous, current)
+        assert apply_json_patch(
+            previous.parameters.model_dump(mode="json"), delta.parameters.patch
+        ) == current.parameters.model_dump(mode="json")
@@ -0,0 +1,51 @@
+import pytest
+
+from games_backend import metrics
+
+
+def test_counter_renders_per_label():
+    counter = metrics.Counter("test_requests_total", "Requests.", ("path",))
+    counter.labels("/a").inc()
+    counter.labels("/a").inc(2)
+    counter.labels('say "hi"').inc()
+
+    assert list(counter.render()) == [
+        "# HELP test_requests_total Requests.",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{path="/a"} 3',
+        'test_requests_total{path="say \\"hi\\""} 1',
+    ]
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Time.", buckets=(0.1, 1.0))
+    child = histogram.labels()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    assert list(histogram.render())[2:] == [
+        'test_seconds_bucket{le="0.1"} 2',
+        'test_seconds_bucket{le="1"} 3',
+        'test_seconds_bucket{le="+Inf"} 4',
+        "test_seconds_sum 3.65",
+        "test_seconds_count 4",
+    ]
+
+
+def test_labels_must_match_the_label_names():
+    gauge = metrics.Gauge("test_depth", "Depth.", ("game_type",))
+
+    with pytest.raises(ValueError, match="takes labels"):
+        gauge.labels()
+
+
+def test_registry_rejects_duplicate_names():
+    registry = metrics.Registry()
+    registry.register(metrics.Gauge("test_depth", "Depth."))
+
+    with pytest.raises(ValueError, match="already registered"):
+        registry.register(metrics.Gauge("test_depth", "Depth."))
+
+
+def test_metrics_must_implement_their_samples():
+    assert {"_new_child", "_sample_lines"} <= metrics.Metric.__abstractmethods__
@@ -0,0 +1,61 @@
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from games_backend.sharding import SHARD_HOP_HEADER, HashRing, Shard, ShardProxyMiddleware
+
+WORKERS = [f"http://127.0.0.1:{8100 + index}" for index in range(4)]
+GAME_IDS = [f"GAME{index}" for index in range(2000)]
+
+
+def test_hash_ring_spreads_games_over_workers():
+    ring = HashRing(WORKERS)
+
+    owners = [ring.owner(game_id) for game_id in GAME_IDS]
+
+    assert owners == [HashRing(WORKERS).owner(game_id) for game_id in GAME_IDS]
+    for worker in WORKERS:
+        assert 0.1 < owners.count(worker) / len(GAME_IDS) < 0.4
+
+
+def test_adding_a_worker_only_moves_games_to_it():
+    before = HashRing(WORKERS)
+    after = HashRing([*WORKERS, "http://127.0.0.1:8104"])
+
+    moved = [game_id for game_id in GAME_IDS if before.owner(game_id) != after.owner(game_id)]
+
+    assert all(after.owner(game_id) == "http://127.0.0.1:8104" for game_id in moved)
+    assert 0.1 < len(moved) / len(GAME_IDS) < 0.3
+
+
+async def local_game(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(f"local {request.path_params['game_name']}")
+
+
+@pytest.mark.asyncio
+async def test_proxy_routes_requests_to_the_owner():
+    shard = Shard(WORKERS[0], WORKERS, "token")
+    owned = next(game_id for game_id in GAME_IDS if shard.owns(game_id))
+    other = next(game_id for game_id in GAME_IDS if not shard.owns(game_id))
+    proxied: list[httpx.Request] = []
+
+    def owner(request: httpx.Request) -> httpx.Response:
+        proxied.append(request)
+        return httpx.Response(200, text="remote")
+
+    shard._client = httpx.AsyncClient(transport=httpx.MockTransport(owner))
+    app = ShardProxyMiddleware(Starlette(routes=[Route("/game/{game_name}/metadata", local_game)]), lambda: shard)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://test") as client:
+        assert (await client.get(f"/game/{owned}/metadata")).text == f"local {owned}"
+        assert (await client.get(f"/game/{other}/metadata?view=full")).text == "remote"
+        # Requests that were already proxied once are never proxied again.
+        rejected = await client.get(f"/game/{other}/metadata", headers={SHARD_HOP_HEADER: "1"})
+
+    assert rejected.status_code == 503
+    assert len(proxied) == 1
+    assert str(proxied[0].url) == f"{shard.owner(other)}/game/{other}/metadata?view=full"
+    assert proxied[0].headers[SHARD_HOP_HEADER] == "1"
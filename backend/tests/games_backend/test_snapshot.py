@@ -0,0 +1,150 @@
+import random
+
+import pytest
+
+from games_backend.game_base import GameBase
+from games_backend.games.quantum.game import QuantumGame
+from games_backend.games.tictactoe import TicTacToeGame
+from games_backend.games.topological_connect_four.game import TopologicalGame
+from games_backend.games.ultimate import UltimateGame
+from games_backend.games.wizard.game import WizardGame
+from games_backend.models import Geometry, GravitySetting, QuantumHintLevel
+from games_backend.snapshot import SnapshotError, SnapshotReader, SnapshotWriter
+
+
+def assert_same_state(restored: GameBase, game: GameBase, positions: range) -> None:
+    assert type(restored) is type(game)
+    assert restored.state_version == game.state_version
+    for position in [None, *positions]:
+        assert restored.get_game_state_response(position) == game.get_game_state_response(position)
+
+
+def play_wizard(game: WizardGame, actions: int) -> None:
+    for _ in range(actions):
+        state = game.get_game_state_response(None).parameters
+        player = state.current_player
+        if player == -1:
+            return
+        own_state = game.get_game_state_response(player).parameters
+        if own_state.valid_bids:
+            parameters = {"bid": own_state.valid_bids[0]}
+            if own_state.trump_to_be_set:
+                parameters["set_suit"] = 2
+            assert game.perform_function_call(player, "make_bid", parameters) is None
+        else:
+            assert game.perform_function_call(player, "play_card", {"card": own_state.playable_cards[0]}) is None
+
+
+def test_snapshot_values_roundtrip():
+    writer = SnapshotWriter()
+    writer.write_uint(0)
+    writer.write_uint(300)
+    writer.write_optional_uint(None)
+    writer.write_optional_uint(0)
+    writer.write_bool(True)
+    writer.write_string("Spades ♠")
+
+    reader = SnapshotReader(writer.to_bytes())
+    assert reader.read_uint() == 0
+    assert reader.read_uint() == 300
+    assert reader.read_optional_uint() is None
+    assert reader.read_optional_uint() == 0
+    assert reader.read_bool() is True
+    assert reader.read_string() == "Spades ♠"
+    assert reader.is_exhausted
+    with pytest.raises(SnapshotError):
+        reader.read_uint()
+
+
+def test_tic_tac_toe_snapshot():
+    game = TicTacToeGame()
+    for position, move in enumerate([4, 0, 8, 2, 1, 7]):
+        assert game.perform_function_call(position % 2, "make_move", {"position": move}) is None
+
+    snapshot = game.to_snapshot()
+
+    assert len(snapshot) < 16
+    assert_same_state(GameBase.from_snapshot(snapshot), game, range(2))
+
+
+def test_ultimate_snapshot():
+    game = UltimateGame()
+    for position, move in enumerate([40, 41, 45, 1, 13, 37]):
+        assert game.perform_function_call(position % 2, "make_move", {"position": move}) is None
+
+    snapshot = game.to_snapshot()
+
+    assert len(snapshot) < 200
+    restored = GameBase.from_snapshot(snapshot)
+    assert_same_state(restored, game, range(2))
+    assert restored.perform_function_call(0, "make_move", {"position": 9}) is None
+
+
+def test_topological_snapshot():
+    game = TopologicalGame(max_players=3, gravity=GravitySetting.NONE, geometry=Geometry.KLEIN, board_size=8)
+    for position, (row, column) in enumerate([(0, 0), (7, 1), (3, 5), (3, 6), (1, 0)]):
+        assert game.perform_function_call(position % 3, "make_move", {"row": row, "column": column}) is None
+
+    snapshot = game.to_snapshot()
+
+    assert len(snapshot) < 100
+    assert_same_state(GameBase.from_snapshot(snapshot), game, range(3))
+
+
+@pytest.mark.parametrize("actions", [0, 4, 12, 40])
+def test_wizard_snapshot(actions: int):
+    game = WizardGame(number_of_players=4, can_see_old_rounds=True)
+    play_wizard(game, actions)
+
+    snapshot = game.to_snapshot()
+
+    assert len(snapshot) < 300
+    restored = GameBase.from_snapshot(snapshot)
+    assert_same_state(restored, game, range(4))
+    # The restored game carries on exactly like the original, given the same deals for later rounds.
+    random.seed(actions)
+    play_wizard(game, 10)
+    random.seed(actions)
+    play_wizard(restored, 10)
+    assert_same_state(restored, game, range(4))
+
+
+def test_wizard_snapshot_of_finished_game():
+    game = WizardGame(number_of_players=6)
+    play_wizard(game, 10_000)
+    assert game.get_game_state_response(None).parameters.winners
+
+    assert_same_state(GameBase.from_snapshot(game.to_snapshot()), game, range(6))
+
+
+def test_quantum_snapshot():
+    game = QuantumGame(number_of_players=3, max_hint_level=QuantumHintLevel.FULL)
+    for player, name in enumerate(["Hearts", "Spades", "Clubs"]):
+        assert game.perform_function_call(player, "set_suit_name", {"suit_name": name}) is None
+    assert game.perform_function_call(1, "set_hint_level", {"hint_level": QuantumHintLevel.FULL}) is None
+    assert game.perform_function_call(0, "target_player", {"targeted_player": 1, "suit": 0}) is None
+    assert game.perform_function_call(1, "respond_to_target", {"response": False}) is None
+    assert game.perform_function_call(0, "claim_no_win", {}) is None
+    assert game.perform_function_call(1, "target_player", {"targeted_player": 2, "suit": 1}) is None
+
+    snapshot = game.to_snapshot()
+
+    assert len(snapshot) < 512
+    restored = GameBase.from_snapshot(snapshot)
+    assert_same_state(restored, game, range(3))
+    assert restored.perform_function_call(2, "respond_to_target", {"response": True}) is None
+
+
+def test_from_snapshot_rejects_bad_data():
+    snapshot = TicTacToeGame().to_snapshot()
+
+    with pytest.raises(SnapshotError, match="Unknown snapshot code"):
+        GameBase.from_snapshot(b"\x7f" + snapshot[1:])
+    with pytest.raises(SnapshotError, match="newer"):
+        GameBase.from_snapshot(snapshot[:1] + b"\x09" + snapshot[2:])
+    with pytest.raises(SnapshotError, match="Trailing"):
+        GameBase.from_snapshot(snapshot + b"\x00")
+
+
+def test_games_must_implement_snapshots():
+    assert {"write_snapshot", "read_snapshot"} <= GameBase.__abstractmethods__